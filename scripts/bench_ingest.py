@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+"""
+End-to-end ingestion benchmark against local stand-ins for the external services.
+
+Runs ingest_unstructured_opensearch.py (its main(), with the same parse, embed,
+rate-limit/retry and index code paths) against fake services served from a
+separate process, so throughput can be measured without paid APIs or a cluster:
+- Unstructured: returns one CompositeElement per paragraph of the uploaded file
+- OpenAI: embeddings of the requested dimension and keyword chat completions,
+  with configurable latency and a share of requests answered with 429 + Retry-After
+- OpenSearch: index management, _bulk, single-document indexing, refresh and count
+
+The synthetic corpus is written as Markdown files of support-style chunks (see
+bench_keywords.synthetic_corpus). They are sent to the fake Unstructured API
+(--partition api); pass --ingest-args "--partition local" to measure local
+partitioning instead, which merges the paragraphs into fewer 1000-character chunks. Each corpus size is ingested in a fresh
+process, which reports chunks/sec, p50/p99 latency per stage and peak RSS. API
+stages are timed per request on the client side, including rate-limit waits
+and retries; with --workers only the main process's requests are timed. Bulk
+bodies are reported in bytes/doc (before and after gzip) and JSON encoding in
+µs/doc, to compare --serializer, --vector-precision and --compress-level.
+
+Usage:
+    python scripts/bench_ingest.py
+    python scripts/bench_ingest.py --chunks 1000 100000 1000000 --mode async --json > bench.json
+    python scripts/bench_ingest.py --chunks 100000 --baseline bench.json
+    python scripts/bench_ingest.py --throttle-share 0.05 --ingest-args "--llm-keywords --dedup skip"
+    python scripts/bench_ingest.py --chunks 10000 --ingest-args "--serializer json --compress-level 9"
+"""
+import argparse
+import contextlib
+import gzip
+import json
+import multiprocessing
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from bench_keywords import synthetic_corpus
+
+INDEX_NAME = "bench_ingest"
+
+# Ingestion flags per --mode
+MODES = {
+    "single": [],
+    "bulk": ["--bulk"],
+    "async": ["--async"],
+}
+
+# Dimension of the fake embeddings when the request doesn't ask for one
+MODEL_DIMENSIONS = {"text-embedding-3-large": 3072}
+DEFAULT_DIMENSION = 1536
+
+
+# ===========================================
+# Fake services (run in their own process)
+# ===========================================
+
+class FakeServices(BaseHTTPRequestHandler):
+    """Unstructured, OpenAI and OpenSearch on one port, told apart by path."""
+
+    protocol_version = "HTTP/1.1"
+    config: dict = {}
+    counters: dict = {}
+    lock = threading.Lock()
+    mappings: dict = {}
+    vectors: dict[int, bytes] = {}
+
+    def log_message(self, *args):
+        pass
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def read_body(self) -> bytes:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def send(self, payload, status: int = 200, headers: Optional[dict] = None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def throttled(self) -> bool:
+        """Answer with a 429 for --throttle-share of the OpenAI requests."""
+        if random.random() >= self.config["throttle_share"]:
+            return False
+        self.count("throttled")
+        retry_ms = self.config["retry_after_ms"]
+        self.send({"error": {"message": "Rate limit reached", "type": "requests"}}, 429,
+                  {"retry-after-ms": str(retry_ms), "Retry-After": str(max(1, round(retry_ms / 1000)))})
+        return True
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/_bench/stats":
+            with self.lock:
+                return self.send(dict(self.counters))
+        if path == "/":
+            return self.send({"version": {"number": "2.19.0", "distribution": "opensearch"}})
+        if path.endswith("/_mapping"):
+            index = path.strip("/").split("/")[0]
+            if index not in self.mappings:
+                return self.send({"error": "index_not_found_exception", "status": 404}, 404)
+            return self.send({index: {"mappings": self.mappings[index]}})
+        if path.endswith("/_count"):
+            return self.send({"count": self.counters.get("indexed", 0)})
+        self.send({"error": "not found", "status": 404}, 404)
+
+    def do_HEAD(self):
+        index = self.path.split("?")[0].strip("/")
+        self.send(b"", 200 if index in self.mappings else 404)
+
+    def do_PUT(self):
+        path = self.path.split("?")[0]
+        body = self.read_body()
+        if path.startswith("/_search/pipeline/"):
+            return self.send({"acknowledged": True})
+        if "/_doc/" in path:
+            return self.index_document(path)
+        index = path.strip("/")
+        self.mappings[index] = (json.loads(body) if body else {}).get("mappings", {})
+        self.send({"acknowledged": True, "index": index})
+
+    def do_DELETE(self):
+        self.read_body()
+        self.mappings.pop(self.path.split("?")[0].strip("/"), None)
+        self.send({"acknowledged": True})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        body = self.read_body()
+        if path == "/_bench/reset":
+            with self.lock:
+                self.counters.clear()
+            self.mappings.clear()
+            return self.send({"acknowledged": True})
+        if path.startswith("/general/"):
+            return self.partition(body)
+        if path == "/v1/embeddings":
+            return self.embeddings(json.loads(body))
+        if path == "/v1/chat/completions":
+            return self.chat(json.loads(body))
+        if path.endswith("/_bulk"):
+            return self.bulk(body)
+        if "/_doc" in path:
+            return self.index_document(path)
+        if path.endswith("/_delete_by_query"):
+            return self.send({"deleted": 0})
+        if path.endswith("/_count"):
+            return self.send({"count": self.counters.get("indexed", 0)})
+        # _refresh, _forcemerge, _settings and other housekeeping
+        self.send({"acknowledged": True, "_shards": {"total": 1, "successful": 1, "failed": 0}})
+
+    def partition(self, body: bytes):
+        """One element per paragraph of the uploaded file."""
+        time.sleep(self.config["parse_latency"])
+        self.count("partition_requests")
+        boundary = self.headers["Content-Type"].split("boundary=")[1].encode()
+        name, text = "upload", ""
+        for part in body.split(b"--" + boundary):
+            headers, _, content = part.partition(b"\r\n\r\n")
+            if b'name="files"' in headers:
+                name = headers.split(b'filename="')[1].split(b'"')[0].decode()
+                text = content[:-2].decode("utf-8")
+        elements = [
+            {
+                "type": "CompositeElement",
+                "element_id": f"{name}-{i}",
+                "text": paragraph,
+                "metadata": {"filename": name, "filetype": "text/markdown", "languages": ["eng"], "page_number": 1},
+            }
+            for i, paragraph in enumerate(p for p in text.split("\n\n") if p.strip())
+        ]
+        self.count("elements", len(elements))
+        self.send(json.dumps(elements).encode())
+
+    def embeddings(self, request: dict):
+        time.sleep(self.config["embedding_latency"])
+        self.count("embedding_requests")
+        if self.throttled():
+            return
+        texts = request["input"] if isinstance(request["input"], list) else [request["input"]]
+        dimension = request.get("dimensions") or MODEL_DIMENSIONS.get(request.get("model"), DEFAULT_DIMENSION)
+        if dimension not in self.vectors:
+            # Serialized once: JSON encoding of the response shouldn't dominate the fake's CPU time
+            rng = random.Random(dimension)
+            self.vectors[dimension] = json.dumps([round(rng.gauss(0, 0.03), 9) for _ in range(dimension)]).encode()
+        vector = self.vectors[dimension]
+        data = b",".join(
+            b'{"object":"embedding","index":%d,"embedding":%s}' % (i, vector) for i in range(len(texts))
+        )
+        tokens = sum(len(text) // 4 for text in texts)
+        self.count("embedded", len(texts))
+        self.send(b'{"object":"list","data":[%s],"model":%s,"usage":{"prompt_tokens":%d,"total_tokens":%d}}'
+                  % (data, json.dumps(request.get("model", "")).encode(), tokens, tokens))
+
+    def chat(self, request: dict):
+        """Keyword extraction answers: the first distinct longer words of each chunk."""
+        time.sleep(self.config["chat_latency"])
+        self.count("chat_requests")
+        if self.throttled():
+            return
+        try:
+            chunks = json.loads(request["messages"][-1]["content"])
+        except ValueError:
+            chunks = []
+        keywords = {}
+        for chunk in chunks if isinstance(chunks, list) else []:
+            words = [word.strip(".,").lower() for word in chunk.get("text", "").split() if len(word) > 5]
+            keywords[chunk.get("id")] = list(dict.fromkeys(words))[:8]
+        self.send({"choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(keywords)}}]})
+
+    def bulk(self, body: bytes):
+        time.sleep(self.config["index_latency"])
+        self.count("bulk_requests")
+        self.count("bulk_body_bytes", len(body))
+        self.count("bulk_wire_bytes", int(self.headers.get("Content-Length") or 0))
+        items = []
+        lines = iter(body.splitlines())
+        for line in lines:
+            if not line.strip():
+                continue
+            op, meta = next(iter(json.loads(line).items()))
+            if op != "delete":
+                next(lines, None)
+            items.append({op: {"_index": meta.get("_index", INDEX_NAME), "_id": meta.get("_id"),
+                               "status": 201, "result": "created"}})
+        self.count("indexed", len(items))
+        self.send({"took": 1, "errors": False, "items": items})
+
+    def index_document(self, path: str):
+        time.sleep(self.config["index_latency"])
+        self.count("index_requests")
+        self.count("indexed")
+        index, _, doc_id = path.strip("/").partition("/_doc/")
+        self.send({"_index": index, "_id": doc_id, "result": "created"}, 201)
+
+
+def serve(config: dict, conn):
+    """Run the fake services until the process is terminated; sends the port through conn."""
+    FakeServices.config = config
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeServices)
+    server.daemon_threads = True
+    conn.send(server.server_address[1])
+    server.serve_forever()
+
+
+# ===========================================
+# Corpus and measurement
+# ===========================================
+
+def write_corpus(directory: Path, chunks: int, chunks_per_file: int) -> int:
+    """Write `chunks` synthetic chunks as Markdown files, one paragraph each; returns the file count."""
+    files = 0
+    for start in range(0, chunks, chunks_per_file):
+        count = min(chunks_per_file, chunks - start)
+        text = "\n\n".join(synthetic_corpus(count, seed=files))
+        (directory / f"bench_{files:05d}.md").write_text(text + "\n", encoding="utf-8")
+        files += 1
+    return files
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def install_stage_timers(ingest, timings: dict[str, list[float]], encoding: dict[str, float]):
+    """Time API requests, OpenSearch requests, document building, gzip and whole files.
+    
+    JSON encoding of request bodies (one call per bulk line) is only summed up
+    in `encoding`, as a list of per-call timings would skew the peak RSS.
+    """
+    import rate_limit
+    import serialization
+    from opensearchpy import AsyncTransport, Transport
+
+    lock = threading.Lock()
+
+    def record(stage: str, seconds: float):
+        with lock:
+            timings.setdefault(stage, []).append(seconds)
+
+    def opensearch_stage(url: str) -> Optional[str]:
+        if "_bulk" in url:
+            return "opensearch bulk"
+        if "/_doc" in url:
+            return "opensearch index"
+        return None
+
+    call, call_async = rate_limit.Endpoint.call, rate_limit.Endpoint.call_async
+    perform, perform_async = Transport.perform_request, AsyncTransport.perform_request
+
+    def timed_call(self, send, tokens=0):
+        start = time.perf_counter()
+        try:
+            return call(self, send, tokens)
+        finally:
+            record(self.name, time.perf_counter() - start)
+
+    async def timed_call_async(self, send, tokens=0):
+        start = time.perf_counter()
+        try:
+            return await call_async(self, send, tokens)
+        finally:
+            record(self.name, time.perf_counter() - start)
+
+    def timed_perform(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return perform(self, method, url, *args, **kwargs)
+        finally:
+            if opensearch_stage(url):
+                record(opensearch_stage(url), time.perf_counter() - start)
+
+    async def timed_perform_async(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await perform_async(self, method, url, *args, **kwargs)
+        finally:
+            if opensearch_stage(url):
+                record(opensearch_stage(url), time.perf_counter() - start)
+
+    def timed(stage: str, function):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+        return wrapper
+
+    def timed_dumps(dumps):
+        def wrapper(self, data):
+            start = time.perf_counter()
+            try:
+                return dumps(self, data)
+            finally:
+                seconds = time.perf_counter() - start
+                with lock:
+                    encoding["seconds"] += seconds
+                    encoding["calls"] += 1
+        return wrapper
+
+    def timed_gzip_class(base, level):
+        connection_class = gzip_class(base, level)
+        connection_class._gzip_compress = timed("gzip", connection_class._gzip_compress)
+        return connection_class
+
+    gzip_class = serialization.gzip_level_connection_class
+    serialization.VectorSerializer.dumps = timed_dumps(serialization.VectorSerializer.dumps)
+    serialization.FastVectorSerializer.dumps = timed_dumps(serialization.FastVectorSerializer.dumps)
+    ingest.gzip_level_connection_class = timed_gzip_class
+    rate_limit.Endpoint.call = timed_call
+    rate_limit.Endpoint.call_async = timed_call_async
+    Transport.perform_request = timed_perform
+    AsyncTransport.perform_request = timed_perform_async
+    ingest.build_documents = timed("build documents", ingest.build_documents)
+    ingest.ingest_file = timed("file", ingest.ingest_file)
+
+
+def run_ingestion(corpus: str, url: str, port: int, ingest_args: list[str], verbose: bool) -> dict:
+    """Ingest the corpus in this (fresh) process; returns timings, run stats and peak RSS."""
+    import ingest_unstructured_opensearch as ingest
+
+    ingest.UNSTRUCTURED_API_URL = f"{url}/general/v0/general"
+    ingest.UNSTRUCTURED_API_KEY = "bench"
+    ingest.OPENAI_EMBEDDINGS_URL = f"{url}/v1/embeddings"
+    ingest.OPENAI_CHAT_URL = f"{url}/v1/chat/completions"
+    ingest.OPENAI_API_KEY = "bench"
+    ingest.OPENSEARCH_HOST = "127.0.0.1"
+    ingest.OPENSEARCH_PORT = port
+
+    timings: dict[str, list[float]] = {}
+    encoding = {"seconds": 0.0, "calls": 0}
+    install_stage_timers(ingest, timings, encoding)
+    rss_at_start = peak_rss_mb()
+
+    sys.argv = [
+        "ingest_unstructured_opensearch.py", "--dir", corpus, "--index", INDEX_NAME, "--recreate",
+        "--no-embedding-cache", "--no-keyword-cache",
+        "--partition", "api",
+        *ingest_args,
+    ]
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            # At the descriptor level, so --workers processes are quiet too
+            sys.stdout.flush()
+            saved = os.dup(1)
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, 1)
+            os.close(devnull)
+            stack.callback(os.close, saved)
+            stack.callback(os.dup2, saved, 1)
+            stack.callback(sys.stdout.flush)
+        start = time.perf_counter()
+        ingest.main()
+        seconds = time.perf_counter() - start
+
+    stages = {}
+    for stage, values in sorted(timings.items()):
+        values.sort()
+        stages[stage] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    return {
+        "seconds": round(seconds, 3),
+        "stages": stages,
+        "encode_seconds": round(encoding["seconds"], 3),
+        "run_stats": dict(ingest.RUN_STATS),
+        "rss_at_start_mb": rss_at_start,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def service_request(url: str, method: str, path: str) -> dict:
+    import httpx
+
+    return httpx.request(method, f"{url}{path}", timeout=30).json()
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_to_baseline(results: list[dict], baseline_path: str, tolerance: float) -> list[str]:
+    """Regressions in chunks/sec against an earlier --json run with the same corpus size and mode."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    previous = {(row["chunks"], row["mode"], row["ingest_args"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        before = previous.get((row["chunks"], row["mode"], row["ingest_args"]))
+        if before is None:
+            continue
+        ratio = row["chunks_per_sec"] / before["chunks_per_sec"] if before["chunks_per_sec"] else 1.0
+        row["baseline_ratio"] = round(ratio, 3)
+        if ratio < 1 - tolerance:
+            regressions.append(f"{row['chunks']} chunks ({row['mode']}): {row['chunks_per_sec']:,.0f} chunks/sec, "
+                               f"{(1 - ratio) * 100:.1f}% below {before['chunks_per_sec']:,.0f} "
+                               f"({baseline.get('revision') or baseline_path})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end ingestion against local fake services")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 10000], help="Corpus sizes to ingest (chunks)")
+    parser.add_argument("--chunks-per-file", type=int, default=1000, help="Chunks per synthetic file")
+    parser.add_argument("--mode", choices=list(MODES), default="bulk", help="Indexing mode of the ingestion script")
+    parser.add_argument("--ingest-args", type=str, default="", help="Extra ingestion flags, e.g. \"--workers 4 --llm-keywords\"")
+    parser.add_argument("--parse-latency-ms", type=float, default=100, help="Unstructured response latency")
+    parser.add_argument("--embedding-latency-ms", type=float, default=100, help="Embeddings response latency")
+    parser.add_argument("--chat-latency-ms", type=float, default=300, help="Keyword chat completion latency")
+    parser.add_argument("--index-latency-ms", type=float, default=10, help="OpenSearch bulk/index response latency")
+    parser.add_argument("--throttle-share", type=float, default=0.0, help="Share of OpenAI requests answered with 429")
+    parser.add_argument("--retry-after-ms", type=int, default=200, help="Retry-After sent with injected 429s")
+    parser.add_argument("--baseline", type=str, help="Earlier --json output to compare chunks/sec against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed chunks/sec drop against --baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the ingestion script's output")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    config = {
+        "parse_latency": args.parse_latency_ms / 1000,
+        "embedding_latency": args.embedding_latency_ms / 1000,
+        "chat_latency": args.chat_latency_ms / 1000,
+        "index_latency": args.index_latency_ms / 1000,
+        "throttle_share": args.throttle_share,
+        "retry_after_ms": args.retry_after_ms,
+    }
+    ingest_args = MODES[args.mode] + shlex.split(args.ingest_args)
+
+    # Services and each ingestion run get their own process: the fakes don't
+    # compete for the GIL, and peak RSS is that of one run
+    ctx = multiprocessing.get_context("spawn")
+    receiver, sender = ctx.Pipe(duplex=False)
+    services = ctx.Process(target=serve, args=(config, sender), daemon=True)
+    services.start()
+    port = receiver.recv()
+    url = f"http://127.0.0.1:{port}"
+
+    results = []
+    try:
+        for chunks in args.chunks:
+            with tempfile.TemporaryDirectory(prefix="bench_ingest_") as tmp:
+                corpus = Path(tmp) / "corpus"
+                corpus.mkdir()
+                files = write_corpus(corpus, chunks, args.chunks_per_file)
+                service_request(url, "POST", "/_bench/reset")
+                if not args.json:
+                    print(f"[INFO] Ingesting {chunks:,} chunks in {files} files ({args.mode})...", file=sys.stderr)
+
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    run = pool.submit(run_ingestion, str(corpus), url, port, ingest_args, args.verbose).result()
+                served = service_request(url, "GET", "/_bench/stats")
+
+            indexed = served.get("indexed", 0)
+            results.append({
+                "chunks": chunks,
+                "files": files,
+                "mode": args.mode,
+                "ingest_args": args.ingest_args,
+                "seconds": run["seconds"],
+                "indexed": indexed,
+                "chunks_per_sec": round(indexed / run["seconds"], 1) if run["seconds"] else 0.0,
+                # Bulk request bytes before and after gzip, and client-side JSON encoding time
+                "bytes_per_doc": round(served.get("bulk_body_bytes", 0) / indexed) if indexed else 0,
+                "wire_bytes_per_doc": round(served.get("bulk_wire_bytes", 0) / indexed) if indexed else 0,
+                "encode_us_per_doc": round(run["encode_seconds"] / indexed * 1e6, 1) if indexed else 0.0,
+                "peak_rss_mb": run["peak_rss_mb"],
+                "rss_at_start_mb": run["rss_at_start_mb"],
+                "stages": run["stages"],
+                "requests": served,
+                "run_stats": run["run_stats"],
+            })
+    finally:
+        services.terminate()
+
+    regressions = compare_to_baseline(results, args.baseline, args.tolerance) if args.baseline else []
+
+    if args.json:
+        print(json.dumps({
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "services": config,
+            "results": results,
+            "regressions": regressions,
+        }, indent=2))
+    else:
+        for row in results:
+            ratio = f", {row['baseline_ratio']:.2f}x baseline" if "baseline_ratio" in row else ""
+            print(f"\n{row['chunks']:,} chunks ({row['files']} files, {row['mode']}): "
+                  f"{row['chunks_per_sec']:,.0f} chunks/sec, {row['indexed']:,} indexed in {row['seconds']:.1f}s, "
+                  f"peak RSS {row['peak_rss_mb']} MB{ratio}")
+            if row["bytes_per_doc"]:
+                print(f"   bulk bodies: {row['bytes_per_doc']:,} bytes/doc ({row['wire_bytes_per_doc']:,} gzipped), "
+                      f"JSON encoding {row['encode_us_per_doc']:.1f} µs/doc")
+            print(f"   {'stage':<20} {'count':>8} {'p50 ms':>10} {'p99 ms':>10}")
+            for stage, timing in row["stages"].items():
+                print(f"   {stage:<20} {timing['count']:>8} {timing['p50_ms']:>10.1f} {timing['p99_ms']:>10.1f}")
+            if row["requests"].get("throttled"):
+                print(f"   429s injected: {row['requests']['throttled']}")
+        for regression in regressions:
+            print(f"[WARN] Regression: {regression}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for heuristic keyword extraction.
+
+Compares the original per-call extractor (regexes compiled and stopword set
+rebuilt on every call) with keyword_extraction, on:
+- the NovaPay guides in data/, chunked like the ingestion script (1000 chars, 200 overlap)
+- a synthetic corpus of short support-style chunks (100k by default)
+
+Usage:
+    python scripts/bench_keywords.py
+    python scripts/bench_keywords.py --synthetic-chunks 20000 --repeat 5 --json
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+import keyword_extraction
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+
+def extract_keywords_legacy(text: str) -> list[str]:
+    """The extractor as originally shipped in ingest_unstructured_opensearch.py (the baseline)."""
+    import re
+
+    keywords = set()
+
+    caps_pattern = r'\b[A-Z][A-Za-z]*(?:\s+[A-Z][A-Za-z]*)*\b'
+    for match in re.findall(caps_pattern, text):
+        if len(match) >= 2 and match.lower() not in {'the', 'a', 'an', 'in', 'on', 'at', 'to', 'for', 'of', 'and', 'or', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'shall', 'can', 'need', 'dare', 'ought', 'used', 'this', 'that', 'these', 'those', 'we', 'our', 'they', 'their', 'it', 'its', 'he', 'she', 'his', 'her', 'i', 'you', 'your', 'my', 'me', 'us', 'them', 'who', 'what', 'which', 'when', 'where', 'why', 'how', 'all', 'each', 'every', 'both', 'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 'just', 'but', 'if', 'because', 'as', 'until', 'while', 'although', 'though', 'after', 'before', 'since', 'unless', 'however', 'therefore', 'thus', 'hence', 'also', 'still', 'yet', 'even', 'here', 'there', 'then', 'now', 'abstract', 'introduction', 'conclusion', 'references', 'figure', 'table'}:
+            keywords.add(match.lower())
+
+    acronyms = re.findall(r'\b[A-Z]{2,5}\b', text)
+    for acr in acronyms:
+        if acr.lower() not in {'ii', 'iii', 'iv', 'vi', 'vii', 'viii', 'ix', 'xi', 'xii'}:
+            keywords.add(acr)
+
+    num_pattern = r'(\d+\.?\d*)\s*(%|BLEU|days?|hours?|layers?|heads?|dimensions?|parameters?)'
+    for match in re.findall(num_pattern, text, re.IGNORECASE):
+        keywords.add(f"{match[0]} {match[1]}".strip())
+
+    hyphen_terms = re.findall(r'\b[a-zA-Z]+-[a-zA-Z]+(?:-[a-zA-Z]+)*\b', text)
+    for term in hyphen_terms:
+        if len(term) >= 5:
+            keywords.add(term.lower())
+
+    camel_case = re.findall(r'\b[a-z]+[A-Z][a-zA-Z]*\b', text)
+    for term in camel_case:
+        keywords.add(term)
+
+    return list(keywords)[:15]
+
+
+def chunk_text(text: str, size: int = 1000, overlap: int = 200) -> list[str]:
+    """Fixed-size character chunks with overlap, approximating the ingest chunking."""
+    step = size - overlap
+    return [text[start:start + size] for start in range(0, max(len(text) - overlap, 1), step)]
+
+
+def novapay_corpus() -> list[str]:
+    chunks = []
+    for path in sorted(DATA_DIR.glob("NovaPay*.md")):
+        chunks.extend(chunk_text(path.read_text(encoding="utf-8")))
+    return chunks
+
+
+def synthetic_corpus(count: int, seed: int = 42) -> list[str]:
+    """Support-KB-like chunks mixing every pattern the extractor looks for."""
+    rng = random.Random(seed)
+    terms = ["NovaPay", "Instant Transfer", "Debit Card", "Support Team", "Account Settings",
+             "OpenSearch", "Mobile App", "Fraud Alert", "Direct Deposit", "Savings Vault"]
+    acronyms = ["ATM", "PIN", "ACH", "KYC", "FDIC", "API", "SMS", "IBAN", "OTP", "APR"]
+    hyphenated = ["two-factor", "real-time", "follow-up", "cross-border", "peer-to-peer", "self-service"]
+    camel = ["autoPay", "cardLock", "quickSend", "billSplit"]
+    units = ["%", "days", "hours", "business days", "dimensions"]
+    filler = ("the customer can review their balance and contact us if a payment does not arrive "
+              "within the expected window after it was submitted").split()
+
+    chunks = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(8, 14)):
+            parts.extend(rng.sample(filler, 6))
+            kind = rng.randrange(5)
+            if kind == 0:
+                parts.append(rng.choice(terms))
+            elif kind == 1:
+                parts.append(rng.choice(acronyms))
+            elif kind == 2:
+                parts.append(rng.choice(hyphenated))
+            elif kind == 3:
+                parts.append(rng.choice(camel))
+            else:
+                parts.append(f"{rng.randint(1, 99)}.{rng.randint(0, 9)} {rng.choice(units)}")
+        chunks.append(" ".join(parts) + ".")
+    return chunks
+
+
+def best_rate(run, chunks: list[str], repeat: int) -> float:
+    """Best-of-N throughput in chunks/sec."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(chunks)
+        best = min(best, time.perf_counter() - start)
+    return len(chunks) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark heuristic keyword extraction")
+    parser.add_argument("--synthetic-chunks", type=int, default=100_000, help="Size of the synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    corpora = {
+        "novapay": novapay_corpus(),
+        f"synthetic_{args.synthetic_chunks}": synthetic_corpus(args.synthetic_chunks),
+    }
+    implementations = {
+        "legacy": lambda chunks: [extract_keywords_legacy(text) for text in chunks],
+        "precompiled": lambda chunks: [keyword_extraction.extract_keywords(text) for text in chunks],
+        "precompiled_batch": keyword_extraction.extract_keywords_batch,
+    }
+
+    results = []
+    for corpus_name, chunks in corpora.items():
+        # The new extractor must be deterministic run to run
+        first = keyword_extraction.extract_keywords_batch(chunks)
+        deterministic = first == keyword_extraction.extract_keywords_batch(chunks)
+        baseline = None
+        for impl_name, run in implementations.items():
+            rate = best_rate(run, chunks, args.repeat)
+            baseline = baseline or rate
+            results.append({
+                "corpus": corpus_name,
+                "chunks": len(chunks),
+                "implementation": impl_name,
+                "chunks_per_sec": round(rate, 1),
+                "speedup": round(rate / baseline, 2),
+                "deterministic": deterministic if impl_name != "legacy" else None,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'corpus':<20} {'chunks':>8} {'implementation':<18} {'chunks/sec':>12} {'speedup':>8}")
+    for row in results:
+        print(f"{row['corpus']:<20} {row['chunks']:>8} {row['implementation']:<18} "
+              f"{row['chunks_per_sec']:>12,.0f} {row['speedup']:>7.2f}x")
+    print(f"\nDeterministic output: {all(r['deterministic'] is not False for r in results)}")
+
+
+if __name__ == "__main__":
+    main()
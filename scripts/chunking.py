@@ -0,0 +1,169 @@
+"""
+Local by_title chunking for elements partitioned without a chunking strategy.
+
+Follows the semantics of Unstructured's by_title chunker so locally chunked
+documents look like the ones the API returns with chunking_strategy=by_title:
+- a Title starts a new section; sections never share a chunk unless the first
+  one is shorter than combine_text_under_n_chars and both fit in max_characters
+- elements are joined with a blank line into CompositeElement chunks of at most
+  max_characters (soft limit: new_after_n_chars)
+- Tables are chunked on their own (Table, or TableChunk pieces if oversized)
+- an element longer than max_characters is split on whitespace and each piece
+  repeats the last `overlap` characters of the previous one (is_continuation)
+- a chunk's parent_id is the parent_id of its first element below a Title
+  (the Title its text sits under), so chunks of split PDFs keep the section
+  links pdf_split.stitch_elements restores across range boundaries
+
+Used when elements are stitched together from several partition requests, so
+sections and overlap are computed across request boundaries.
+"""
+import hashlib
+from typing import Optional
+
+SEPARATOR = "\n\n"
+
+# Chunk metadata is taken from the first element of the chunk (parent_id: see chunk_metadata)
+CHUNK_METADATA_KEYS = ("filename", "filetype", "page_number", "languages")
+
+
+def split_text(text: str, max_characters: int, overlap: int) -> list[str]:
+    """Split text into pieces of at most max_characters, cutting on whitespace where possible."""
+    pieces = []
+    start = 0
+    while len(text) - start > max_characters:
+        end = start + max_characters
+        cut = max(text.rfind(" ", start + 1, end), text.rfind("\n", start + 1, end))
+        if cut <= start + overlap:
+            # No usable whitespace in the window: hard cut
+            cut = end
+        pieces.append(text[start:cut].strip())
+        # Start the next piece `overlap` characters back, at a word boundary
+        start = cut - overlap
+        if overlap and start > 0 and not text[start - 1].isspace():
+            boundary = text.find(" ", start, cut)
+            if boundary != -1:
+                start = boundary + 1
+    pieces.append(text[start:].strip())
+    return [piece for piece in pieces if piece]
+
+
+def element_text(element: dict) -> str:
+    return (element.get("text") or "").strip()
+
+
+def pre_chunks(
+    elements: list[dict],
+    max_characters: int,
+    new_after_n_chars: int,
+    multipage_sections: bool,
+) -> list[tuple[list[dict], int]]:
+    """Group elements into (elements, text length) runs that respect section boundaries."""
+    groups = []
+    current, length, page, current_is_table = [], 0, None, False
+    for element in elements:
+        text = element_text(element)
+        if not text:
+            continue
+        element_page = (element.get("metadata") or {}).get("page_number")
+        is_table = element.get("type") == "Table"
+        starts_section = (
+            element.get("type") == "Title"
+            or is_table
+            or current_is_table
+            or (not multipage_sections and element_page != page)
+        )
+        too_long = length + len(SEPARATOR) + len(text) > max_characters or length >= new_after_n_chars
+        if current and (starts_section or too_long):
+            groups.append((current, length))
+            current, length = [], 0
+        length += (len(SEPARATOR) if current else 0) + len(text)
+        current.append(element)
+        page, current_is_table = element_page, is_table
+    if current:
+        groups.append((current, length))
+    return groups
+
+
+def combine_small_sections(
+    groups: list[tuple[list[dict], int]],
+    max_characters: int,
+    combine_text_under_n_chars: int,
+) -> list[list[dict]]:
+    """Merge a short run into the next one when the result still fits."""
+    combined = []
+    for group, length in groups:
+        if combined:
+            previous, previous_length = combined[-1]
+            is_table = any(element.get("type") == "Table" for element in previous + group)
+            fits = previous_length + len(SEPARATOR) + length <= max_characters
+            if not is_table and previous_length < combine_text_under_n_chars and fits:
+                combined[-1] = (previous + group, previous_length + len(SEPARATOR) + length)
+                continue
+        combined.append((group, length))
+    return [group for group, _ in combined]
+
+
+def chunk_metadata(elements: list[dict]) -> dict:
+    first = elements[0].get("metadata") or {}
+    metadata = {key: first[key] for key in CHUNK_METADATA_KEYS if first.get(key) is not None}
+    languages = []
+    for element in elements:
+        for language in (element.get("metadata") or {}).get("languages") or []:
+            if language not in languages:
+                languages.append(language)
+    if languages:
+        metadata["languages"] = languages
+    # The section the chunk's text belongs to; a chunk of only a Title keeps the Title's own parent
+    body = next((element for element in elements if element.get("type") != "Title"), elements[0])
+    parent_id = (body.get("metadata") or {}).get("parent_id")
+    if parent_id is not None:
+        metadata["parent_id"] = parent_id
+    return metadata
+
+
+def chunk_id(metadata: dict, index: int, text: str) -> str:
+    """Deterministic chunk id, so re-chunking the same elements gives the same ids."""
+    key = f"{metadata.get('filename', '')}\0{index}\0{text}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def chunk_by_title(
+    elements: list[dict],
+    max_characters: int = 500,
+    overlap: int = 0,
+    combine_text_under_n_chars: Optional[int] = None,
+    new_after_n_chars: Optional[int] = None,
+    multipage_sections: bool = True,
+) -> list[dict]:
+    """Chunk partitioned elements (Unstructured JSON dicts) by section title."""
+    if combine_text_under_n_chars is None:
+        combine_text_under_n_chars = max_characters
+    if new_after_n_chars is None:
+        new_after_n_chars = max_characters
+
+    groups = pre_chunks(elements, max_characters, new_after_n_chars, multipage_sections)
+    chunks = []
+    for group in combine_small_sections(groups, max_characters, combine_text_under_n_chars):
+        metadata = chunk_metadata(group)
+        is_table = group[0].get("type") == "Table"
+        text = SEPARATOR.join(element_text(element) for element in group)
+        if is_table and len(text) <= max_characters:
+            pieces, chunk_type = [text], "Table"
+            text_as_html = (group[0].get("metadata") or {}).get("text_as_html")
+            if text_as_html:
+                metadata["text_as_html"] = text_as_html
+        elif is_table:
+            pieces, chunk_type = split_text(text, max_characters, overlap), "TableChunk"
+        else:
+            pieces, chunk_type = split_text(text, max_characters, overlap), "CompositeElement"
+        for n, piece in enumerate(pieces):
+            piece_metadata = dict(metadata)
+            if n > 0:
+                piece_metadata["is_continuation"] = True
+            chunks.append({
+                "type": chunk_type,
+                "element_id": chunk_id(metadata, len(chunks), piece),
+                "text": piece,
+                "metadata": piece_metadata,
+            })
+    return chunks
@@ -0,0 +1,159 @@
+"""
+Duplicate and near-duplicate chunk detection for the ingestion script.
+
+Chunks are compared after parsing and before embedding:
+- exact duplicates: same text after lowercasing and collapsing punctuation and
+  whitespace (a BLAKE2b hash)
+- near duplicates: MinHash signatures over word 3-gram shingles, bucketed with
+  LSH (banding), and confirmed when the estimated Jaccard similarity is at least
+  the threshold
+
+The first chunk seen is the canonical one; later duplicates are reported with
+its id. A canonical chunk that fails to embed or index is forgotten, so the
+next copy becomes canonical in its place. State lives in memory for one run (one process with --workers), about
+0.5 KB per canonical chunk with the default 128 permutations.
+
+Needs numpy, imported when the first chunk is checked.
+"""
+import hashlib
+import re
+import threading
+from typing import Optional
+
+WORD_RE = re.compile(r"\w+")
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalized_words(text: str) -> list[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def shingle_hashes(words: list[str], size: int) -> list[int]:
+    """32-bit hashes of the text's word `size`-grams (the whole text if shorter)."""
+    if len(words) <= size:
+        grams = [" ".join(words)]
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return [int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=4).digest(), "little") for gram in grams]
+
+
+def lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """(bands, rows) whose LSH S-curve best separates similarities around threshold.
+
+    Minimizes the probability mass of false positives below the threshold plus
+    false negatives above it (numerical integration). Candidates are verified
+    against the full signature, so a false positive only costs a comparison and
+    false negatives weigh more.
+    """
+    def integrate(f, a, b, steps=50):
+        if b <= a:
+            return 0.0
+        width = (b - a) / steps
+        return sum(f(a + (i + 0.5) * width) for i in range(steps)) * width
+
+    best = (1, num_perm)
+    best_error = float("inf")
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_positives = integrate(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+            false_negatives = integrate(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+            error = 0.3 * false_positives + 0.7 * false_negatives
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class ChunkDeduplicator:
+    """Finds chunks that repeat (exactly or nearly) a chunk seen earlier in the run."""
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        import numpy as np
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._np = np
+
+        self.exact = 0
+        self.near = 0
+        self._exact_ids: dict[bytes, str] = {}
+        self._exact_keys: dict[str, bytes] = {}
+        self._signatures: dict[str, "np.ndarray"] = {}
+        # Canonical chunk id -> duplicates matched to it so far
+        self._matched: dict[str, int] = {}
+        self._buckets: list[dict[bytes, list[str]]] = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+
+    def signature(self, words: list[str]):
+        """MinHash signature (uint32 per permutation) of a chunk's shingles."""
+        np = self._np
+        hashes = np.array(shingle_hashes(words, self.shingle_size), dtype=np.uint64)
+        # Universal hashing (a*x + b) mod p per permutation; uint64 products wrap like datasketch's
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self._a) + self._b) % np.uint64(MERSENNE_PRIME)
+        return (permuted.min(axis=0) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    def band_keys(self, signature) -> list[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def check(self, text: str, chunk_id: str) -> Optional[tuple[str, str]]:
+        """Return (canonical chunk id, "exact" or "near") for a duplicate.
+
+        Returns None for a new chunk, which becomes the canonical one for
+        chunks that repeat it later.
+        """
+        words = normalized_words(text)
+        exact_key = hashlib.blake2b(" ".join(words).encode(), digest_size=16).digest()
+        with self._lock:
+            canonical = self._exact_ids.get(exact_key)
+            if canonical is not None:
+                self.exact += 1
+                self._matched[canonical] = self._matched.get(canonical, 0) + 1
+                return canonical, "exact"
+
+        signature = self.signature(words)
+        band_keys = self.band_keys(signature)
+        with self._lock:
+            seen = set()
+            for buckets, key in zip(self._buckets, band_keys):
+                for candidate in buckets.get(key, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    if (self._signatures[candidate] == signature).mean() >= self.threshold:
+                        self.near += 1
+                        self._matched[candidate] = self._matched.get(candidate, 0) + 1
+                        return candidate, "near"
+
+            self._exact_ids[exact_key] = chunk_id
+            self._exact_keys[chunk_id] = exact_key
+            self._signatures[chunk_id] = signature
+            for buckets, key in zip(self._buckets, band_keys):
+                buckets.setdefault(key, []).append(chunk_id)
+        return None
+
+    def forget(self, chunk_id: str) -> int:
+        """Stop using a canonical chunk (it failed to embed or index).
+
+        Later copies of its text are new chunks again. Returns how many
+        duplicates were already matched to it; those were skipped or linked
+        to a chunk that isn't in the index.
+        """
+        with self._lock:
+            signature = self._signatures.pop(chunk_id, None)
+            if signature is None:
+                return 0
+            exact_key = self._exact_keys.pop(chunk_id)
+            if self._exact_ids.get(exact_key) == chunk_id:
+                del self._exact_ids[exact_key]
+            for buckets, key in zip(self._buckets, self.band_keys(signature)):
+                bucket = buckets.get(key)
+                if bucket and chunk_id in bucket:
+                    bucket.remove(chunk_id)
+                    if not bucket:
+                        del buckets[key]
+            return self._matched.pop(chunk_id, 0)
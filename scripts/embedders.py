@@ -0,0 +1,291 @@
+"""
+Embedding backends for the ingestion script.
+
+The backend is picked from the embedding model name (EMBEDDING_MODEL or
+--embedding-model):
+- "text-embedding-3-small" etc.: OpenAI embeddings API (default)
+- "local:<model>": a sentence-transformers model run on the local CPU, e.g.
+  "local:sentence-transformers/all-MiniLM-L6-v2" or "local:/models/bge-small"
+  (needs `pip install sentence-transformers`; works offline once the model is
+  downloaded or copied to a local path)
+- "hash:<dimension>": deterministic feature-hashing vectors, no model and no
+  network; for tests and pipeline smoke runs, not for search quality
+
+Every backend returns float32 array("f") vectors and reports its dimension,
+which the index schema follows. With `dimensions` set, text-embedding-3 models
+are asked for shortened embeddings; local models trained with Matryoshka
+representation learning (MATRYOSHKA_LOCAL_MODELS) and hash vectors keep the
+first `dimensions` values and re-normalize (the same thing the OpenAI API does
+server-side). Other models are refused: cutting an embedding that wasn't
+trained to be cut loses far more recall than the smaller index is worth.
+"""
+import asyncio
+import hashlib
+import math
+import os
+import re
+import threading
+from array import array
+from typing import Optional
+
+import httpx
+
+import rate_limit
+
+OPENAI_MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+# Models that accept the `dimensions` request parameter
+OPENAI_SHORTENABLE_MODELS = {"text-embedding-3-small", "text-embedding-3-large"}
+
+# Local models trained so that a prefix of the embedding is an embedding
+# itself (Matryoshka representation learning), by name or local directory name
+MATRYOSHKA_LOCAL_MODELS = {
+    "nomic-ai/nomic-embed-text-v1.5",
+    "mixedbread-ai/mxbai-embed-large-v1",
+    "Snowflake/snowflake-arctic-embed-m-v1.5",
+    "tomaarsen/mpnet-base-nli-matryoshka",
+}
+
+LOCAL_PREFIX = "local:"
+HASH_PREFIX = "hash:"
+
+
+class Embedder:
+    """Turns batches of texts into float32 vectors of a fixed dimension."""
+
+    model = ""
+    dimension = 0
+
+    def embed(self, texts: list[str]) -> list[array]:
+        raise NotImplementedError
+
+    async def embed_async(self, http: httpx.AsyncClient, texts: list[str]) -> list[array]:
+        """Embed without blocking the event loop (local backends run in a thread)."""
+        return await asyncio.to_thread(self.embed, texts)
+
+    def close(self):
+        """Release connections or other resources held between batches."""
+
+
+class OpenAIEmbedder(Embedder):
+    """OpenAI embeddings API; one HTTP request per batch.
+
+    Requests go through `endpoint` (see rate_limit.py) for rate limiting and
+    retries when one is given. embed() sends them on one pooled httpx.Client
+    per process, created on first use, so batches and repeated queries reuse
+    their connections; embed_async() uses the caller's AsyncClient.
+    """
+
+    def __init__(self, model: str, api_key: str, url: str, timeout: float = 60.0, dimensions: int = 0,
+                 endpoint: Optional[rate_limit.Endpoint] = None):
+        self.model = model
+        self.dimension = dimensions or OPENAI_MODEL_DIMENSIONS.get(model, 1536)
+        self.dimensions = dimensions
+        self.api_key = api_key
+        self.url = url
+        self.timeout = timeout
+        self.endpoint = endpoint
+        self._http: Optional[httpx.Client] = None
+        self._http_pid = 0
+        self._lock = threading.Lock()
+
+    def http_client(self) -> httpx.Client:
+        """The shared client of this process (a forked --workers process gets its own)."""
+        with self._lock:
+            if self._http is None or self._http_pid != os.getpid():
+                self._http = httpx.Client()
+                self._http_pid = os.getpid()
+            return self._http
+
+    def close(self):
+        with self._lock:
+            if self._http is not None and self._http_pid == os.getpid():
+                self._http.close()
+            self._http = None
+
+    def request(self, texts: list[str]) -> dict:
+        """Keyword arguments for an embeddings request."""
+        if not self.api_key:
+            raise ValueError("OPENAI_API_KEY not set")
+        body = {"model": self.model, "input": texts}
+        if self.dimensions:
+            body["dimensions"] = self.dimensions
+        return {
+            "headers": {"Authorization": f"Bearer {self.api_key}"},
+            "json": body,
+            "timeout": self.timeout,
+        }
+
+    def parse_response(self, response: httpx.Response, count: int) -> list[array]:
+        """Extract embeddings from a response in input order."""
+        response.raise_for_status()
+
+        data = response.json()["data"]
+        if len(data) != count:
+            raise ValueError(f"Expected {count} embeddings, got {len(data)}")
+
+        # Map results back by their explicit index rather than relying on order
+        embeddings = [None] * count
+        for item in data:
+            embeddings[item["index"]] = array("f", item["embedding"])
+        return embeddings
+
+    def embed(self, texts: list[str]) -> list[array]:
+        request = self.request(texts)
+        http = self.http_client()
+        if self.endpoint is None:
+            response = http.post(self.url, **request)
+        else:
+            tokens = sum(rate_limit.estimate_tokens(text) for text in texts)
+            response = self.endpoint.call(lambda: http.post(self.url, **request), tokens=tokens)
+        return self.parse_response(response, len(texts))
+
+    async def embed_async(self, http: httpx.AsyncClient, texts: list[str]) -> list[array]:
+        request = self.request(texts)
+        if self.endpoint is None:
+            response = await http.post(self.url, **request)
+        else:
+            tokens = sum(rate_limit.estimate_tokens(text) for text in texts)
+            response = await self.endpoint.call_async(lambda: http.post(self.url, **request), tokens=tokens)
+        return self.parse_response(response, len(texts))
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Local CPU inference with a sentence-transformers model.
+
+    The model is loaded once. Each batch is encoded in one call that uses all
+    `threads` cores; calls are serialized so concurrent callers don't
+    oversubscribe the CPU.
+    """
+
+    def __init__(self, model: str, threads: int = 0, batch_size: int = 64):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("Local embeddings need sentence-transformers: pip install sentence-transformers") from e
+
+        torch.set_num_threads(threads or os.cpu_count() or 1)
+        self.model = LOCAL_PREFIX + model
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model, device="cpu")
+        self.dimension = self._model.get_sentence_embedding_dimension()
+        self._lock = threading.Lock()
+
+    def embed(self, texts: list[str]) -> list[array]:
+        with self._lock:
+            matrix = self._model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+        return [array("f", row.astype("float32").tobytes()) for row in matrix]
+
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic bag-of-words feature hashing (unit-length vectors).
+
+    Words and word bigrams are hashed with BLAKE2b into `dimension` signed
+    buckets, so the same text always gives the same vector on any machine.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.model = f"{HASH_PREFIX}{dimension}"
+        self.dimension = dimension
+
+    def embed_one(self, text: str) -> array:
+        vector = array("f", bytes(4 * self.dimension))
+        words = TOKEN_RE.findall(text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+            vector[digest % self.dimension] += 1.0 if digest >> 63 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        if norm:
+            for i, value in enumerate(vector):
+                if value:
+                    vector[i] = value / norm
+        return vector
+
+    def embed(self, texts: list[str]) -> list[array]:
+        return [self.embed_one(text) for text in texts]
+
+
+def truncate_vector(vector, dimensions: int) -> array:
+    """Keep the first `dimensions` values and rescale to unit length."""
+    truncated = array("f", vector[:dimensions])
+    norm = math.sqrt(sum(value * value for value in truncated))
+    if norm:
+        truncated = array("f", [value / norm for value in truncated])
+    return truncated
+
+
+class TruncatingEmbedder(Embedder):
+    """Shortens another backend's vectors to `dimensions` (see truncate_vector)."""
+
+    def __init__(self, inner: Embedder, dimensions: int):
+        self.inner = inner
+        self.model = inner.model
+        self.dimension = dimensions
+
+    def embed(self, texts: list[str]) -> list[array]:
+        return [truncate_vector(vector, self.dimension) for vector in self.inner.embed(texts)]
+
+    async def embed_async(self, http: httpx.AsyncClient, texts: list[str]) -> list[array]:
+        vectors = await self.inner.embed_async(http, texts)
+        return [truncate_vector(vector, self.dimension) for vector in vectors]
+
+    def close(self):
+        self.inner.close()
+
+
+def is_openai_model(model: str) -> bool:
+    return not model.startswith((LOCAL_PREFIX, HASH_PREFIX))
+
+
+def is_matryoshka_model(model: str) -> bool:
+    """Whether a local model name or path is one of MATRYOSHKA_LOCAL_MODELS."""
+    if not model.startswith(LOCAL_PREFIX):
+        return False
+    name = model[len(LOCAL_PREFIX):].rstrip("/")
+    known = {known.split("/")[-1] for known in MATRYOSHKA_LOCAL_MODELS}
+    return name in MATRYOSHKA_LOCAL_MODELS or name.split("/")[-1] in known
+
+
+def create_embedder(
+    model: str, api_key: str = "", url: str = "", threads: int = 0, dimensions: int = 0,
+    endpoint: Optional[rate_limit.Endpoint] = None,
+) -> Embedder:
+    """Build the backend for an embedding model name (see module docstring).
+
+    `dimensions` (0 = the model's own) shortens the vectors of models that
+    support it and raises ValueError for others; `endpoint` schedules the API
+    requests of OpenAI models.
+    """
+    if model.startswith(HASH_PREFIX):
+        embedder = HashingEmbedder(int(model[len(HASH_PREFIX):] or 384))
+    elif model.startswith(LOCAL_PREFIX):
+        embedder = SentenceTransformerEmbedder(model[len(LOCAL_PREFIX):], threads=threads)
+    elif model in OPENAI_SHORTENABLE_MODELS:
+        return OpenAIEmbedder(model, api_key=api_key, url=url, dimensions=dimensions, endpoint=endpoint)
+    else:
+        embedder = OpenAIEmbedder(model, api_key=api_key, url=url, endpoint=endpoint)
+
+    if not dimensions or dimensions == embedder.dimension:
+        return embedder
+    if dimensions > embedder.dimension:
+        raise ValueError(f"{model} produces {embedder.dimension}-dim vectors, can't extend to {dimensions}")
+    if not (model.startswith(HASH_PREFIX) or is_matryoshka_model(model)):
+        raise ValueError(
+            f"{model} can't be shortened to {dimensions} dimensions without losing much of its recall; "
+            f"use a text-embedding-3 model or a Matryoshka-trained local model "
+            f"({', '.join(sorted(MATRYOSHKA_LOCAL_MODELS))}), or drop --dimensions"
+        )
+    return TruncatingEmbedder(embedder, dimensions)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Hybrid (BM25 + k-NN) search over an ingested index.
+
+Queries go through the search pipeline that the ingestion script creates
+(hybrid_search_pipeline: min_max normalization, 0.4 BM25 / 0.6 vector), so
+the scores are the same blend Langflow's hybrid flow gets. Each query is:
+- a multi_match over text, title^3 and keywords^2 (BM25)
+- a knn query on vector_field with the query embedded once, by the same
+  embedding backend and dimensions the index was built with
+k and ef_search are set per request (ef_search needs OpenSearch 2.16+; older
+clusters only have the index setting). Responses leave out vector_field (or
+return only the listed fields), so no 1536-float vector comes back per hit.
+
+HybridSearcher keeps one OpenSearch client (with its connection pool) and one
+embedder for many queries; query_cache.CachedHybridSearcher adds a cache of
+repeated and paraphrased queries in front of it (--cache).
+
+Usage:
+    python scripts/hybrid_search.py "how do I reset my card PIN"
+    python scripts/hybrid_search.py "wire transfer limits" --k 5 --ef-search 200 --fields text,metadata.filename
+    python scripts/hybrid_search.py "lost card" --repeat 50 --json
+    python scripts/hybrid_search.py "lost card" --repeat 50 --cache
+"""
+import argparse
+import json
+import statistics
+import time
+from array import array
+from typing import Optional
+
+from opensearchpy import NotFoundError
+
+import embedders
+import ingest_unstructured_opensearch as ingest
+
+PIPELINE_NAME = "hybrid_search_pipeline"
+
+# BM25 fields, boosted like the index mapping (title 3x, keywords 2x)
+TEXT_FIELDS = ["text", "title^3", "keywords^2"]
+
+# Only what the search results need from the response
+FILTER_PATH = ["took", "hits.hits._id", "hits.hits._score", "hits.hits._source"]
+
+
+class HybridSearcher:
+    """Runs hybrid queries against one index, reusing a client and an embedder."""
+
+    def __init__(self, client=None, index: Optional[str] = None, pipeline: str = PIPELINE_NAME,
+                 embedder: Optional[embedders.Embedder] = None):
+        self.client = client or ingest.create_opensearch_client()
+        self.index = index or ingest.INDEX_NAME
+        self.pipeline = pipeline
+        self.embedder = embedder or ingest.current_embedder()
+
+    def check_dimension(self) -> Optional[int]:
+        """The index's vector dimension if the embedder doesn't match it, else None."""
+        dimension = ingest.index_vector_dimension(self.client, self.index)
+        if dimension is not None and dimension != self.embedder.dimension:
+            return dimension
+        return None
+
+    def embed(self, text: str) -> array:
+        return self.embedder.embed([text])[0]
+
+    def build_query(self, text: str, vector, k: int = 10, ef_search: Optional[int] = None,
+                    fields: Optional[list[str]] = None) -> dict:
+        """Body of a hybrid query for text and its embedding."""
+        knn = {"vector": vector, "k": k}
+        if ef_search:
+            knn["method_parameters"] = {"ef_search": ef_search}
+        return {
+            "size": k,
+            "_source": {"includes": fields} if fields else {"excludes": ["vector_field"]},
+            "query": {
+                "hybrid": {
+                    "queries": [
+                        {"multi_match": {"query": text, "fields": TEXT_FIELDS}},
+                        {"knn": {"vector_field": knn}},
+                    ]
+                }
+            },
+        }
+
+    def search(self, text: str, k: int = 10, ef_search: Optional[int] = None,
+               fields: Optional[list[str]] = None, vector=None) -> dict:
+        """Run a hybrid query; returns the (pruned) response with "took" and "hits".
+
+        ef_search needs OpenSearch 2.16+ (see ingest.supports_query_ef_search).
+        Pass `vector` to skip embedding the query (e.g. when it was embedded already).
+        """
+        if vector is None:
+            vector = self.embed(text)
+        response = self.client.search(
+            index=self.index,
+            body=self.build_query(text, vector, k, ef_search, fields),
+            params={"search_pipeline": self.pipeline, "filter_path": ",".join(FILTER_PATH)},
+        )
+        response.setdefault("hits", {}).setdefault("hits", [])
+        return response
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def print_hits(hits: list[dict]):
+    for rank, hit in enumerate(hits, 1):
+        source = hit.get("_source", {})
+        metadata = source.get("metadata", {})
+        where = metadata.get("filename", "")
+        if metadata.get("page_number") is not None:
+            where += f" p.{metadata['page_number']}"
+        print(f"{rank:>3}. {hit['_score']:.4f}  {where}  {hit['_id']}")
+        if source.get("title"):
+            print(f"     {source['title']}")
+        if source.get("text"):
+            snippet = " ".join(source["text"].split())
+            print(f"     {snippet[:160]}{'...' if len(snippet) > 160 else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hybrid BM25 + k-NN search through the normalization pipeline")
+    parser.add_argument("query", type=str, help="Search text")
+    parser.add_argument("--index", type=str, default=ingest.INDEX_NAME, help="Index or alias to search")
+    parser.add_argument("--pipeline", type=str, default=PIPELINE_NAME, help="Search pipeline to normalize scores")
+    parser.add_argument("--k", type=int, default=10, help="Number of results (and k of the knn query)")
+    parser.add_argument("--ef-search", type=int, default=0,
+                        help="HNSW ef_search for this query, OpenSearch 2.16+ (default: the index setting)")
+    parser.add_argument("--fields", type=str, default="",
+                        help="Comma-separated _source fields to return (default: all but vector_field)")
+    parser.add_argument("--embedding-model", type=str, default=ingest.EMBEDDING_MODEL,
+                        help="Embedding backend the index was built with (see embedders.py)")
+    parser.add_argument("--dimensions", type=int, default=ingest.EMBEDDING_DIMENSIONS,
+                        help="Shortened embedding size the index was built with (0 = the model's own)")
+    parser.add_argument("--repeat", type=int, default=1, help="Run the query N times and report latency")
+    parser.add_argument("--json", action="store_true", help="Print the response (and latencies) as JSON")
+    parser.add_argument("--cache", action="store_true", help="Answer repeated queries from the query cache")
+    parser.add_argument("--cache-threshold", type=float, default=0.95,
+                        help="Cosine similarity at which a cached query answers a new one")
+    args = parser.parse_args()
+
+    ingest.EMBEDDING_MODEL = args.embedding_model
+    ingest.EMBEDDING_DIMENSIONS = args.dimensions
+    if args.cache:
+        from query_cache import CachedHybridSearcher, QueryCache
+
+        embedder = ingest.current_embedder()
+        searcher = CachedHybridSearcher(index=args.index, pipeline=args.pipeline, embedder=embedder,
+                                        cache=QueryCache(embedder.dimension, threshold=args.cache_threshold))
+    else:
+        searcher = HybridSearcher(index=args.index, pipeline=args.pipeline)
+    mismatch = searcher.check_dimension()
+    if mismatch:
+        print(f"[ERROR] '{args.index}' holds {mismatch}-dim vectors but {args.embedding_model} "
+              f"produces {searcher.embedder.dimension}; pass the model/--dimensions used for ingestion")
+        return
+    if args.ef_search and not ingest.supports_query_ef_search(searcher.client):
+        version = ".".join(map(str, ingest.opensearch_version(searcher.client)))
+        print(f"[ERROR] --ef-search needs OpenSearch 2.16 or later (connected to {version}); "
+              f"set {ingest.KNN_EF_SEARCH_SETTING} on '{args.index}' instead")
+        return
+
+    fields = [field.strip() for field in args.fields.split(",") if field.strip()] or None
+    embed_seconds = []
+    search_seconds = []
+    took_ms = []
+    response = {}
+    try:
+        for _ in range(max(1, args.repeat)):
+            start = time.perf_counter()
+            # The cached searcher embeds only when the exact tier misses, so that counts as search time
+            vector = None if args.cache else searcher.embed(args.query)
+            embedded = time.perf_counter()
+            response = searcher.search(args.query, k=args.k, ef_search=args.ef_search or None,
+                                       fields=fields, vector=vector)
+            embed_seconds.append(embedded - start)
+            search_seconds.append(time.perf_counter() - embedded)
+            took_ms.append(response.get("took", 0))
+    except NotFoundError as e:
+        print(f"[ERROR] Search failed: {e}")
+        print(f"   (Index '{args.index}' and pipeline '{args.pipeline}' are created by ingest_unstructured_opensearch.py)")
+        return
+    finally:
+        searcher.embedder.close()
+
+    latency = {
+        "queries": len(search_seconds),
+        "embed_ms_p50": round(statistics.median(embed_seconds) * 1000, 2),
+        "search_ms_p50": round(statistics.median(search_seconds) * 1000, 2),
+        "search_ms_p99": round(percentile(search_seconds, 0.99) * 1000, 2),
+        "took_ms_p50": statistics.median(took_ms),
+    }
+    if args.cache:
+        latency["cache"] = searcher.cache.stats()
+    if args.json:
+        print(json.dumps({"hits": response["hits"]["hits"], "latency": latency}, indent=2))
+        return
+
+    print_hits(response["hits"]["hits"])
+    if args.repeat > 1:
+        print(f"\n[OK] {latency['queries']} queries: embed p50 {latency['embed_ms_p50']} ms, "
+              f"search p50 {latency['search_ms_p50']} ms / p99 {latency['search_ms_p99']} ms "
+              f"(OpenSearch took p50 {latency['took_ms_p50']} ms)")
+    if args.cache:
+        stats = latency["cache"]
+        print(f"[OK] Query cache: {stats['exact_hits']} exact hits, {stats['semantic_hits']} semantic hits, "
+              f"{stats['misses']} misses")
+
+
+if __name__ == "__main__":
+    main()
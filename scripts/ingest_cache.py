@@ -0,0 +1,210 @@
+"""
+On-disk caches for the ingestion script.
+
+Embeddings are stored in a single SQLite file keyed by a hash of
+(model, dimension, chunk text), so re-ingesting unchanged content - or
+rebuilding the index with --recreate - never pays for the same vector twice.
+Vectors are stored as packed little-endian float32 blobs (4 bytes/dim) and the
+file is kept under a size budget by evicting the least recently used entries.
+
+LLM-extracted keywords are content-addressed too, keyed by (model, chunk text),
+so --llm-keywords never pays twice for the same chunk. Keyword lists are tiny,
+so that cache is not size-bounded.
+"""
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Optional
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Open a cache database shared across threads (and --workers processes)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), check_same_thread=False, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def pack_vector(vector) -> bytes:
+    """Pack a vector as little-endian float32 bytes."""
+    packed = array("f", vector)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_vector(blob: bytes) -> array:
+    """Unpack little-endian float32 bytes into a float32 array."""
+    unpacked = array("f")
+    unpacked.frombytes(blob)
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked
+
+
+class EmbeddingCache:
+    """Content-addressed, size-bounded embedding cache backed by SQLite."""
+
+    def __init__(self, path: str, model: str, dimension: int, max_bytes: int = 1024 * 1024 * 1024):
+        self.path = Path(path)
+        self.model = model
+        self.dimension = dimension
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(key) + LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def key(self, text: str) -> bytes:
+        """Cache key for a chunk of text under the current model and dimension."""
+        return hashlib.sha256(f"{self.model}\0{self.dimension}\0{text}".encode()).digest()
+
+    def get_many(self, texts: list[str]) -> list[Optional[array]]:
+        """Look up embeddings for texts; returns None for each miss."""
+        keys = [self.key(text) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+        results = []
+        for key in keys:
+            blob = found.get(key)
+            if blob is not None and len(blob) == self.dimension * 4:
+                results.append(unpack_vector(blob))
+                self.hits += 1
+            else:
+                results.append(None)
+                self.misses += 1
+        return results
+
+    def put_many(self, texts: list[str], vectors: list[list[float]]):
+        """Store embeddings for texts, evicting old entries if over budget."""
+        now = time.time()
+        rows = [(self.key(text), pack_vector(vector), now) for text, vector in zip(texts, vectors)]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._size += sum(len(key) + len(blob) for key, blob, _ in rows)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        # Recompute - INSERT OR REPLACE may have overwritten existing rows
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(key) + LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        while self._size > target:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(key) + LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                break
+            dropped = []
+            for key, size in rows:
+                if self._size <= target:
+                    break
+                dropped.append((key,))
+                self._size -= size
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", dropped)
+            self.evictions += len(dropped)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class KeywordCache:
+    """Keyword lists cached by hash of (model, chunk text), backed by SQLite."""
+
+    def __init__(self, path: str, model: str):
+        self.path = Path(path)
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS keywords ("
+            " key BLOB PRIMARY KEY,"
+            " keywords TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def key(self, text: str) -> bytes:
+        """Cache key for a chunk of text under the current model."""
+        return hashlib.sha256(f"{self.model}\0{text}".encode()).digest()
+
+    def get_many(self, texts: list[str]) -> list[Optional[list[str]]]:
+        """Look up keyword lists for texts; returns None for each miss."""
+        keys = [self.key(text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self._conn.execute(
+                    f"SELECT key, keywords FROM keywords WHERE key IN ({placeholders})", batch
+                ).fetchall())
+
+        results = []
+        for key in keys:
+            if key in found:
+                results.append(json.loads(found[key]))
+                self.hits += 1
+            else:
+                results.append(None)
+                self.misses += 1
+        return results
+
+    def put_many(self, texts: list[str], keyword_lists: list[list[str]]):
+        """Store keyword lists for texts."""
+        rows = [(self.key(text), json.dumps(keywords)) for text, keywords in zip(texts, keyword_lists)]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO keywords (key, keywords) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -6,13 +6,33 @@ Creates proper schema for hybrid search (BM25 + Vector)
 Based on: https://docs.unstructured.io/open-source/ingestion/source-connectors/opensearch
 """
 import os
+import copy
 import json
+import time
+import re
+import asyncio
 import hashlib
+import multiprocessing
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional
 
 import httpx
-from opensearchpy import OpenSearch, helpers
+from opensearchpy import NotFoundError, OpenSearch, Urllib3HttpConnection, helpers
+
+import chunking
+import dedup
+import embedders
+import keyword_extraction
+import local_partition
+import metrics
+import pdf_split
+import rate_limit
+from ingest_cache import EmbeddingCache, KeywordCache
+from rate_limit import estimate_tokens
+from run_journal import RunJournal
+from serialization import FastVectorSerializer, create_serializer, gzip_level_connection_class, iter_json_array
 
 # ===========================================
 # CONFIGURATION - Update these values
@@ -21,21 +41,170 @@ from opensearchpy import OpenSearch, helpers
 # Unstructured.io API
 UNSTRUCTURED_API_KEY = os.getenv("UNSTRUCTURED_API_KEY", "YOUR_UNSTRUCTURED_API_KEY")
 UNSTRUCTURED_API_URL = os.getenv("UNSTRUCTURED_API_URL", "https://api.unstructuredapp.io/general/v0/general")
+UNSTRUCTURED_PARAMS = {
+    "strategy": "hi_res",
+    "chunking_strategy": "by_title",
+    "max_characters": 1000,
+    "overlap": 200,
+}
+CHUNKING_PARAMS = {"chunking_strategy", "max_characters", "overlap"}
+
+# Large PDFs (--split-pdf): pages per request and requests in flight per file.
+# Split requests are partitioned only; the stitched elements are chunked locally.
+SPLIT_PDF_PAGES = 0
+SPLIT_PDF_CONCURRENCY = 5
+
+# Text formats (.md, .txt, .html) are partitioned and chunked locally (see
+# local_partition.py) unless PARTITION_MODE is "api"; PDFs and Word documents
+# always go to the API. Local partitioning runs in a pool of
+# PARTITION_PROCESSES processes (0 = in the ingesting process).
+PARTITION_MODE = os.getenv("PARTITION_MODE", "local")
+PARTITION_PROCESSES = int(os.getenv("PARTITION_PROCESSES", os.cpu_count() or 1))
 
-# OpenAI for embeddings
+# Embeddings: an OpenAI model name, "local:<sentence-transformers model>" for
+# offline CPU inference, or "hash:<dimension>" for test vectors (see embedders.py).
+# EMBEDDING_DIMENSION follows the chosen backend.
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-EMBEDDING_MODEL = "text-embedding-3-small"
+OPENAI_EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 EMBEDDING_DIMENSION = 1536
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))
+# Shortened embeddings (--dimensions); 0 keeps the model's own dimension
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", 0))
+
+# Embedding request batching. The OpenAI embeddings endpoint accepts up to
+# 2048 inputs and 300k tokens per request; stay comfortably below both.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 256))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 100_000))
+
+# On-disk embedding cache, keyed by (model, dimension, chunk text hash)
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", str(Path(__file__).parent.parent / ".cache" / "embeddings.sqlite")
+)
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", 1024))
+
+# LLM keyword extraction (--llm-keywords): chunks per request, requests in flight,
+# and an on-disk cache keyed by (model, chunk text hash)
+KEYWORD_MODEL = "gpt-3.5-turbo"
+LLM_KEYWORD_BATCH_SIZE = 20
+LLM_KEYWORD_CONCURRENCY = 4
+KEYWORD_CACHE_PATH = os.getenv(
+    "KEYWORD_CACHE_PATH", str(Path(__file__).parent.parent / ".cache" / "keywords.sqlite")
+)
+
+# Client-side limits for the external APIs (see rate_limit.py): requests and
+# tokens per minute (0 = no budget; 429s are still retried after Retry-After and
+# shrink the requests in flight) and retries per request before giving up
+EMBEDDING_RPM = int(os.getenv("EMBEDDING_RPM", 0))
+EMBEDDING_TPM = int(os.getenv("EMBEDDING_TPM", 0))
+LLM_KEYWORD_RPM = int(os.getenv("LLM_KEYWORD_RPM", 0))
+LLM_KEYWORD_TPM = int(os.getenv("LLM_KEYWORD_TPM", 0))
+UNSTRUCTURED_RPM = int(os.getenv("UNSTRUCTURED_RPM", 0))
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", 8))
+
+# Duplicate chunk detection before embedding (--dedup): off, skip (drop
+# duplicates) or link (index them without a vector, pointing at the first copy),
+# and the estimated Jaccard similarity of word 3-grams that counts as a near duplicate
+DEDUP_MODE = os.getenv("DEDUP_MODE", "off")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.85))
+
+# Per-file fingerprints for --incremental runs
+INGEST_MANIFEST_PATH = os.getenv(
+    "INGEST_MANIFEST_PATH", str(Path(__file__).parent.parent / ".cache" / "ingest_manifest.json")
+)
+
+# Progress journal of the current run, read back by --resume
+RUN_JOURNAL_PATH = os.getenv(
+    "RUN_JOURNAL_PATH", str(Path(__file__).parent.parent / ".cache" / "ingest_journal.sqlite")
+)
 
 # OpenSearch
 OPENSEARCH_HOST = os.getenv("OPENSEARCH_HOST", "localhost")
 OPENSEARCH_PORT = int(os.getenv("OPENSEARCH_PORT", 9200))
 INDEX_NAME = os.getenv("INDEX_NAME", "hybrid_demo")
 
+# One document per index counting its writes: ingestion bumps it once new
+# documents are searchable, and query caches (see query_cache.py) drop results
+# from older generations
+GENERATIONS_INDEX = os.getenv("GENERATIONS_INDEX", "ingest_generations")
+
+# Request bodies: JSON encoder ("orjson" or "json"), decimal places kept in
+# vector components (0 = exact float32) and gzip level (0 = uncompressed).
+# Vector JSON barely compresses better at level 9, which costs ~20x the CPU of level 1.
+JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "orjson")
+VECTOR_PRECISION = int(os.getenv("VECTOR_PRECISION", 0))
+HTTP_COMPRESS_LEVEL = int(os.getenv("HTTP_COMPRESS_LEVEL", 1))
+
+# Bulk indexing (--bulk): flush a request at whichever limit is hit first
+BULK_CHUNK_DOCS = 500
+BULK_CHUNK_BYTES = 20 * 1024 * 1024
+BULK_THREADS = 1
+
+# How many individual indexing errors to print per file
+MAX_INDEX_ERRORS_SHOWN = 3
+
+# Async pipeline (--async): per-stage concurrency and queue depth between stages
+ASYNC_PARSE_CONCURRENCY = 4
+ASYNC_EMBED_FILES = 2
+ASYNC_INDEX_CONCURRENCY = 2
+ASYNC_QUEUE_SIZE = 4
+
+# Processes that ingest files in parallel (--workers); 1 = this process only
+WORKERS = 1
+
+# Run metrics file (--metrics): per-stage and per-request timings, bytes,
+# retries and cache hits, as JSON lines or a Prometheus textfile
+METRICS_PATH = os.getenv("METRICS_PATH", "")
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".doc", ".txt", ".md", ".html"}
+
+# Refresh the index after every file (turned off while bulk loading)
+REFRESH_AFTER_FILE = True
+
+# Index settings swapped in for --bulk-load and restored afterwards
+BULK_LOAD_SETTINGS = {
+    "index.refresh_interval": "-1",
+    "index.number_of_replicas": 0,
+}
+# Setting this to -1 stops faiss graph builds until the force-merge (OpenSearch 2.18+)
+KNN_DEFER_GRAPH_SETTING = "index.knn.advanced.approximate_threshold"
+# Mapping _meta key holding the settings to restore while a bulk load runs, so
+# the next --bulk-load after an interrupted one restores the original settings
+BULK_LOAD_META_KEY = "bulk_load_restore_settings"
+
+# Index-wide HNSW ef_search; a knn query can override it with
+# method_parameters.ef_search from OpenSearch 2.16
+KNN_EF_SEARCH_SETTING = "index.knn.algo_param.ef_search"
+QUERY_EF_SEARCH_MIN_VERSION = (2, 16)
+
+# --rebuild refuses to swap the alias if the new index holds fewer than this
+# fraction of the documents in the index it replaces
+REBUILD_MIN_DOC_RATIO = 0.5
+
 # ===========================================
 # OpenSearch Index Schema for Hybrid Search
 # ===========================================
 
+HNSW_METHOD = {
+    "name": "hnsw",
+    "space_type": "cosinesimil",
+    "engine": "faiss",
+    "parameters": {
+        "ef_construction": 256,
+        "m": 32
+    }
+}
+
+# faiss vector encoders for --vector-encoder. "flat" stores full float32
+# vectors, "fp16" halves graph memory with scalar quantization, and "pq"
+# (product quantization) needs a model trained on existing vectors first.
+FAISS_ENCODERS = {
+    "flat": None,
+    "fp16": {"name": "sq", "parameters": {"type": "fp16"}},
+    "pq": {"name": "pq", "parameters": {"code_size": 8}},
+}
+
 INDEX_SCHEMA = {
     "settings": {
         "index": {
@@ -79,6 +248,8 @@ INDEX_SCHEMA = {
             # Unique identifiers
             "record_id": {"type": "keyword"},
             "element_id": {"type": "keyword"},
+            # record_id of the chunk this one repeats (--dedup link); it has no vector of its own
+            "duplicate_of": {"type": "keyword"},
             
             # Main text field with custom analyzer for BM25 ranking
             "text": {
@@ -103,15 +274,7 @@ INDEX_SCHEMA = {
             "vector_field": {
                 "type": "knn_vector",
                 "dimension": EMBEDDING_DIMENSION,
-                "method": {
-                    "name": "hnsw",
-                    "space_type": "cosinesimil",
-                    "engine": "faiss",
-                    "parameters": {
-                        "ef_construction": 256,
-                        "m": 32
-                    }
-                }
+                "method": HNSW_METHOD
             },
             
             # Metadata fields for filtering
@@ -179,13 +342,49 @@ SEARCH_PIPELINE = {
 }
 
 
-def create_opensearch_client() -> OpenSearch:
-    """Create OpenSearch client."""
+# Timings, counters and byte counts of the run (see metrics.py)
+METRICS = metrics.Metrics()
+
+
+def opensearch_stage(url: str) -> Optional[str]:
+    """Stage an OpenSearch request's time counts towards ("index" for document writes)."""
+    return "index" if "_bulk" in url or "/_doc" in url else None
+
+
+def opensearch_connection_class(base: type) -> type:
+    """Connection class with request metrics and HTTP_COMPRESS_LEVEL gzip."""
+    if HTTP_COMPRESS_LEVEL:
+        base = gzip_level_connection_class(base, HTTP_COMPRESS_LEVEL)
+    return metrics.metered_connection_class(base, METRICS, opensearch_stage)
+
+
+def create_opensearch_client(serializer=None) -> OpenSearch:
+    """Create OpenSearch client.
+    
+    `serializer` encodes request bodies; by default the one JSON_SERIALIZER and
+    VECTOR_PRECISION select (see serialization.py).
+    """
     return OpenSearch(
         hosts=[{"host": OPENSEARCH_HOST, "port": OPENSEARCH_PORT}],
-        http_compress=True,
+        http_compress=bool(HTTP_COMPRESS_LEVEL),
         use_ssl=False,
         verify_certs=False,
+        serializer=serializer or create_serializer(JSON_SERIALIZER, VECTOR_PRECISION),
+        connection_class=opensearch_connection_class(Urllib3HttpConnection),
+    )
+
+
+def create_async_opensearch_client(serializer=None):
+    """Create async OpenSearch client (needs opensearch-py[async], i.e. aiohttp)."""
+    from opensearchpy import AIOHttpConnection, AsyncOpenSearch
+    
+    return AsyncOpenSearch(
+        hosts=[{"host": OPENSEARCH_HOST, "port": OPENSEARCH_PORT}],
+        http_compress=bool(HTTP_COMPRESS_LEVEL),
+        use_ssl=False,
+        verify_certs=False,
+        serializer=serializer or create_serializer(JSON_SERIALIZER, VECTOR_PRECISION),
+        connection_class=opensearch_connection_class(AIOHttpConnection),
     )
 
 
@@ -212,7 +411,12 @@ def create_search_pipeline(client: OpenSearch, pipeline_name: str = "hybrid_sear
 def create_index(client: OpenSearch, index_name: str, recreate: bool = False):
     """Create OpenSearch index with hybrid search schema."""
     if client.indices.exists(index=index_name):
-        if recreate:
+        if recreate and client.indices.exists_alias(name=index_name):
+            # Built by --rebuild: drop the versioned indices behind the alias
+            targets = list(client.indices.get_alias(name=index_name))
+            print(f"[INFO] Deleting indices behind alias '{index_name}': {', '.join(targets)}...")
+            client.indices.delete(index=",".join(targets))
+        elif recreate:
             print(f"[INFO] Deleting existing index '{index_name}'...")
             client.indices.delete(index=index_name)
         else:
@@ -226,47 +430,761 @@ def create_index(client: OpenSearch, index_name: str, recreate: bool = False):
     create_search_pipeline(client)
 
 
-def parse_with_unstructured(file_path: str) -> list[dict]:
-    """Parse document using Unstructured.io API."""
-    print(f"[INFO] Parsing with Unstructured.io: {Path(file_path).name}")
+def vector_field_mapping(dimension: int, encoder: str = "flat", model_id: Optional[str] = None) -> dict:
+    """knn_vector mapping for vector_field with the given faiss encoder."""
+    if encoder == "pq":
+        # Dimension, space type and HNSW parameters all come from the trained model
+        return {"type": "knn_vector", "model_id": model_id}
+    method = copy.deepcopy(HNSW_METHOD)
+    if FAISS_ENCODERS[encoder]:
+        method["parameters"]["encoder"] = FAISS_ENCODERS[encoder]
+    return {"type": "knn_vector", "dimension": dimension, "method": method}
+
+
+def configure_vector_field(dimension: int, encoder: str = "flat", model_id: Optional[str] = None):
+    """Point INDEX_SCHEMA's vector_field at the embedding dimension and encoder."""
+    INDEX_SCHEMA["mappings"]["properties"]["vector_field"] = vector_field_mapping(dimension, encoder, model_id)
+
+
+def index_vector_dimension(client: OpenSearch, index_name: str) -> Optional[int]:
+    """Dimension of vector_field in an existing index (or the first index behind an alias)."""
+    for mapping in client.indices.get_mapping(index=index_name).values():
+        field = mapping.get("mappings", {}).get("properties", {}).get("vector_field", {})
+        if "model_id" in field:
+            model = client.transport.perform_request("GET", f"/_plugins/_knn/models/{field['model_id']}")
+            return model.get("dimension")
+        if field.get("dimension") is not None:
+            return field["dimension"]
+    return None
+
+
+def opensearch_version(client: OpenSearch) -> tuple[int, ...]:
+    """The cluster's version number as a tuple, e.g. (2, 11, 1)."""
+    number = client.info()["version"]["number"]
+    return tuple(int(part) for part in re.findall(r"\d+", number.split("-")[0]))
+
+
+def supports_query_ef_search(client: OpenSearch) -> bool:
+    """Whether knn queries accept method_parameters.ef_search (OpenSearch 2.16+)."""
+    return opensearch_version(client) >= QUERY_EF_SEARCH_MIN_VERSION
+
+
+def train_pq_model(client: OpenSearch, training_index: str, dimension: int, m: int) -> str:
+    """Train a faiss HNSW+PQ model on the vectors of training_index; returns its model id.
     
-    with open(file_path, "rb") as f:
-        files = {"files": (Path(file_path).name, f)}
-        
-        response = httpx.post(
-            UNSTRUCTURED_API_URL,
-            headers={"unstructured-api-key": UNSTRUCTURED_API_KEY},
-            files=files,
-            data={
-                "strategy": "hi_res",
-                "chunking_strategy": "by_title",
-                "max_characters": 1000,
-                "overlap": 200,
+    PQ splits each vector into m sub-vectors stored as one byte each. A model
+    that was already trained with the same settings is reused.
+    """
+    if dimension % m:
+        raise ValueError(f"--pq-m {m} must divide the vector dimension {dimension}")
+    trained_dimension = index_vector_dimension(client, training_index)
+    if trained_dimension != dimension:
+        raise ValueError(f"PQ training index '{training_index}' has {trained_dimension}-dim vectors, "
+                         f"need {dimension}")
+    
+    model_id = f"{INDEX_NAME}-hnswpq-{dimension}d-m{m}"
+    path = f"/_plugins/_knn/models/{model_id}"
+    try:
+        model = client.transport.perform_request("GET", path)
+        if model.get("state") == "created":
+            print(f"[OK] Reusing trained PQ model '{model_id}'")
+            return model_id
+        client.transport.perform_request("DELETE", path)
+    except NotFoundError:
+        pass
+    
+    method = copy.deepcopy(HNSW_METHOD)
+    method["parameters"]["encoder"] = copy.deepcopy(FAISS_ENCODERS["pq"])
+    method["parameters"]["encoder"]["parameters"]["m"] = m
+    print(f"[INFO] Training PQ model '{model_id}' on '{training_index}'...")
+    client.transport.perform_request("POST", f"{path}/_train", body={
+        "training_index": training_index,
+        "training_field": "vector_field",
+        "dimension": dimension,
+        "method": method,
+        "description": f"HNSW+PQ (m={m}) for {INDEX_NAME}",
+    })
+    
+    while True:
+        model = client.transport.perform_request("GET", path)
+        if model.get("state") == "created":
+            break
+        if model.get("state") == "failed":
+            raise Exception(f"PQ training failed: {model.get('error')}")
+        time.sleep(5)
+    print(f"[OK] Trained PQ model '{model_id}'")
+    return model_id
+
+
+def check_vector_dimension(client: OpenSearch, index_name: str) -> bool:
+    """Check that an existing index's vector_field matches the embedding dimension."""
+    for name in client.indices.get_mapping(index=index_name):
+        dimension = index_vector_dimension(client, name)
+        if dimension is not None and dimension != EMBEDDING_DIMENSION:
+            print(f"[ERROR] Index '{name}' stores {dimension}-dim vectors but {EMBEDDING_MODEL} "
+                  f"produces {EMBEDDING_DIMENSION}")
+            print("   Use --recreate or --rebuild to re-create the index for this model")
+            return False
+    return True
+
+
+def versioned_index_name(alias: str, version: int) -> str:
+    """Physical index name for a version behind an alias, e.g. hybrid_demo_v3."""
+    return f"{alias}_v{version}"
+
+
+def list_index_versions(client: OpenSearch, alias: str) -> list[tuple[int, str]]:
+    """List (version, index) pairs of the versioned indices for an alias, oldest first."""
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    indices = client.indices.get(index=f"{alias}_v*", allow_no_indices=True, ignore_unavailable=True)
+    versions = []
+    for name in indices:
+        match = pattern.match(name)
+        if match:
+            versions.append((int(match.group(1)), name))
+    return sorted(versions)
+
+
+def alias_targets(client: OpenSearch, alias: str) -> list[str]:
+    """Indices an alias points at (empty if it is not an alias)."""
+    if not client.indices.exists_alias(name=alias):
+        return []
+    return list(client.indices.get_alias(name=alias))
+
+
+# Painless: keep the first params.dims vector values and re-normalize
+TRUNCATE_VECTOR_SCRIPT = """
+def v = ctx._source.vector_field;
+if (v != null && v.size() > params.dims) {
+    double norm = 0;
+    for (int i = 0; i < params.dims; i++) { norm += v[i] * v[i]; }
+    norm = Math.sqrt(norm);
+    List out = new ArrayList();
+    for (int i = 0; i < params.dims; i++) { out.add(norm > 0 ? v[i] / norm : v[i]); }
+    ctx._source.vector_field = out;
+}
+"""
+
+
+def reindex_into(client: OpenSearch, source: str, dest: str, dimensions: Optional[int] = None) -> int:
+    """Copy documents (vectors included) between indices with _reindex; returns docs created.
+    
+    With `dimensions`, vectors are shortened on the way (see embedders.truncate_vector).
+    """
+    print(f"[INFO] Reindexing '{source}' -> '{dest}' (no re-embedding)...")
+    body = {"source": {"index": source}, "dest": {"index": dest}}
+    if dimensions:
+        body["script"] = {"lang": "painless", "source": TRUNCATE_VECTOR_SCRIPT, "params": {"dims": dimensions}}
+    task = client.reindex(body=body, wait_for_completion=False)["task"]
+    
+    while True:
+        status = client.tasks.get(task_id=task)
+        progress = status["task"]["status"]
+        print(f"   Reindexed {progress.get('created', 0) + progress.get('updated', 0)}"
+              f"/{progress.get('total', '?')} documents...", end='\r')
+        if status.get("completed"):
+            break
+        time.sleep(2)
+    print()
+    
+    response = status.get("response", {})
+    failures = response.get("failures") or []
+    if status.get("error") or failures:
+        raise Exception(f"Reindex failed: {status.get('error') or failures[:3]}")
+    return response.get("created", 0) + response.get("updated", 0)
+
+
+def swap_alias(client: OpenSearch, alias: str, new_index: str):
+    """Point an alias at new_index in one atomic _aliases call.
+    
+    A concrete index that still uses the alias name (created before versioning
+    was introduced) is removed in the same call, so readers never see a gap.
+    """
+    actions = []
+    for target in alias_targets(client, alias):
+        actions.append({"remove": {"index": target, "alias": alias}})
+    if client.indices.exists(index=alias) and not client.indices.exists_alias(name=alias):
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": new_index, "alias": alias}})
+    
+    client.indices.update_aliases(body={"actions": actions})
+    print(f"[OK] Alias '{alias}' now points at '{new_index}'")
+
+
+def gc_index_versions(client: OpenSearch, alias: str, keep: int = 1):
+    """Delete old versions behind an alias, keeping the live one plus `keep` previous ones."""
+    live = set(alias_targets(client, alias))
+    versions = list_index_versions(client, alias)
+    live_versions = [version for version, name in versions if name in live]
+    if not live_versions:
+        return
+    
+    older = [name for version, name in versions if version < max(live_versions) and name not in live]
+    stale = older[:-keep] if keep > 0 else older
+    for name in stale:
+        client.indices.delete(index=name)
+        print(f"[INFO] Deleted old index version '{name}'")
+
+
+def begin_bulk_load(client: OpenSearch, index_name: str, defer_knn_graphs: bool = False) -> dict:
+    """Switch an index to bulk-load settings; returns the settings to restore.
+    
+    Disables refresh and replicas for the duration of the load and, if asked,
+    defers k-NN graph construction to the final force-merge. The settings to
+    restore are kept in the index _meta until finish_bulk_load, so the next
+    load after an interrupted one restores the original settings.
+    """
+    settings = dict(BULK_LOAD_SETTINGS)
+    if defer_knn_graphs:
+        settings[KNN_DEFER_GRAPH_SETTING] = -1
+    
+    response = client.indices.get_settings(index=index_name, flat_settings=True)
+    current = next(iter(response.values()))["settings"]
+    # Missing keys restore to None, which resets them to the cluster default
+    previous = {key: current.get(key) for key in settings}
+    saved = index_meta(client, index_name).get(BULK_LOAD_META_KEY) or {}
+    if saved:
+        # An interrupted load left its bulk-load settings behind
+        previous.update(saved)
+        print(f"[INFO] Previous bulk load on '{index_name}' did not finish; will restore {previous}")
+    save_bulk_load_settings(client, index_name, previous)
+    
+    try:
+        client.indices.put_settings(index=index_name, body=settings)
+    except Exception as e:
+        if not defer_knn_graphs:
+            raise
+        print(f"[WARN] Cannot defer k-NN graph builds on this cluster ({e}); building them during the load")
+        del settings[KNN_DEFER_GRAPH_SETTING]
+        if KNN_DEFER_GRAPH_SETTING not in saved:
+            del previous[KNN_DEFER_GRAPH_SETTING]
+            save_bulk_load_settings(client, index_name, previous)
+        client.indices.put_settings(index=index_name, body=settings)
+    print(f"[OK] Bulk-load settings applied to '{index_name}': {settings}")
+    return previous
+
+
+def index_meta(client: OpenSearch, index_name: str) -> dict:
+    """The _meta object of an index's mapping."""
+    response = client.indices.get_mapping(index=index_name)
+    return next(iter(response.values()))["mappings"].get("_meta") or {}
+
+
+def save_bulk_load_settings(client: OpenSearch, index_name: str, previous: Optional[dict]):
+    """Record the settings a bulk load restores in the index _meta (None once restored)."""
+    meta = dict(index_meta(client, index_name), **{BULK_LOAD_META_KEY: previous})
+    client.indices.put_mapping(index=index_name, body={"_meta": meta})
+
+
+def finish_bulk_load(client: OpenSearch, index_name: str, previous: dict, max_segments: int = 1) -> dict:
+    """Restore index settings, force-merge and warm the k-NN cache.
+    
+    Returns the wall time of each phase in seconds.
+    """
+    timings = {}
+    
+    start = time.perf_counter()
+    client.indices.put_settings(index=index_name, body=previous)
+    save_bulk_load_settings(client, index_name, None)
+    client.indices.refresh(index=index_name)
+    timings["restore_settings"] = time.perf_counter() - start
+    print(f"[OK] Restored settings on '{index_name}': {previous}")
+    
+    start = time.perf_counter()
+    print(f"[INFO] Force-merging '{index_name}' to {max_segments} segment(s)...")
+    client.indices.forcemerge(index=index_name, max_num_segments=max_segments, request_timeout=3600)
+    timings["force_merge"] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    warmup_knn(client, index_name)
+    timings["knn_warmup"] = time.perf_counter() - start
+    
+    # Documents loaded with refreshes off only became searchable now
+    bump_ingest_generation(client, index_name)
+    return timings
+
+
+def warmup_knn(client: OpenSearch, index_name: str):
+    """Load the index's k-NN graphs into native memory."""
+    try:
+        client.transport.perform_request(
+            "GET", f"/_plugins/_knn/warmup/{index_name}", params={"request_timeout": 3600}
+        )
+        print(f"[OK] Warmed k-NN native cache for '{index_name}'")
+    except Exception as e:
+        print(f"[WARN] k-NN warmup failed: {e}")
+
+
+def bump_ingest_generation(client: OpenSearch, index_name: Optional[str] = None):
+    """Advance the write generation of an index (INDEX_NAME by default).
+    
+    Call once the written documents are searchable; a failure only prints a
+    warning, since the documents themselves are in.
+    """
+    index_name = index_name or INDEX_NAME
+    try:
+        client.update(
+            index=GENERATIONS_INDEX,
+            id=index_name,
+            body={
+                "script": {"lang": "painless", "source": "ctx._source.generation += 1"},
+                "upsert": {"generation": 1},
             },
-            timeout=300.0
+            params={"retry_on_conflict": 10},
         )
+    except Exception as e:
+        print(f"   [WARN] Could not bump the ingest generation of '{index_name}': {e}")
+
+
+def read_ingest_generation(client: OpenSearch, index_name: Optional[str] = None) -> int:
+    """Write generation of an index; 0 if nothing was ingested into it since generations were kept."""
+    try:
+        doc = client.get(index=GENERATIONS_INDEX, id=index_name or INDEX_NAME,
+                         params={"_source_includes": "generation"})
+    except NotFoundError:
+        return 0
+    return doc["_source"].get("generation", 0)
+
+
+def print_phase_timings(timings: dict):
+    """Print per-phase wall times."""
+    print("[OK] Phase timings:")
+    for phase, seconds in timings.items():
+        print(f"   {phase:<18} {seconds:8.1f}s")
+    print(f"   {'total':<18} {sum(timings.values()):8.1f}s")
+
+
+def record_api_request(service: str, seconds: float, response: Optional[httpx.Response]):
+    """Endpoint observer: latency and bytes of every attempt at an external API request."""
+    METRICS.observe("request_seconds", seconds, service=service,
+                    status=str(response.status_code) if response is not None else "error")
+    if response is None:
+        return
+    METRICS.add("request_bytes_sent", int(response.request.headers.get("content-length") or 0), service=service)
+    received = response.headers.get("content-length")
+    if received is None and response.is_stream_consumed:
+        received = response.num_bytes_downloaded
+    METRICS.add("request_bytes_received", int(received or 0), service=service)
+
+
+def create_api_endpoints() -> dict[str, rate_limit.Endpoint]:
+    """Request schedulers for the external APIs, from the limits above."""
+    endpoints = {
+        "embeddings": rate_limit.Endpoint(
+            "OpenAI embeddings", EMBEDDING_RPM, EMBEDDING_TPM, max_retries=API_MAX_RETRIES
+        ),
+        "keywords": rate_limit.Endpoint(
+            "OpenAI keywords", LLM_KEYWORD_RPM, LLM_KEYWORD_TPM, max_retries=API_MAX_RETRIES
+        ),
+        "unstructured": rate_limit.Endpoint(
+            "Unstructured", UNSTRUCTURED_RPM, max_retries=API_MAX_RETRIES
+        ),
+    }
+    for endpoint in endpoints.values():
+        endpoint.observer = record_api_request
+    return endpoints
+
+
+# Shared by every thread and task of the run (recreated in main from the CLI limits)
+API_ENDPOINTS = create_api_endpoints()
+
+
+def partition_params(starting_page_number: int) -> dict:
+    """UNSTRUCTURED_PARAMS for one page range: no chunking, absolute page numbers."""
+    params = {key: value for key, value in UNSTRUCTURED_PARAMS.items() if key not in CHUNKING_PARAMS}
+    params["starting_page_number"] = starting_page_number
+    return params
+
+
+def chunk_stitched_elements(parts: list[tuple[int, list[dict]]]) -> list[dict]:
+    """Stitch per-range elements back together and chunk them like the API would."""
+    elements = pdf_split.stitch_elements(parts)
+    return chunking.chunk_by_title(
+        elements,
+        max_characters=UNSTRUCTURED_PARAMS["max_characters"],
+        overlap=UNSTRUCTURED_PARAMS["overlap"],
+    )
+
+
+def parse_pdf_split(file_path: str, ranges: list[tuple[int, bytes]]) -> list[dict]:
+    """Partition page ranges of a PDF concurrently and chunk the stitched result."""
+    name = Path(file_path).name
+    print(f"   → Splitting into {len(ranges)} page ranges ({SPLIT_PDF_CONCURRENCY} in flight)")
+    
+    def partition_range(page_range: tuple[int, bytes]) -> tuple[int, list[dict]]:
+        first_page, content = page_range
+        response = API_ENDPOINTS["unstructured"].call(lambda: http.post(
+            UNSTRUCTURED_API_URL,
+            headers={"unstructured-api-key": UNSTRUCTURED_API_KEY},
+            files={"files": (name, content)},
+            data=partition_params(first_page),
+        ))
+        if response.status_code != 200:
+            raise Exception(f"Unstructured API error (pages from {first_page}): "
+                            f"{response.status_code} - {response.text}")
+        return first_page, response.json()
+    
+    with httpx.Client(timeout=300.0) as http:
+        with ThreadPoolExecutor(max_workers=SPLIT_PDF_CONCURRENCY) as pool:
+            parts = list(pool.map(partition_range, ranges))
+    return chunk_stitched_elements(parts)
+
+
+def stream_with_unstructured(file_path: str) -> Iterator[dict]:
+    """Parse document using Unstructured.io API, yielding elements as the response arrives."""
+    print(f"[INFO] Parsing with Unstructured.io: {Path(file_path).name}")
+    
+    ranges = pdf_split.split_pdf(file_path, SPLIT_PDF_PAGES)
+    if ranges:
+        # Stitching and chunking need every range, so split PDFs aren't streamed
+        yield from parse_pdf_split(file_path, ranges)
+        return
+    
+    with open(file_path, "rb") as f, httpx.Client(timeout=300.0) as http:
+        def send() -> httpx.Response:
+            # Rewind the upload for retries; the body is streamed once accepted
+            f.seek(0)
+            request = http.build_request(
+                "POST",
+                UNSTRUCTURED_API_URL,
+                headers={"unstructured-api-key": UNSTRUCTURED_API_KEY},
+                files={"files": (Path(file_path).name, f)},
+                data=UNSTRUCTURED_PARAMS,
+            )
+            return http.send(request, stream=True)
+        
+        response = API_ENDPOINTS["unstructured"].call(send)
+        try:
+            if response.status_code != 200:
+                response.read()
+                raise Exception(f"Unstructured API error: {response.status_code} - {response.text}")
+            
+            yield from iter_json_array(response.iter_text())
+        finally:
+            response.close()
+
+
+def parse_with_unstructured(file_path: str) -> list[dict]:
+    """Parse document using Unstructured.io API."""
+    elements = list(stream_with_unstructured(file_path))
+    print(f"   → Got {len(elements)} elements")
+    return elements
+
+
+async def parse_with_unstructured_async(http: httpx.AsyncClient, file_path: str) -> list[dict]:
+    """Parse document using Unstructured.io API without blocking the event loop."""
+    name = Path(file_path).name
+    print(f"[INFO] Parsing with Unstructured.io: {name}")
+    
+    ranges = await asyncio.to_thread(pdf_split.split_pdf, file_path, SPLIT_PDF_PAGES)
+    if ranges:
+        elements = await parse_pdf_split_async(http, file_path, ranges)
+        print(f"   → {name}: got {len(elements)} elements from {len(ranges)} page ranges")
+        return elements
+    
+    content = await asyncio.to_thread(Path(file_path).read_bytes)
+    response = await API_ENDPOINTS["unstructured"].call_async(lambda: http.post(
+        UNSTRUCTURED_API_URL,
+        headers={"unstructured-api-key": UNSTRUCTURED_API_KEY},
+        files={"files": (name, content)},
+        data=UNSTRUCTURED_PARAMS,
+        timeout=300.0
+    ))
     
     if response.status_code != 200:
         raise Exception(f"Unstructured API error: {response.status_code} - {response.text}")
     
     elements = response.json()
+    print(f"   → {name}: got {len(elements)} elements")
+    return elements
+
+
+async def parse_pdf_split_async(http: httpx.AsyncClient, file_path: str, ranges: list[tuple[int, bytes]]) -> list[dict]:
+    """Async variant of parse_pdf_split."""
+    name = Path(file_path).name
+    semaphore = asyncio.Semaphore(SPLIT_PDF_CONCURRENCY)
+    
+    async def partition_range(first_page: int, content: bytes) -> tuple[int, list[dict]]:
+        async with semaphore:
+            response = await API_ENDPOINTS["unstructured"].call_async(lambda: http.post(
+                UNSTRUCTURED_API_URL,
+                headers={"unstructured-api-key": UNSTRUCTURED_API_KEY},
+                files={"files": (name, content)},
+                data=partition_params(first_page),
+                timeout=300.0
+            ))
+        if response.status_code != 200:
+            raise Exception(f"Unstructured API error (pages from {first_page}): "
+                            f"{response.status_code} - {response.text}")
+        return first_page, response.json()
+    
+    parts = await asyncio.gather(*(partition_range(first_page, content) for first_page, content in ranges))
+    return await asyncio.to_thread(chunk_stitched_elements, parts)
+
+
+# Local partitioning processes, and partitions started before ingest_file asks for them
+PARTITION_POOL: Optional[ProcessPoolExecutor] = None
+PENDING_PARTITIONS: dict[Path, Future] = {}
+
+
+def partitions_locally(path: Path) -> bool:
+    """Whether a file is partitioned locally instead of by the Unstructured API."""
+    return PARTITION_MODE == "local" and path.suffix.lower() in local_partition.EXTENSIONS
+
+
+def local_partition_args(path: Path) -> tuple:
+    # Chunk like the API does with UNSTRUCTURED_PARAMS
+    return str(path), UNSTRUCTURED_PARAMS["max_characters"], UNSTRUCTURED_PARAMS["overlap"]
+
+
+def submit_local_partition(path: Path) -> Future:
+    """Start partitioning a text file in the pool (or partition it right away without one)."""
+    global PARTITION_POOL
+    if PARTITION_PROCESSES < 1:
+        future = Future()
+        try:
+            future.set_result(local_partition.partition_file(*local_partition_args(path)))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    if PARTITION_POOL is None:
+        PARTITION_POOL = ProcessPoolExecutor(
+            max_workers=PARTITION_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+        )
+    return PARTITION_POOL.submit(local_partition.partition_file, *local_partition_args(path))
+
+
+def prefetch_local_partitions(files: list[Path]):
+    """Start partitioning the text files among `files` in the pool, ahead of ingesting them."""
+    if PARTITION_PROCESSES < 1:
+        return
+    for path in files:
+        if partitions_locally(path) and path not in PENDING_PARTITIONS:
+            PENDING_PARTITIONS[path] = submit_local_partition(path)
+
+
+def partition_locally(file_path: str) -> Iterator[dict]:
+    """Partition and chunk a text file locally; yields elements like stream_with_unstructured."""
+    path = Path(file_path)
+    print(f"[INFO] Partitioning locally: {path.name}")
+    future = PENDING_PARTITIONS.pop(path, None) or submit_local_partition(path)
+    elements = future.result()
     print(f"   → Got {len(elements)} elements")
+    yield from elements
+
+
+async def partition_locally_async(file_path: str) -> list[dict]:
+    """Async variant of partition_locally."""
+    path = Path(file_path)
+    print(f"[INFO] Partitioning locally: {path.name}")
+    if PARTITION_PROCESSES < 1:
+        elements = await asyncio.to_thread(local_partition.partition_file, *local_partition_args(path))
+    else:
+        future = PENDING_PARTITIONS.pop(path, None) or submit_local_partition(path)
+        elements = await asyncio.wrap_future(future)
+    print(f"   → {path.name}: got {len(elements)} elements")
     return elements
 
 
-def get_embedding(text: str) -> list[float]:
-    """Get embedding from OpenAI API."""
-    if not OPENAI_API_KEY:
-        raise ValueError("OPENAI_API_KEY not set")
+def close_partition_pool():
+    global PARTITION_POOL
+    PENDING_PARTITIONS.clear()
+    if PARTITION_POOL is not None:
+        PARTITION_POOL.shutdown(cancel_futures=True)
+        PARTITION_POOL = None
+
+
+# Counters reported in the ingestion summary
+RUN_STATS = {
+    "embedding_requests": 0,
+    "embedded_chunks": 0,
+    "keyword_requests": 0,
+    "index_errors": 0,
+    "failed_files": 0,
+    "duplicates_exact": 0,
+    "duplicates_near": 0,
+    "duplicates_orphaned": 0,
+}
+
+
+# Embedding backend (set in main from --embedding-model)
+EMBEDDER: Optional[embedders.Embedder] = None
+
+
+def current_embedder() -> embedders.Embedder:
+    """The configured embedding backend, created from EMBEDDING_MODEL on first use."""
+    global EMBEDDER
+    if EMBEDDER is None:
+        EMBEDDER = embedders.create_embedder(
+            EMBEDDING_MODEL,
+            api_key=OPENAI_API_KEY,
+            url=OPENAI_EMBEDDINGS_URL,
+            threads=EMBEDDING_THREADS,
+            dimensions=EMBEDDING_DIMENSIONS,
+            endpoint=API_ENDPOINTS["embeddings"],
+        )
+    return EMBEDDER
+
+
+def get_embeddings(texts: list[str]) -> list[array]:
+    """Get embeddings for a batch of texts in one call to the embedding backend."""
+    RUN_STATS["embedding_requests"] += 1
+    embeddings = current_embedder().embed(texts)
+    RUN_STATS["embedded_chunks"] += len(texts)
+    return embeddings
+
+
+async def get_embeddings_async(http: httpx.AsyncClient, texts: list[str]) -> list[array]:
+    """Async variant of get_embeddings."""
+    RUN_STATS["embedding_requests"] += 1
+    embeddings = await current_embedder().embed_async(http, texts)
+    RUN_STATS["embedded_chunks"] += len(texts)
+    return embeddings
+
+
+def get_embedding(text: str) -> array:
+    """Get the embedding of a single text."""
+    return get_embeddings([text])[0]
+
+
+def batch_for_embedding(texts: list[str]) -> list[list[int]]:
+    """Group text positions into batches within the per-request input and token limits."""
+    batches = []
+    current = []
+    current_tokens = 0
     
-    response = httpx.post(
-        "https://api.openai.com/v1/embeddings",
-        headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
-        json={"model": EMBEDDING_MODEL, "input": text},
-        timeout=30.0
-    )
-    response.raise_for_status()
-    return response.json()["data"][0]["embedding"]
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= EMBEDDING_BATCH_SIZE
+                        or current_tokens + tokens > EMBEDDING_BATCH_MAX_TOKENS):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    
+    if current:
+        batches.append(current)
+    return batches
+
+
+def embed_texts(texts: list[str]) -> tuple[list[Optional[list[float]]], dict[int, Exception]]:
+    """Embed texts in batched requests.
+    
+    Returns one embedding per input (None where it failed) plus the error for
+    each failed position. A failed batch is bisected and retried so a single
+    bad input only drops itself, not its neighbours. Batches that are still
+    rate limited after every retry are not bisected (that would only add
+    requests); all their positions are reported as failed.
+    """
+    embeddings = [None] * len(texts)
+    errors = {}
+    
+    def embed_positions(positions: list[int]):
+        try:
+            vectors = get_embeddings([texts[p] for p in positions])
+        except Exception as e:
+            if len(positions) == 1 or isinstance(e, rate_limit.RetriesExhausted):
+                errors.update((p, e) for p in positions)
+                return
+            mid = len(positions) // 2
+            embed_positions(positions[:mid])
+            embed_positions(positions[mid:])
+            return
+        for p, vector in zip(positions, vectors):
+            embeddings[p] = vector
+    
+    batches = batch_for_embedding(texts)
+    for n, positions in enumerate(batches):
+        print(f"   Embedding batch {n+1}/{len(batches)} ({len(positions)} chunks)...", end='\r')
+        embed_positions(positions)
+    
+    return embeddings, errors
+
+
+async def embed_texts_async(
+    http: httpx.AsyncClient, texts: list[str], limit: asyncio.Semaphore
+) -> tuple[list[Optional[list[float]]], dict[int, Exception]]:
+    """Async variant of embed_texts; batches run concurrently, bounded by limit."""
+    embeddings = [None] * len(texts)
+    errors = {}
+    
+    async def embed_positions(positions: list[int]):
+        try:
+            async with limit:
+                vectors = await get_embeddings_async(http, [texts[p] for p in positions])
+        except Exception as e:
+            if len(positions) == 1 or isinstance(e, rate_limit.RetriesExhausted):
+                errors.update((p, e) for p in positions)
+                return
+            mid = len(positions) // 2
+            await asyncio.gather(embed_positions(positions[:mid]), embed_positions(positions[mid:]))
+            return
+        for p, vector in zip(positions, vectors):
+            embeddings[p] = vector
+    
+    await asyncio.gather(*(embed_positions(positions) for positions in batch_for_embedding(texts)))
+    return embeddings, errors
+
+
+# Embedding cache (set in main unless --no-embedding-cache)
+EMBEDDING_CACHE: Optional[EmbeddingCache] = None
+
+
+def lookup_cached_embeddings(texts: list[str]) -> list[Optional[list[float]]]:
+    """Return cached embeddings for texts (None for misses or when caching is off)."""
+    if EMBEDDING_CACHE is None:
+        return [None] * len(texts)
+    return EMBEDDING_CACHE.get_many(texts)
+
+
+def merge_fresh_embeddings(
+    texts: list[str],
+    embeddings: list[Optional[list[float]]],
+    missing: list[int],
+    fresh: list[Optional[list[float]]],
+    fresh_errors: dict[int, Exception],
+) -> dict[int, Exception]:
+    """Fill cache misses with freshly embedded vectors and store them in the cache.
+    
+    Returns the errors re-keyed to positions in texts.
+    """
+    stored_texts = []
+    stored_vectors = []
+    for pos, vector in zip(missing, fresh):
+        embeddings[pos] = vector
+        if vector is not None:
+            stored_texts.append(texts[pos])
+            stored_vectors.append(vector)
+    if EMBEDDING_CACHE is not None:
+        EMBEDDING_CACHE.put_many(stored_texts, stored_vectors)
+    return {missing[j]: e for j, e in fresh_errors.items()}
+
+
+def get_chunk_embeddings(texts: list[str]) -> tuple[list[Optional[list[float]]], dict[int, Exception]]:
+    """Embed chunk texts, serving repeats from the embedding cache when enabled."""
+    with METRICS.timer("embed"):
+        embeddings = lookup_cached_embeddings(texts)
+        missing = [pos for pos, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings, {}
+        
+        fresh, fresh_errors = embed_texts([texts[pos] for pos in missing])
+        return embeddings, merge_fresh_embeddings(texts, embeddings, missing, fresh, fresh_errors)
+
+
+async def get_chunk_embeddings_async(
+    http: httpx.AsyncClient, texts: list[str], limit: asyncio.Semaphore
+) -> tuple[list[Optional[list[float]]], dict[int, Exception]]:
+    """Async variant of get_chunk_embeddings."""
+    with METRICS.timer("embed"):
+        embeddings = lookup_cached_embeddings(texts)
+        missing = [pos for pos, embedding in enumerate(embeddings) if embedding is None]
+        if not missing:
+            return embeddings, {}
+        
+        fresh, fresh_errors = await embed_texts_async(http, [texts[pos] for pos in missing], limit)
+        return embeddings, merge_fresh_embeddings(texts, embeddings, missing, fresh, fresh_errors)
 
 
 def clean_metadata(metadata: dict) -> dict:
@@ -303,54 +1221,49 @@ def extract_keywords(text: str, use_llm: bool = False) -> list[str]:
 
 def extract_keywords_heuristic(text: str) -> list[str]:
     """Extract keywords using heuristics - no API calls needed."""
-    import re
-    
-    keywords = set()
-    
-    # 1. Find capitalized words/acronyms (likely proper nouns or technical terms)
-    # Match: BLEU, GPT, Transformer, OpenSearch, etc.
-    caps_pattern = r'\b[A-Z][A-Za-z]*(?:\s+[A-Z][A-Za-z]*)*\b'
-    for match in re.findall(caps_pattern, text):
-        if len(match) >= 2 and match.lower() not in {'the', 'a', 'an', 'in', 'on', 'at', 'to', 'for', 'of', 'and', 'or', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must', 'shall', 'can', 'need', 'dare', 'ought', 'used', 'this', 'that', 'these', 'those', 'we', 'our', 'they', 'their', 'it', 'its', 'he', 'she', 'his', 'her', 'i', 'you', 'your', 'my', 'me', 'us', 'them', 'who', 'what', 'which', 'when', 'where', 'why', 'how', 'all', 'each', 'every', 'both', 'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 'just', 'but', 'if', 'because', 'as', 'until', 'while', 'although', 'though', 'after', 'before', 'since', 'unless', 'however', 'therefore', 'thus', 'hence', 'also', 'still', 'yet', 'even', 'here', 'there', 'then', 'now', 'abstract', 'introduction', 'conclusion', 'references', 'figure', 'table'}:
-            keywords.add(match.lower())
-    
-    # 2. Find acronyms (2-5 uppercase letters)
-    acronyms = re.findall(r'\b[A-Z]{2,5}\b', text)
-    for acr in acronyms:
-        if acr.lower() not in {'ii', 'iii', 'iv', 'vi', 'vii', 'viii', 'ix', 'xi', 'xii'}:
-            keywords.add(acr)
-    
-    # 3. Find numbers with context (e.g., "28.4 BLEU", "41.8%", "3.5 days")
-    num_pattern = r'(\d+\.?\d*)\s*(%|BLEU|days?|hours?|layers?|heads?|dimensions?|parameters?)'
-    for match in re.findall(num_pattern, text, re.IGNORECASE):
-        keywords.add(f"{match[0]} {match[1]}".strip())
-    
-    # 4. Find hyphenated terms (often technical: multi-head, self-attention)
-    hyphen_terms = re.findall(r'\b[a-zA-Z]+-[a-zA-Z]+(?:-[a-zA-Z]+)*\b', text)
-    for term in hyphen_terms:
-        if len(term) >= 5:
-            keywords.add(term.lower())
-    
-    # 5. Find camelCase or special patterns
-    camel_case = re.findall(r'\b[a-z]+[A-Z][a-zA-Z]*\b', text)
-    for term in camel_case:
-        keywords.add(term)
-    
-    # Return top keywords (limit to 15)
-    return list(keywords)[:15]
+    return keyword_extraction.extract_keywords(text)
 
 
-def extract_keywords_llm(text: str) -> list[str]:
+def extract_keywords_many(texts: list[str], use_llm: bool = False) -> list[list[str]]:
+    """Extract keywords for a batch of chunks (see extract_keywords)."""
+    with METRICS.timer("keywords"):
+        if use_llm and OPENAI_API_KEY:
+            return extract_keywords_llm_many(texts)
+        return keyword_extraction.extract_keywords_batch(texts)
+
+
+# Client shared by the keyword extraction threads, so batches reuse its
+# connections instead of each opening one (and a TLS handshake) of its own
+KEYWORD_HTTP: Optional[httpx.Client] = None
+
+
+def keyword_http_client() -> httpx.Client:
+    global KEYWORD_HTTP
+    if KEYWORD_HTTP is None:
+        KEYWORD_HTTP = httpx.Client(limits=httpx.Limits(max_connections=LLM_KEYWORD_CONCURRENCY))
+    return KEYWORD_HTTP
+
+
+def close_keyword_http_client():
+    global KEYWORD_HTTP
+    if KEYWORD_HTTP is not None:
+        KEYWORD_HTTP.close()
+        KEYWORD_HTTP = None
+
+
+def extract_keywords_llm(text: str) -> list[str]:
     """Extract keywords using OpenAI LLM - more accurate but costs API calls."""
     try:
         # Truncate text to save tokens
         truncated = text[:1000] if len(text) > 1000 else text
         
-        response = httpx.post(
-            "https://api.openai.com/v1/chat/completions",
+        RUN_STATS["keyword_requests"] += 1
+        http = keyword_http_client()
+        response = API_ENDPOINTS["keywords"].call(lambda: http.post(
+            OPENAI_CHAT_URL,
             headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
             json={
-                "model": "gpt-3.5-turbo",
+                "model": KEYWORD_MODEL,
                 "messages": [
                     {
                         "role": "system",
@@ -365,7 +1278,7 @@ def extract_keywords_llm(text: str) -> list[str]:
                 "temperature": 0
             },
             timeout=15.0
-        )
+        ), tokens=estimate_tokens(truncated) + 100)
         response.raise_for_status()
         
         keywords_str = response.json()["choices"][0]["message"]["content"]
@@ -376,38 +1289,236 @@ def extract_keywords_llm(text: str) -> list[str]:
         return extract_keywords_heuristic(text)
 
 
+def extract_keywords_llm_batch(texts: list[str]) -> list[Optional[list[str]]]:
+    """Extract keywords for several chunks in one chat completion.
+    
+    Chunks are sent as a JSON list of {id, text} objects and the model answers
+    with a JSON object mapping each id to its keywords. Returns None for chunks
+    missing from the answer, or for all of them if the request fails.
+    """
+    # Truncate text to save tokens
+    chunks = [{"id": str(i), "text": text[:1000]} for i, text in enumerate(texts)]
+    content = json.dumps(chunks, ensure_ascii=False)
+    try:
+        RUN_STATS["keyword_requests"] += 1
+        http = keyword_http_client()
+        response = API_ENDPOINTS["keywords"].call(lambda: http.post(
+            OPENAI_CHAT_URL,
+            headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+            json={
+                "model": KEYWORD_MODEL,
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": "Extract 5-10 important keywords/key phrases from each text. The input is a JSON list of {\"id\", \"text\"} objects. Return ONLY a JSON object mapping every id to a list of keyword strings, no explanation."
+                    },
+                    {
+                        "role": "user",
+                        "content": content
+                    }
+                ],
+                "response_format": {"type": "json_object"},
+                "max_tokens": 80 * len(texts),
+                "temperature": 0
+            },
+            timeout=60.0
+        ), tokens=estimate_tokens(content) + 80 * len(texts))
+        response.raise_for_status()
+        keywords_by_id = json.loads(response.json()["choices"][0]["message"]["content"])
+        if not isinstance(keywords_by_id, dict):
+            raise ValueError(f"expected a JSON object, got {type(keywords_by_id).__name__}")
+    except Exception as e:
+        print(f"   [WARN] Batched LLM keyword extraction failed: {e}, falling back to heuristic")
+        return [None] * len(texts)
+    
+    results = []
+    for chunk in chunks:
+        keywords = keywords_by_id.get(chunk["id"])
+        if isinstance(keywords, list) and keywords:
+            results.append([str(k).strip().lower() for k in keywords if str(k).strip()][:10])
+        else:
+            results.append(None)
+    return results
+
+
+# LLM keyword cache (set in main with --llm-keywords unless --no-keyword-cache)
+KEYWORD_CACHE: Optional[KeywordCache] = None
+
+
+def extract_keywords_llm_many(texts: list[str]) -> list[list[str]]:
+    """LLM keywords for many chunks: cache first, then batched requests on a bounded pool.
+    
+    Chunks the LLM didn't answer for get heuristic keywords, which are not cached.
+    """
+    results = KEYWORD_CACHE.get_many(texts) if KEYWORD_CACHE else [None] * len(texts)
+    missing = [pos for pos, keywords in enumerate(results) if keywords is None]
+    if not missing:
+        return results
+    
+    extracted_by_llm = []
+    
+    batches = [missing[start:start + LLM_KEYWORD_BATCH_SIZE]
+               for start in range(0, len(missing), LLM_KEYWORD_BATCH_SIZE)]
+    keyword_http_client()  # before the threads, so they share one
+    with ThreadPoolExecutor(max_workers=LLM_KEYWORD_CONCURRENCY) as pool:
+        extracted = pool.map(
+            lambda positions: extract_keywords_llm_batch([texts[pos] for pos in positions]), batches
+        )
+        for positions, keyword_lists in zip(batches, extracted):
+            for pos, keywords in zip(positions, keyword_lists):
+                if keywords is None:
+                    results[pos] = extract_keywords_heuristic(texts[pos])
+                else:
+                    results[pos] = keywords
+                    extracted_by_llm.append(pos)
+    
+    if KEYWORD_CACHE:
+        KEYWORD_CACHE.put_many([texts[pos] for pos in extracted_by_llm],
+                               [results[pos] for pos in extracted_by_llm])
+    return results
+
+
 # Global flag for LLM keyword extraction
 USE_LLM_KEYWORDS = False
 
+# Global flag for bulk indexing
+USE_BULK = False
+
+
+def iter_chunks(elements: Iterable[dict]) -> Iterator[tuple[int, dict]]:
+    """Yield the elements worth indexing, with their position in the file."""
+    for i, element in enumerate(elements):
+        if element.get("text") and len(element["text"].strip()) >= 10:
+            yield i, element
+
+
+def select_chunks(elements: list[dict]) -> list[tuple[int, dict]]:
+    """Pick the elements worth indexing, keeping their position in the file."""
+    return list(iter_chunks(elements))
 
-def prepare_documents(elements: list[dict], filename: str) -> list[dict]:
-    """Prepare documents for OpenSearch indexing."""
+
+def iter_chunk_batches(elements: Iterable[dict]) -> Iterator[list[tuple[int, dict]]]:
+    """Group chunks into embedding-request-sized batches as elements stream in."""
+    batch = []
+    batch_tokens = 0
+    for i, element in iter_chunks(elements):
+        tokens = estimate_tokens(element["text"])
+        if batch and (len(batch) >= EMBEDDING_BATCH_SIZE
+                      or batch_tokens + tokens > EMBEDDING_BATCH_MAX_TOKENS):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append((i, element))
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def chunk_record_id(filename: str, position: int, text: str) -> str:
+    """Document id of the chunk at a position in a file."""
+    return hashlib.md5(f"{filename}_{position}_{text[:50]}".encode()).hexdigest()
+
+
+# Chunks seen so far in this run (set in main and in --workers processes with --dedup)
+DEDUPLICATOR: Optional[dedup.ChunkDeduplicator] = None
+
+
+def dedup_chunks(
+    candidates: list[tuple[int, dict]], filename: str
+) -> tuple[list[tuple[int, dict]], list[tuple[int, dict]], dict[int, str]]:
+    """Split chunks into new ones and duplicates of a chunk seen earlier in the run.
+    
+    Returns the new chunks (to embed), the duplicates to index as links (none
+    with --dedup skip) and the canonical record id for each duplicate's position.
+    """
+    if DEDUPLICATOR is None:
+        return candidates, [], {}
+    unique = []
+    duplicates = []
+    duplicate_of = {}
+    for i, element in candidates:
+        match = DEDUPLICATOR.check(element["text"], chunk_record_id(filename, i, element["text"]))
+        if match is None:
+            unique.append((i, element))
+            continue
+        canonical, kind = match
+        RUN_STATS[f"duplicates_{kind}"] += 1
+        duplicate_of[i] = canonical
+        if DEDUP_MODE == "link":
+            duplicates.append((i, element))
+    return unique, duplicates, duplicate_of
+
+
+def forget_failed_chunks(record_ids: Iterable[str]):
+    """Stop using chunks that failed to embed or index as canonical copies (--dedup).
+    
+    Later copies are then embedded and indexed themselves. Copies that were
+    already skipped for (or linked to) a failed chunk are counted and reported.
+    """
+    if DEDUPLICATOR is None:
+        return
+    for record_id in record_ids:
+        orphaned = DEDUPLICATOR.forget(record_id)
+        if orphaned:
+            RUN_STATS["duplicates_orphaned"] += orphaned
+            print(f"   [WARN] {orphaned} duplicate chunks were "
+                  f"{'linked to' if DEDUP_MODE == 'link' else 'skipped for'} chunk {record_id}, which failed")
+
+
+def drop_unembedded_canonicals(
+    candidates: list[tuple[int, dict]],
+    duplicates: list[tuple[int, dict]],
+    duplicate_of: dict[int, str],
+    errors: dict[int, Exception],
+    filename: str,
+) -> list[tuple[int, dict]]:
+    """Forget canonical chunks whose embedding failed; returns the duplicates that still have one."""
+    if DEDUPLICATOR is None or not errors:
+        return duplicates
+    failed = {chunk_record_id(filename, candidates[pos][0], candidates[pos][1]["text"]) for pos in errors}
+    forget_failed_chunks(failed)
+    return [(i, element) for i, element in duplicates if duplicate_of[i] not in failed]
+
+
+def build_documents(
+    candidates: list[tuple[int, dict]],
+    embeddings: list[Optional[list[float]]],
+    errors: dict[int, Exception],
+    filename: str,
+    duplicate_of: Optional[dict[int, str]] = None,
+) -> list[dict]:
+    """Build index actions for embedded chunks; chunks without an embedding are skipped.
+    
+    Chunks whose position is in `duplicate_of` are indexed without a vector and
+    with a pointer to the record id of the chunk they repeat.
+    """
     documents = []
+    duplicate_of = duplicate_of or {}
     
-    for i, element in enumerate(elements):
-        text = element.get("text", "")
-        if not text or len(text.strip()) < 10:
+    # Extract keywords for hybrid search in one batch (dynamic extraction)
+    embedded = [pos for pos, embedding in enumerate(embeddings)
+                if embedding is not None or candidates[pos][0] in duplicate_of]
+    keywords_by_pos = dict(zip(embedded, extract_keywords_many(
+        [candidates[pos][1]["text"] for pos in embedded], use_llm=USE_LLM_KEYWORDS
+    )))
+    
+    for pos, (i, element) in enumerate(candidates):
+        text = element["text"]
+        embedding = embeddings[pos]
+        if embedding is None and i not in duplicate_of:
+            print(f"   [WARN] Embedding failed for chunk {i+1}: {errors.get(pos)}")
             continue
         
         # Generate unique ID
-        record_id = hashlib.md5(f"{filename}_{i}_{text[:50]}".encode()).hexdigest()
-        
-        # Get embedding
-        print(f"   Embedding chunk {i+1}/{len(elements)}...", end='\r')
-        try:
-            embedding = get_embedding(text)
-        except Exception as e:
-            print(f"\n   [WARN] Embedding failed for chunk {i+1}: {e}")
-            continue
+        record_id = chunk_record_id(filename, i, text)
         
         # Clean metadata
         raw_metadata = element.get("metadata", {})
         metadata = clean_metadata(raw_metadata)
         metadata["filename"] = filename
         
-        # Extract keywords for hybrid search (dynamic extraction)
-        keywords_list = extract_keywords(text, use_llm=USE_LLM_KEYWORDS)
         # Join keywords as text for BM25 matching
+        keywords_list = keywords_by_pos[pos]
         keywords_text = " ".join(keywords_list) if keywords_list else ""
         
         # Create summary (first sentence or first 200 chars)
@@ -447,36 +1558,112 @@ def prepare_documents(elements: list[dict], filename: str) -> list[dict]:
                 "summary": summary,
             }
         }
+        if i in duplicate_of:
+            del doc["_source"]["vector_field"]
+            doc["_source"]["duplicate_of"] = duplicate_of[i]
         documents.append(doc)
     
-    print(f"\n   [OK] Prepared {len(documents)} documents with embeddings")
     return documents
 
 
-def ingest_file(client: OpenSearch, file_path: str):
-    """Ingest a single file into OpenSearch."""
-    path = Path(file_path)
+def prepare_documents(
+    elements: Iterable[dict], filename: str, stats: Optional[dict] = None, skip_ids: Optional[set] = None
+) -> Iterator[dict]:
+    """Prepare documents for OpenSearch indexing.
     
-    if not path.exists():
-        print(f"[ERROR] File not found: {file_path}")
-        return 0
+    A generator: elements are consumed as they arrive, embedded one batch at a
+    time and yielded as documents, so only about one embedding batch (plus the
+    indexer's current bulk request) is in memory, whatever the file size.
+    `stats` (if given) receives element, chunk and document counts. Chunks
+    whose document id is in `skip_ids` (already indexed) are not embedded,
+    nor are duplicates of earlier chunks (--dedup).
+    """
+    stats = stats if stats is not None else {}
+    stats.update(elements=0, embedded=0, failed=0, skipped=0, duplicates=0, documents=0)
+    requests_before = RUN_STATS["embedding_requests"]
+    hits_before = EMBEDDING_CACHE.hits if EMBEDDING_CACHE else 0
     
-    # Parse with Unstructured.io
-    elements = parse_with_unstructured(file_path)
+    def counted(elements: Iterable[dict]) -> Iterator[dict]:
+        for element in elements:
+            stats["elements"] += 1
+            yield element
     
-    if not elements:
-        print(f"   [WARN] No elements extracted from {path.name}")
-        return 0
+    def not_indexed(chunks: list[tuple[int, dict]]) -> list[tuple[int, dict]]:
+        if not skip_ids:
+            return chunks
+        kept = [(i, element) for i, element in chunks
+                if chunk_record_id(filename, i, element["text"]) not in skip_ids]
+        stats["skipped"] += len(chunks) - len(kept)
+        return kept
     
-    # Prepare documents with embeddings
-    documents = prepare_documents(elements, path.name)
+    for candidates in iter_chunk_batches(counted(elements)):
+        candidates, duplicates, duplicate_of = dedup_chunks(candidates, filename)
+        stats["duplicates"] += len(duplicate_of)
+        candidates = not_indexed(candidates)
+        duplicates = not_indexed(duplicates)
+        if not candidates and not duplicates:
+            continue
+        texts = [element["text"] for _, element in candidates]
+        embeddings, errors = get_chunk_embeddings(texts) if texts else ([], {})
+        stats["embedded"] += len(texts) - len(errors)
+        stats["failed"] += len(errors)
+        duplicates = drop_unembedded_canonicals(candidates, duplicates, duplicate_of, errors, filename)
+        with METRICS.timer("prepare"):
+            documents = build_documents(
+                candidates + duplicates, embeddings + [None] * len(duplicates), errors, filename, duplicate_of
+            )
+        for document in documents:
+            stats["documents"] += 1
+            yield document
     
-    if not documents:
-        print(f"   [WARN] No valid documents to index")
-        return 0
+    cached = EMBEDDING_CACHE.hits - hits_before if EMBEDDING_CACHE else 0
+    print(f"\n   [OK] Embedded {stats['embedded']} chunks in "
+          f"{RUN_STATS['embedding_requests'] - requests_before} requests ({cached} from cache)")
+    if stats["duplicates"]:
+        print(f"   [OK] {stats['duplicates']} duplicate chunks "
+              f"{'linked to' if DEDUP_MODE == 'link' else 'skipped in favour of'} an earlier copy")
+    print(f"   [OK] Prepared {stats['documents']} documents with embeddings")
+
+
+async def prepare_documents_async(
+    http: httpx.AsyncClient,
+    elements: list[dict],
+    filename: str,
+    limit: asyncio.Semaphore,
+    skip_ids: Optional[set] = None,
+    stats: Optional[dict] = None,
+) -> list[dict]:
+    """Async variant of prepare_documents; embedding requests share the limit semaphore."""
+    candidates, duplicates, duplicate_of = dedup_chunks(select_chunks(elements), filename)
+    if skip_ids:
+        candidates = [(i, element) for i, element in candidates
+                      if chunk_record_id(filename, i, element["text"]) not in skip_ids]
+        duplicates = [(i, element) for i, element in duplicates
+                      if chunk_record_id(filename, i, element["text"]) not in skip_ids]
+    texts = [element["text"] for _, element in candidates]
+    embeddings, errors = await get_chunk_embeddings_async(http, texts, limit)
+    duplicates = drop_unembedded_canonicals(candidates, duplicates, duplicate_of, errors, filename)
+    
+    # Keyword extraction may be CPU- or network-bound, keep it off the event loop
+    with METRICS.timer("prepare"):
+        documents = await asyncio.to_thread(
+            build_documents, candidates + duplicates, embeddings + [None] * len(duplicates), errors, filename,
+            duplicate_of,
+        )
+    if stats is not None:
+        stats.update(elements=len(elements), embedded=len(texts) - len(errors), failed=len(errors),
+                     duplicates=len(duplicate_of), documents=len(documents))
+    print(f"   [OK] {filename}: prepared {len(documents)} documents with embeddings")
+    return documents
+
+
+def index_documents(
+    client: OpenSearch, documents: Iterable[dict], on_indexed: Optional[Callable[[str], None]] = None
+) -> tuple[int, int]:
+    """Index documents one by one for better error visibility.
     
-    # Index documents one by one for better error visibility
-    print(f"   [INFO] Indexing {len(documents)} documents...")
+    `on_indexed` is called with the id of every acknowledged document.
+    """
     success_count = 0
     error_count = 0
     
@@ -488,48 +1675,1013 @@ def ingest_file(client: OpenSearch, file_path: str):
                 body=doc["_source"]
             )
             success_count += 1
+            if on_indexed:
+                on_indexed(doc["_id"])
         except Exception as e:
             error_count += 1
-            if error_count <= 3:
+            forget_failed_chunks([doc["_id"]])
+            if error_count <= MAX_INDEX_ERRORS_SHOWN:
                 print(f"   [WARN] Index error: {e}")
     
+    return success_count, error_count
+
+
+def bulk_lines(doc: dict) -> tuple[dict, dict]:
+    """Action and source lines of a document from build_documents.
+    
+    Unlike the helpers' default expand_action, this doesn't copy the document
+    (the copy and the pops are measurable with 1536-float sources).
+    """
+    return {"index": {"_index": doc["_index"], "_id": doc["_id"]}}, doc["_source"]
+
+
+def bulk_options() -> dict:
+    """Bulk helper options shared by the sync and async indexers."""
+    return {
+        "chunk_size": BULK_CHUNK_DOCS,
+        "max_chunk_bytes": BULK_CHUNK_BYTES,
+        "raise_on_error": False,
+        "raise_on_exception": False,
+        "expand_action_callback": bulk_lines,
+    }
+
+
+def bulk_item_id(item: dict) -> Optional[str]:
+    """Document id of a bulk response item ({"index": {"_id": ...}})."""
+    return next(iter(item.values()), {}).get("_id")
+
+
+def report_bulk_failure(item: dict, error_count: int):
+    """Print a failed bulk item, up to MAX_INDEX_ERRORS_SHOWN per file."""
+    if error_count > MAX_INDEX_ERRORS_SHOWN:
+        return
+    # item looks like {"index": {"_id": ..., "status": ..., "error": ...}}
+    info = next(iter(item.values()), {})
+    print(f"   [WARN] Index error for {info.get('_id')}: "
+          f"{info.get('error') or info.get('exception') or info}")
+
+
+def index_documents_bulk(
+    client: OpenSearch, documents: Iterable[dict], on_indexed: Optional[Callable[[str], None]] = None
+) -> tuple[int, int]:
+    """Index documents through the bulk API.
+    
+    `documents` may be a generator; it is consumed lazily. Uses streaming_bulk, or parallel_bulk when BULK_THREADS > 1. Requests are
+    flushed at BULK_CHUNK_DOCS documents or BULK_CHUNK_BYTES bytes. Failed items
+    are reported per document instead of aborting the whole batch.
+    `on_indexed` is called with the id of every acknowledged document.
+    """
+    if BULK_THREADS > 1:
+        results = helpers.parallel_bulk(client, documents, thread_count=BULK_THREADS, **bulk_options())
+    else:
+        results = helpers.streaming_bulk(client, documents, **bulk_options())
+    
+    success_count = 0
+    error_count = 0
+    for ok, item in results:
+        if ok:
+            success_count += 1
+            if on_indexed:
+                on_indexed(bulk_item_id(item))
+            continue
+        error_count += 1
+        forget_failed_chunks([bulk_item_id(item)])
+        report_bulk_failure(item, error_count)
+    
+    return success_count, error_count
+
+
+async def index_documents_async(
+    client, documents, on_indexed: Optional[Callable[[str], None]] = None
+) -> tuple[int, int]:
+    """Index documents through the bulk API with the async OpenSearch client."""
+    from opensearchpy.helpers import async_streaming_bulk
+    
+    success_count = 0
+    error_count = 0
+    async for ok, item in async_streaming_bulk(client, documents, **bulk_options()):
+        if ok:
+            success_count += 1
+            if on_indexed:
+                on_indexed(bulk_item_id(item))
+            continue
+        error_count += 1
+        forget_failed_chunks([bulk_item_id(item)])
+        report_bulk_failure(item, error_count)
+    
+    return success_count, error_count
+
+
+# Run journal (set in main with --journal or --resume)
+JOURNAL: Optional[RunJournal] = None
+
+
+def journal_progress(path: Path) -> Optional[dict]:
+    """The run journal's entry for a file, registering the file if it is new.
+    
+    Returns None with the journal off; otherwise the entry (status, counts)
+    plus its journal key, current fingerprint and the ids of documents already
+    acknowledged. A file whose content changed since it was journaled starts over.
+    """
+    if JOURNAL is None:
+        return None
+    key = str(path.resolve())
+    entry = JOURNAL.file(key)
+    previous = json.loads(entry["fingerprint"]) if entry else None
+    fingerprint = file_fingerprint(path, previous)
+    if entry and previous["sha256"] != fingerprint["sha256"]:
+        JOURNAL.reset_file(key)
+        entry = None
+    if entry is None:
+        JOURNAL.add_file(key, json.dumps(fingerprint))
+        entry = JOURNAL.file(key)
+    
+    progress = dict(entry, key=key, fingerprint=json.dumps(fingerprint), acked=set())
+    if entry["status"] != "done":
+        progress["acked"] = JOURNAL.acked_ids(key)
+    return progress
+
+
+def journaled_elements(path: Path, progress: Optional[dict]) -> Iterable[dict]:
+    """A file's elements: its journaled parse output if complete, else parsed (and journaled)."""
+    if progress and progress["status"] == "parsed":
+        print(f"[INFO] Reusing journaled parse output of {path.name} ({progress['elements']} elements)")
+        return JOURNAL.stored_elements(progress["key"])
+    if partitions_locally(path):
+        elements = partition_locally(str(path))
+    else:
+        elements = stream_with_unstructured(str(path))
+    if progress:
+        return JOURNAL.record_elements(progress["key"], progress["fingerprint"], elements)
+    return elements
+
+
+def journal_file_done(progress: Optional[dict], stats: dict) -> bool:
+    """Mark a file done in the run journal unless chunks are missing; returns whether it was."""
+    if progress is None:
+        return False
+    if stats.get("failed") or stats.get("errors"):
+        # Leave it open: --resume retries just the chunks that didn't make it
+        JOURNAL.flush()
+        return False
+    JOURNAL.finish_file(progress["key"], progress["fingerprint"], stats)
+    return True
+
+
+def nothing_indexed_error(stats: dict) -> Optional[str]:
+    """Why a file counts as failed: none of its chunks are in the index because they failed.
+    
+    A file that simply has no chunks (empty, or only filtered elements) has
+    not failed, and --incremental records its new fingerprint.
+    """
+    if stats.get("indexed") or not (stats.get("failed") or stats.get("errors")):
+        return None
+    return (f"none of its chunks were indexed ({stats.get('failed', 0)} failed to embed, "
+            f"{stats.get('errors', 0)} failed to index)")
+
+
+def ingest_file(client: OpenSearch, file_path: str):
+    """Ingest a single file into OpenSearch.
+    
+    With the run journal on, a file already done in a resumed run is skipped,
+    its journaled parse output is reused, and chunks the index acknowledged
+    before the interruption are neither embedded nor indexed again.
+    """
+    path = Path(file_path)
+    
+    if not path.exists():
+        print(f"[ERROR] File not found: {file_path}")
+        return 0
+    
+    progress = journal_progress(path)
+    if progress and progress["status"] == "done":
+        print(f"[INFO] Skipping {path.name}: already done in this run ({progress['indexed']} documents)")
+        return progress["indexed"]
+    acked = progress["acked"] if progress else set()
+    on_indexed = (lambda doc_id: JOURNAL.ack(progress["key"], doc_id)) if progress else None
+    if acked:
+        print(f"[INFO] Resuming {path.name}: {len(acked)} documents already indexed")
+    
+    # Parse -> embed -> index as one stream: documents are indexed while
+    # later elements are still being parsed and embedded
+    stats = {}
+    elements = METRICS.timed_iter("parse", journaled_elements(path, progress))
+    documents = prepare_documents(elements, path.name, stats, skip_ids=acked)
+    
+    print(f"   [INFO] Streaming documents to the index{' (bulk)' if USE_BULK else ''}...")
+    if USE_BULK:
+        success_count, error_count = index_documents_bulk(client, documents, on_indexed)
+    else:
+        success_count, error_count = index_documents(client, documents, on_indexed)
+    stats.update(indexed=success_count + len(acked), errors=error_count)
+    RUN_STATS["index_errors"] += error_count
+    journal_file_done(progress, stats)
+    failure = nothing_indexed_error(stats)
+    if failure:
+        raise Exception(failure)
+    
+    if not stats["elements"]:
+        print(f"   [WARN] No elements extracted from {path.name}")
+        return 0
+    if not stats["documents"] and not acked:
+        print(f"   [WARN] No valid documents to index")
+        return 0
+    
     # Force refresh to make documents searchable immediately
-    try:
-        client.indices.refresh(index=INDEX_NAME)
-    except Exception:
-        pass
+    if REFRESH_AFTER_FILE:
+        try:
+            client.indices.refresh(index=INDEX_NAME)
+        except Exception:
+            pass
+    if success_count:
+        bump_ingest_generation(client)
     
     print(f"   [OK] Indexed {success_count} documents ({error_count} errors)")
-    return success_count
+    return stats["indexed"]
+
+
+def list_supported_files(dir_path: str) -> list[Path]:
+    """List files in a directory that the ingestion pipeline can parse."""
+    return [f for f in Path(dir_path).iterdir() if f.suffix.lower() in SUPPORTED_EXTENSIONS]
 
 
 def ingest_directory(client: OpenSearch, dir_path: str):
     """Ingest all supported files from a directory."""
-    path = Path(dir_path)
-    supported_extensions = {".pdf", ".docx", ".doc", ".txt", ".md", ".html"}
-    
-    files = [f for f in path.iterdir() if f.suffix.lower() in supported_extensions]
+    files = list_supported_files(dir_path)
     
     if not files:
         print(f"[ERROR] No supported files found in {dir_path}")
-        return
+        return 0
     
     print(f"[INFO] Found {len(files)} files to process")
     
-    total_indexed = 0
+    total_indexed = sum(ingest_files(client, files).values())
+    
+    print(f"\n{'='*50}")
+    print(f"[OK] Total indexed: {total_indexed} documents")
+    return total_indexed
+
+
+async def ingest_files_async(files: list[Path], concurrency: int = 16, summary: bool = True) -> dict[Path, int]:
+    """Ingest files through an overlapped parse -> embed -> index pipeline.
+    
+    Each stage runs its own workers connected by bounded queues, so parsing
+    file N+1, embedding file N and bulk-indexing file N-1 happen at the same
+    time. A full queue pauses the stage feeding it. `concurrency` caps the
+    embedding requests in flight across all files. The run journal is used as
+    in ingest_file.
+    
+    Returns the number of indexed documents for each file that completed.
+    """
+    file_queue = asyncio.Queue()
     for file_path in files:
+        file_queue.put_nowait(file_path)
+    embed_queue = asyncio.Queue(maxsize=ASYNC_QUEUE_SIZE)
+    index_queue = asyncio.Queue(maxsize=ASYNC_QUEUE_SIZE)
+    embed_limit = asyncio.Semaphore(concurrency)
+    totals = {"indexed": 0, "errors": 0}
+    indexed = {}
+    
+    async def parse_stage():
+        while not file_queue.empty():
+            file_path = file_queue.get_nowait()
+            try:
+                progress = await asyncio.to_thread(journal_progress, file_path)
+                if progress and progress["status"] == "done":
+                    print(f"[INFO] Skipping {file_path.name}: already done in this run "
+                          f"({progress['indexed']} documents)")
+                    indexed[file_path] = progress["indexed"]
+                    continue
+                with METRICS.timer("parse"):
+                    if progress and progress["status"] == "parsed":
+                        elements = await asyncio.to_thread(lambda: list(JOURNAL.stored_elements(progress["key"])))
+                        print(f"   → {file_path.name}: reusing {len(elements)} journaled elements")
+                    else:
+                        if partitions_locally(file_path):
+                            elements = await partition_locally_async(str(file_path))
+                        else:
+                            elements = await parse_with_unstructured_async(http, str(file_path))
+                        if progress:
+                            await asyncio.to_thread(
+                                JOURNAL.save_elements, progress["key"], progress["fingerprint"], elements
+                            )
+            except Exception as e:
+                RUN_STATS["failed_files"] += 1
+                print(f"[ERROR] Error processing {file_path.name}: {e}")
+                continue
+            if not elements:
+                print(f"   [WARN] No elements extracted from {file_path.name}")
+                journal_file_done(progress, {})
+                indexed[file_path] = 0
+                continue
+            await embed_queue.put((file_path, elements, progress))
+    
+    async def embed_stage():
+        while (job := await embed_queue.get()) is not None:
+            file_path, elements, progress = job
+            acked = progress["acked"] if progress else set()
+            stats = {}
+            try:
+                documents = await prepare_documents_async(
+                    http, elements, file_path.name, embed_limit, skip_ids=acked, stats=stats
+                )
+            except Exception as e:
+                RUN_STATS["failed_files"] += 1
+                print(f"[ERROR] Error processing {file_path.name}: {e}")
+                continue
+            if not documents:
+                if not acked:
+                    print(f"   [WARN] No valid documents to index from {file_path.name}")
+                stats.update(indexed=len(acked), errors=0)
+                journal_file_done(progress, stats)
+                failure = nothing_indexed_error(stats)
+                if failure:
+                    RUN_STATS["failed_files"] += 1
+                    print(f"[ERROR] Error processing {file_path.name}: {failure}")
+                    continue
+                indexed[file_path] = len(acked)
+                continue
+            await index_queue.put((file_path, documents, progress, stats))
+    
+    async def index_stage():
+        while (job := await index_queue.get()) is not None:
+            file_path, documents, progress, stats = job
+            on_indexed = (lambda doc_id, key=progress["key"]: JOURNAL.ack(key, doc_id)) if progress else None
+            try:
+                success_count, error_count = await index_documents_async(client, documents, on_indexed)
+            except Exception as e:
+                RUN_STATS["failed_files"] += 1
+                print(f"[ERROR] Error processing {file_path.name}: {e}")
+                continue
+            totals["indexed"] += success_count
+            totals["errors"] += error_count
+            RUN_STATS["index_errors"] += error_count
+            previously = len(progress["acked"]) if progress else 0
+            stats.update(indexed=success_count + previously, errors=error_count)
+            journal_file_done(progress, stats)
+            failure = nothing_indexed_error(stats)
+            if failure:
+                RUN_STATS["failed_files"] += 1
+                print(f"[ERROR] Error processing {file_path.name}: {failure}")
+                continue
+            indexed[file_path] = success_count + previously
+            print(f"   [OK] {file_path.name}: indexed {success_count} documents ({error_count} errors)")
+    
+    async def drain():
+        # Drain stage by stage; one None per worker tells it to stop
+        await asyncio.gather(*parsers)
+        for _ in embedders:
+            await embed_queue.put(None)
+        await asyncio.gather(*embedders)
+        for _ in indexers:
+            await index_queue.put(None)
+        await asyncio.gather(*indexers)
+    
+    limits = httpx.Limits(max_connections=concurrency + ASYNC_PARSE_CONCURRENCY)
+    async with httpx.AsyncClient(limits=limits) as http:
+        client = create_async_opensearch_client()
         try:
-            indexed = ingest_file(client, str(file_path))
-            total_indexed += indexed
+            parsers = [asyncio.create_task(parse_stage()) for _ in range(ASYNC_PARSE_CONCURRENCY)]
+            embedders = [asyncio.create_task(embed_stage()) for _ in range(ASYNC_EMBED_FILES)]
+            indexers = [asyncio.create_task(index_stage()) for _ in range(ASYNC_INDEX_CONCURRENCY)]
+            
+            # A dead worker would leave the stages feeding it blocked on a full
+            # queue, and drain() with them; stop everything on the first failure
+            tasks = [*parsers, *embedders, *indexers, asyncio.create_task(drain())]
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            failed = next((task for task in tasks if task.done() and not task.cancelled() and task.exception()), None)
+            if failed is not None:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise failed.exception()
+            
+            # Force refresh to make documents searchable immediately
+            if REFRESH_AFTER_FILE:
+                try:
+                    await client.indices.refresh(index=INDEX_NAME)
+                except Exception:
+                    pass
+        finally:
+            await client.close()
+    
+    if summary:
+        print(f"\n{'='*50}")
+        print(f"[OK] Total indexed: {totals['indexed']} documents ({totals['errors']} errors)")
+    return indexed
+
+
+def ingest_files(
+    client: OpenSearch, files: list[Path], use_async: bool = False, concurrency: int = 16
+) -> dict[Path, int]:
+    """Ingest files one by one, through the async pipeline, or across WORKERS processes.
+    
+    Returns the number of indexed documents for each file that completed.
+    """
+    if use_async or (WORKERS > 1 and len(files) > 1):
+        if WORKERS > 1 and len(files) > 1:
+            indexed = ingest_files_parallel(files, use_async=use_async, concurrency=concurrency)
+        else:
+            indexed = asyncio.run(ingest_files_async(files, concurrency=concurrency))
+        # The async pipeline writes without ingest_file; one bump covers the whole batch
+        if use_async and any(indexed.values()):
+            bump_ingest_generation(client)
+        return indexed
+    
+    indexed = {}
+    for i, file_path in enumerate(files):
+        # Keep the partitioning processes busy with the text files coming up next
+        prefetch_local_partitions(files[i:i + PARTITION_PROCESSES + 1])
+        try:
+            indexed[file_path] = ingest_file(client, str(file_path))
         except Exception as e:
+            RUN_STATS["failed_files"] += 1
             print(f"[ERROR] Error processing {file_path.name}: {e}")
+    return indexed
+
+
+# Settings main() may change, copied into --workers processes
+WORKER_SETTINGS = (
+    "INDEX_NAME", "OPENSEARCH_HOST", "OPENSEARCH_PORT",
+    "UNSTRUCTURED_API_KEY", "UNSTRUCTURED_API_URL", "UNSTRUCTURED_PARAMS", "SPLIT_PDF_PAGES", "SPLIT_PDF_CONCURRENCY",
+    "PARTITION_MODE",
+    "OPENAI_API_KEY", "OPENAI_EMBEDDINGS_URL", "OPENAI_CHAT_URL",
+    "EMBEDDING_MODEL", "EMBEDDING_DIMENSIONS", "EMBEDDING_THREADS", "EMBEDDING_BATCH_SIZE", "EMBEDDING_BATCH_MAX_TOKENS",
+    "USE_LLM_KEYWORDS", "LLM_KEYWORD_BATCH_SIZE", "LLM_KEYWORD_CONCURRENCY",
+    "USE_BULK", "BULK_CHUNK_DOCS", "BULK_CHUNK_BYTES", "BULK_THREADS", "REFRESH_AFTER_FILE",
+    "JSON_SERIALIZER", "VECTOR_PRECISION", "HTTP_COMPRESS_LEVEL",
+    "ASYNC_PARSE_CONCURRENCY", "ASYNC_EMBED_FILES", "ASYNC_INDEX_CONCURRENCY", "ASYNC_QUEUE_SIZE",
+    "MAX_INDEX_ERRORS_SHOWN", "DEDUP_MODE", "DEDUP_THRESHOLD",
+)
+
+# OpenSearch client of a --workers process (set by init_worker)
+WORKER_CLIENT: Optional[OpenSearch] = None
+
+
+def init_worker(settings: dict, endpoint_specs: dict, stores: dict):
+    """Set up a --workers process: settings, shared API budgets, caches, journal and its own client."""
+    global API_ENDPOINTS, EMBEDDING_CACHE, KEYWORD_CACHE, JOURNAL, WORKER_CLIENT, DEDUPLICATOR
+    global PARTITION_PROCESSES
+    globals().update(settings)
+    # The worker processes already use the cores; partition text files in each worker itself
+    PARTITION_PROCESSES = 0
+    if DEDUP_MODE != "off":
+        # Each process only knows the chunks of its own files
+        DEDUPLICATOR = dedup.ChunkDeduplicator(DEDUP_THRESHOLD)
+    API_ENDPOINTS = {name: rate_limit.Endpoint.attach(spec) for name, spec in endpoint_specs.items()}
+    for endpoint in API_ENDPOINTS.values():
+        endpoint.observer = record_api_request
+    if stores.get("embedding_cache"):
+        EMBEDDING_CACHE = EmbeddingCache(**stores["embedding_cache"])
+    if stores.get("keyword_cache"):
+        KEYWORD_CACHE = KeywordCache(**stores["keyword_cache"])
+    if stores.get("journal"):
+        JOURNAL = RunJournal(**stores["journal"])
+    WORKER_CLIENT = create_opensearch_client()
+
+
+def take_worker_counters() -> dict:
+    """The counters this process gathered since the last call, reset to zero for the next task."""
+    counters = {
+        "run_stats": dict(RUN_STATS),
+        "endpoints": {name: endpoint.counters() for name, endpoint in API_ENDPOINTS.items()},
+        "embedding_cache": None,
+        "keyword_cache": None,
+        "metrics": METRICS.take(),
+    }
+    RUN_STATS.update(dict.fromkeys(RUN_STATS, 0))
+    for name, endpoint in API_ENDPOINTS.items():
+        endpoint.add_counters({key: -value for key, value in counters["endpoints"][name].items()})
+    if EMBEDDING_CACHE is not None:
+        counters["embedding_cache"] = (EMBEDDING_CACHE.hits, EMBEDDING_CACHE.misses, EMBEDDING_CACHE.evictions)
+        EMBEDDING_CACHE.hits = EMBEDDING_CACHE.misses = EMBEDDING_CACHE.evictions = 0
+    if KEYWORD_CACHE is not None:
+        counters["keyword_cache"] = (KEYWORD_CACHE.hits, KEYWORD_CACHE.misses)
+        KEYWORD_CACHE.hits = KEYWORD_CACHE.misses = 0
+    if JOURNAL is not None:
+        JOURNAL.flush()
+    return counters
+
+
+def merge_worker_counters(counters: dict):
+    """Add a worker's counters (see take_worker_counters) to this process's totals."""
+    for key, value in counters["run_stats"].items():
+        RUN_STATS[key] += value
+    for name, endpoint_counters in counters["endpoints"].items():
+        API_ENDPOINTS[name].add_counters(endpoint_counters)
+    METRICS.merge(counters["metrics"])
+    if EMBEDDING_CACHE is not None and counters["embedding_cache"]:
+        hits, misses, evictions = counters["embedding_cache"]
+        EMBEDDING_CACHE.hits += hits
+        EMBEDDING_CACHE.misses += misses
+        EMBEDDING_CACHE.evictions += evictions
+    if KEYWORD_CACHE is not None and counters["keyword_cache"]:
+        hits, misses = counters["keyword_cache"]
+        KEYWORD_CACHE.hits += hits
+        KEYWORD_CACHE.misses += misses
+
+
+def ingest_file_in_worker(file_path: Path) -> tuple[Optional[int], dict]:
+    """--workers task: ingest one file; returns its document count (None if it failed) and counters."""
+    try:
+        indexed = ingest_file(WORKER_CLIENT, str(file_path))
+    except Exception as e:
+        RUN_STATS["failed_files"] += 1
+        print(f"[ERROR] Error processing {file_path.name}: {e}")
+        indexed = None
+    return indexed, take_worker_counters()
+
+
+def ingest_shard_in_worker(files: list[Path], concurrency: int) -> tuple[dict[Path, int], dict]:
+    """--workers --async task: run the async pipeline over a shard of files."""
+    indexed = asyncio.run(ingest_files_async(files, concurrency=concurrency, summary=False))
+    return indexed, take_worker_counters()
+
+
+def ingest_files_parallel(files: list[Path], use_async: bool = False, concurrency: int = 16) -> dict[Path, int]:
+    """Shard files across WORKERS processes.
+    
+    Each worker has its own OpenSearch and HTTP clients and does its own JSON
+    decoding, keyword extraction and bulk serialization. The API request
+    budgets (rate_limit.py) live in shared memory, so the workers together stay
+    within them. Files are handed out one at a time as workers free up; with
+    --async each worker instead runs the async pipeline over its own shard,
+    with `concurrency` embedding requests in flight per worker. Results and
+    counters are collected here.
+    """
+    workers = min(WORKERS, len(files))
+    context = multiprocessing.get_context("spawn")
+    endpoint_specs = {name: endpoint.share(context) for name, endpoint in API_ENDPOINTS.items()}
+    settings = {name: globals()[name] for name in WORKER_SETTINGS}
+    # Local models would otherwise each claim every core
+    settings["EMBEDDING_THREADS"] = EMBEDDING_THREADS or max(1, (os.cpu_count() or 1) // workers)
+    stores = {}
+    if EMBEDDING_CACHE is not None:
+        stores["embedding_cache"] = {
+            "path": str(EMBEDDING_CACHE.path),
+            "model": EMBEDDING_CACHE.model,
+            "dimension": EMBEDDING_CACHE.dimension,
+            "max_bytes": EMBEDDING_CACHE.max_bytes,
+        }
+    if KEYWORD_CACHE is not None:
+        stores["keyword_cache"] = {"path": str(KEYWORD_CACHE.path), "model": KEYWORD_CACHE.model}
+    if JOURNAL is not None:
+        JOURNAL.flush()
+        stores["journal"] = {
+            "path": str(JOURNAL.path),
+            "index": JOURNAL.index,
+            "inputs": json.loads(JOURNAL.inputs),
+            "run_id": JOURNAL.run_id,
+        }
+    
+    print(f"[INFO] Sharding {len(files)} files across {workers} worker processes")
+    indexed = {}
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=init_worker,
+        initargs=(settings, endpoint_specs, stores),
+    ) as pool:
+        if use_async:
+            futures = {pool.submit(ingest_shard_in_worker, files[i::workers], concurrency): files[i::workers]
+                       for i in range(workers)}
+        else:
+            futures = {pool.submit(ingest_file_in_worker, file_path): [file_path] for file_path in files}
+        
+        for future in as_completed(futures):
+            shard = futures[future]
+            done += len(shard)
+            try:
+                result, counters = future.result()
+            except Exception as e:
+                # The worker process died (e.g. out of memory)
+                RUN_STATS["failed_files"] += len(shard)
+                print(f"[ERROR] Worker failed on {', '.join(f.name for f in shard)}: {e}")
+                continue
+            merge_worker_counters(counters)
+            if use_async:
+                indexed.update(result)
+            elif result is not None:
+                indexed[shard[0]] = result
+            print(f"[INFO] Progress: {done}/{len(files)} files, {sum(indexed.values())} documents indexed, "
+                  f"{RUN_STATS['index_errors']} index errors, {RUN_STATS['failed_files']} failed files")
+    return indexed
+
+
+def load_manifest(manifest_path: str) -> dict:
+    """Load the incremental ingestion manifest ({index: {path: fingerprint}})."""
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest_path: str, manifest: dict):
+    """Write the manifest atomically so a crash never leaves it half-written."""
+    path = Path(manifest_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_fingerprint(path: Path, previous: Optional[dict] = None) -> dict:
+    """Fingerprint a file by size, mtime and content hash.
+    
+    If size and mtime match the previous fingerprint the stored hash is reused,
+    so unchanged files are never read.
+    """
+    stat = path.stat()
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "filename": path.name}
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+        fingerprint["sha256"] = previous["sha256"]
+        return fingerprint
+    
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+def delete_file_chunks(client: OpenSearch, filename: str) -> int:
+    """Delete every chunk previously indexed for a file in one delete_by_query."""
+    response = client.delete_by_query(
+        index=INDEX_NAME,
+        body={"query": {"term": {"metadata.filename": filename}}},
+        conflicts="proceed",
+        refresh=True,
+    )
+    if response.get("deleted"):
+        bump_ingest_generation(client)
+    return response.get("deleted", 0)
+
+
+def ingest_directory_incremental(
+    client: OpenSearch,
+    dir_path: str,
+    manifest_path: str,
+    use_async: bool = False,
+    concurrency: int = 16,
+) -> int:
+    """Ingest only new or changed files, and drop chunks of files that disappeared.
+    
+    Each file's fingerprint is kept in the manifest under the index name. A
+    changed file has its old chunks removed with one delete_by_query on
+    metadata.filename before it is re-ingested, so shifted chunk ids never
+    leave orphans behind.
+    """
+    files = list_supported_files(dir_path)
+    manifest = load_manifest(manifest_path)
+    entries = manifest.setdefault(INDEX_NAME, {})
+    
+    unchanged = 0
+    to_ingest = []
+    fingerprints = {}
+    for file_path in files:
+        key = str(file_path.resolve())
+        previous = entries.get(key)
+        fingerprint = file_fingerprint(file_path, previous)
+        if previous and previous["sha256"] == fingerprint["sha256"]:
+            # Content unchanged (possibly just touched) - refresh the stat fields only
+            entries[key] = fingerprint
+            unchanged += 1
+            continue
+        fingerprints[file_path] = fingerprint
+        to_ingest.append(file_path)
+    
+    # Files that were ingested from this directory before but no longer exist
+    dir_key = str(Path(dir_path).resolve())
+    present = {str(f.resolve()) for f in files}
+    removed = [key for key in entries if str(Path(key).parent) == dir_key and key not in present]
+    for key in removed:
+        deleted = delete_file_chunks(client, entries[key]["filename"])
+        print(f"[INFO] Removed {deleted} chunks of deleted file {entries[key]['filename']}")
+        del entries[key]
+    
+    print(f"[INFO] Incremental: {len(to_ingest)} new/changed, {unchanged} unchanged, {len(removed)} removed")
+    save_manifest(manifest_path, manifest)
+    
+    # Clear out stale chunks first; new chunk ids may not overlap the old ones.
+    # A resumed run already did this for files it got to, and must not delete
+    # the documents they have indexed since
+    for file_path in to_ingest:
+        progress = journal_progress(file_path)
+        if progress and (progress["status"] == "done" or progress["acked"]):
+            continue
+        deleted = delete_file_chunks(client, file_path.name)
+        if deleted:
+            print(f"[INFO] Deleted {deleted} stale chunks of {file_path.name}")
+    
+    indexed = ingest_files(client, to_ingest, use_async=use_async, concurrency=concurrency) if to_ingest else {}
+    
+    # Remember every file that was processed, including ones that now have no
+    # chunks (their old ones are gone already); failed files are retried next run
+    for file_path in indexed:
+        entries[str(file_path.resolve())] = fingerprints[file_path]
+    save_manifest(manifest_path, manifest)
     
     print(f"\n{'='*50}")
-    print(f"[OK] Total indexed: {total_indexed} documents")
+    print(f"[OK] Incremental run: {sum(indexed.values())} documents indexed from "
+          f"{len(to_ingest)} files, {unchanged} files skipped")
+    return sum(indexed.values())
+
+
+def reset_manifest(manifest_path: str):
+    """Forget all fingerprints for INDEX_NAME (its contents are being rebuilt)."""
+    manifest = load_manifest(manifest_path)
+    if manifest.pop(INDEX_NAME, None) is not None:
+        save_manifest(manifest_path, manifest)
+
+
+def needs_unstructured_api(args) -> bool:
+    """Whether any input file is sent to the Unstructured API (PDFs, Word documents, --partition api)."""
+    if args.rebuild and args.reindex_existing:
+        return False
+    if args.file:
+        files = [Path(args.file)]
+    else:
+        directory = Path(args.dir) if args.dir else Path(__file__).parent.parent / "data" / "demo_docs"
+        files = list_supported_files(str(directory)) if directory.is_dir() else []
+    return any(not partitions_locally(path) for path in files)
+
+
+def run_inputs(args) -> dict:
+    """What a run ingests; --resume only picks up a run with the same inputs."""
+    return {
+        "file": str(Path(args.file).resolve()) if args.file else None,
+        "dir": str(Path(args.dir).resolve()) if args.dir else None,
+        "incremental": bool(args.incremental),
+    }
+
+
+def close_journal():
+    """Close the run journal; the run stays resumable while any file is unfinished."""
+    counts = JOURNAL.counts()
+    if JOURNAL.finish():
+        print(f"[OK] Run journal: all {sum(counts.values())} files done")
+    else:
+        unfinished = sum(count for status, count in counts.items() if status != "done")
+        print(f"[WARN] Run journal: {unfinished} file(s) unfinished; run again with --resume to complete them")
+    JOURNAL.close()
+
+
+def run_ingestion(client: OpenSearch, args) -> int:
+    """Ingest the files selected on the command line into INDEX_NAME; returns docs indexed."""
+    if args.incremental and args.dir:
+        return ingest_directory_incremental(
+            client, args.dir, args.manifest, use_async=args.use_async, concurrency=args.concurrency
+        )
+    if args.use_async and (args.file or args.dir):
+        files = [Path(args.file)] if args.file else list_supported_files(args.dir)
+        if not files:
+            print(f"[ERROR] No supported files found in {args.dir}")
+            return 0
+        print(f"[INFO] Found {len(files)} files to process")
+        return sum(ingest_files(client, files, use_async=True, concurrency=args.concurrency).values())
+    if args.file:
+        return ingest_file(client, args.file)
+    if args.dir:
+        return ingest_directory(client, args.dir)
+    
+    # Default: ingest demo docs
+    demo_dir = Path(__file__).parent.parent / "data" / "demo_docs"
+    if demo_dir.exists():
+        return ingest_directory(client, str(demo_dir))
+    print("[ERROR] No input specified. Use --file or --dir")
+    print(f"   Or create demo docs: python scripts/download_demo_pdfs.py")
+    return 0
+
+
+def rebuild_index(client: OpenSearch, args):
+    """Rebuild INDEX_NAME into a new versioned index and swap the alias over.
+    
+    The live index keeps serving queries while hybrid_demo_v{n+1} is filled
+    with bulk-load settings - from the input files, or with --reindex-existing
+    by copying the current documents so nothing is re-embedded. The alias only
+    moves once the new doc count checks out; older versions are then deleted.
+    """
+    global INDEX_NAME
+    alias = INDEX_NAME
+    
+    if client.indices.exists_alias(name=alias):
+        source = alias
+    elif client.indices.exists(index=alias):
+        # Pre-versioning concrete index; it is replaced by the alias on swap
+        source = alias
+    else:
+        source = None
+    source_count = client.count(index=source)["count"] if source else 0
+    
+    dimensions = None
+    if args.reindex_existing and source:
+        source_dimension = index_vector_dimension(client, source)
+        if source_dimension and source_dimension < EMBEDDING_DIMENSION:
+            print(f"[ERROR] '{source}' stores {source_dimension}-dim vectors, can't reindex them "
+                  f"as {EMBEDDING_DIMENSION}-dim; rebuild from the input files instead")
+            return
+        if source_dimension and source_dimension > EMBEDDING_DIMENSION:
+            dimensions = EMBEDDING_DIMENSION
+    
+    versions = list_index_versions(client, alias)
+    new_index = versioned_index_name(alias, versions[-1][0] + 1 if versions else 1)
+    client.indices.create(index=new_index, body=INDEX_SCHEMA)
+    create_search_pipeline(client)
+    print(f"[OK] Created '{new_index}' for rebuild of '{alias}' ({source_count} live documents)")
+    
+    timings = {}
+    start = time.perf_counter()
+    previous_settings = begin_bulk_load(client, new_index, defer_knn_graphs=args.defer_knn_graphs)
+    timings["bulk_settings"] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    INDEX_NAME = new_index
+    try:
+        if args.reindex_existing:
+            if not source:
+                raise Exception(f"Nothing to reindex: '{alias}' does not exist")
+            expected = reindex_into(client, source, new_index, dimensions=dimensions)
+        else:
+            # The new index starts empty, so fingerprints from the old one don't apply
+            reset_manifest(args.manifest)
+            expected = run_ingestion(client, args)
+    finally:
+        INDEX_NAME = alias
+        timings["load"] = time.perf_counter() - start
+        timings.update(finish_bulk_load(
+            client, new_index, previous_settings, max_segments=args.force_merge_segments
+        ))
+        print_phase_timings(timings)
+    
+    # Validate before exposing the new index to readers
+    new_count = client.count(index=new_index)["count"]
+    problems = []
+    if new_count == 0:
+        problems.append("new index is empty")
+    if new_count != expected:
+        problems.append(f"expected {expected} documents, found {new_count}")
+    if args.reindex_existing and new_count != source_count:
+        problems.append(f"source had {source_count} documents, copy has {new_count}")
+    if source_count and new_count < source_count * REBUILD_MIN_DOC_RATIO:
+        problems.append(f"only {new_count}/{source_count} of the live document count")
+    if problems:
+        print(f"[ERROR] Not swapping alias '{alias}': {'; '.join(problems)}")
+        print(f"   '{new_index}' was left in place for inspection")
+        if not args.reindex_existing:
+            # Fingerprints now describe the abandoned index, not the live one
+            reset_manifest(args.manifest)
+        return
+    
+    swap_alias(client, alias, new_index)
+    bump_ingest_generation(client, alias)
+    gc_index_versions(client, alias, keep=args.keep_versions)
+
+
+def print_run_summary():
+    """Print embedding, keyword and cache counters for the run."""
+    print(f"[OK] Embedded {RUN_STATS['embedded_chunks']} chunks in "
+          f"{RUN_STATS['embedding_requests']} embedding requests")
+    if EMBEDDING_CACHE is not None:
+        lookups = EMBEDDING_CACHE.hits + EMBEDDING_CACHE.misses
+        hit_rate = EMBEDDING_CACHE.hits / lookups * 100 if lookups else 0.0
+        print(f"[OK] Embedding cache: {EMBEDDING_CACHE.hits} hits, {EMBEDDING_CACHE.misses} misses "
+              f"({hit_rate:.1f}% hit rate), {EMBEDDING_CACHE.evictions} evicted")
+    if USE_LLM_KEYWORDS:
+        print(f"[OK] LLM keyword requests: {RUN_STATS['keyword_requests']}")
+    if DEDUP_MODE != "off":
+        print(f"[OK] Duplicate chunks {'linked' if DEDUP_MODE == 'link' else 'skipped'}: "
+              f"{RUN_STATS['duplicates_exact']} exact, {RUN_STATS['duplicates_near']} near "
+              f"(threshold {DEDUP_THRESHOLD})")
+        if RUN_STATS["duplicates_orphaned"]:
+            print(f"[WARN] {RUN_STATS['duplicates_orphaned']} duplicates were "
+                  f"{'linked to' if DEDUP_MODE == 'link' else 'skipped for'} chunks that failed; "
+                  f"re-ingest with --recreate to index them")
+    if RUN_STATS["index_errors"] or RUN_STATS["failed_files"]:
+        print(f"[WARN] {RUN_STATS['index_errors']} documents rejected by the index, "
+              f"{RUN_STATS['failed_files']} files failed")
+    if KEYWORD_CACHE is not None:
+        print(f"[OK] Keyword cache: {KEYWORD_CACHE.hits} hits, {KEYWORD_CACHE.misses} misses")
+    for endpoint in API_ENDPOINTS.values():
+        if endpoint.retries or endpoint.exhausted:
+            print(f"[INFO] {endpoint.summary()}")
+    stages = METRICS.stage_totals()
+    if stages:
+        # Stages overlap: prepare includes keywords, and streaming/async runs them concurrently
+        print("[OK] Time per stage: " + ", ".join(
+            f"{stage} {stages[stage]:.1f}s" for stage in ("parse", "embed", "keywords", "prepare", "index")
+            if stage in stages
+        ))
+
+
+def export_metrics(path: str, fmt: str, seconds: float):
+    """Add the run's totals (run stats, API counters, caches) to METRICS and write them to path."""
+    for key, value in RUN_STATS.items():
+        METRICS.add(f"run_{key}", value)
+    for endpoint in API_ENDPOINTS.values():
+        for key, value in endpoint.counters().items():
+            METRICS.add(f"api_{key}", value, service=endpoint.name)
+    for name, cache in (("embeddings", EMBEDDING_CACHE), ("keywords", KEYWORD_CACHE)):
+        if cache is not None:
+            METRICS.add("cache_hits", cache.hits, cache=name)
+            METRICS.add("cache_misses", cache.misses, cache=name)
+    if EMBEDDING_CACHE is not None:
+        METRICS.add("cache_evictions", EMBEDDING_CACHE.evictions, cache="embeddings")
+    METRICS.set("run_seconds", round(seconds, 3), index=INDEX_NAME)
+    METRICS.set("run_last_finished_timestamp_seconds", round(time.time(), 3), index=INDEX_NAME)
+    METRICS.write(path, fmt)
+    print(f"[OK] Metrics written to {path} ({fmt})")
+
+
+def connect_and_ingest(args):
+    """Connect to OpenSearch, set up the index and run the ingestion described by args."""
+    global JOURNAL
+    
+    # Connect to OpenSearch
+    client = create_opensearch_client()
+    
+    try:
+        info = client.info()
+        print(f"[OK] Connected to OpenSearch {info['version']['number']}")
+    except Exception as e:
+        print(f"[ERROR] Failed to connect to OpenSearch: {e}")
+        return
+    
+    if args.vector_encoder == "pq":
+        try:
+            model_id = train_pq_model(
+                client,
+                args.pq_training_index or INDEX_NAME,
+                EMBEDDING_DIMENSION,
+                args.pq_m or EMBEDDING_DIMENSION // 4,
+            )
+        except Exception as e:
+            print(f"[ERROR] PQ needs a model trained on existing {EMBEDDING_DIMENSION}-dim vectors: {e}")
+            print("   Ingest with the default encoder first, then use --rebuild --reindex-existing --vector-encoder pq")
+            return
+        configure_vector_field(EMBEDDING_DIMENSION, "pq", model_id)
+    
+    if args.rebuild:
+        rebuild_index(client, args)
+    else:
+        # Create index
+        create_index(client, INDEX_NAME, recreate=args.recreate)
+        if not check_vector_dimension(client, INDEX_NAME):
+            return
+        if args.recreate:
+            reset_manifest(args.manifest)
+        
+        if args.journal or args.resume:
+            JOURNAL = RunJournal(args.journal_path, INDEX_NAME, run_inputs(args), resume=args.resume)
+            if JOURNAL.resumed:
+                counts = JOURNAL.counts()
+                print(f"[OK] Resuming interrupted run: {counts.get('done', 0)} of {sum(counts.values())} "
+                      f"started files done")
+            elif args.resume:
+                print("[INFO] No interrupted run to resume for these inputs, starting a new one")
+        
+        timings = {}
+        if args.bulk_load:
+            start = time.perf_counter()
+            previous_settings = begin_bulk_load(client, INDEX_NAME, defer_knn_graphs=args.defer_knn_graphs)
+            timings["bulk_settings"] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        try:
+            run_ingestion(client, args)
+        finally:
+            if JOURNAL is not None:
+                JOURNAL.flush()
+            timings["load"] = time.perf_counter() - start
+            if args.bulk_load:
+                timings.update(finish_bulk_load(
+                    client, INDEX_NAME, previous_settings, max_segments=args.force_merge_segments
+                ))
+                print_phase_timings(timings)
+        if JOURNAL is not None:
+            close_journal()
+    
+    # Show final count
+    try:
+        count = client.count(index=INDEX_NAME)["count"]
+    except Exception:
+        count = "unknown"
+    print(f"\n[DONE] Total documents in '{INDEX_NAME}': {count}")
+    print_run_summary()
 
 
 def main():
-    global INDEX_NAME, USE_LLM_KEYWORDS
+    global INDEX_NAME, USE_LLM_KEYWORDS, EMBEDDING_CACHE, KEYWORD_CACHE
+    global LLM_KEYWORD_BATCH_SIZE, LLM_KEYWORD_CONCURRENCY
+    global USE_BULK, BULK_CHUNK_DOCS, BULK_CHUNK_BYTES, BULK_THREADS
+    global JSON_SERIALIZER, VECTOR_PRECISION, HTTP_COMPRESS_LEVEL
+    global ASYNC_PARSE_CONCURRENCY, ASYNC_INDEX_CONCURRENCY, REFRESH_AFTER_FILE
+    global SPLIT_PDF_PAGES, SPLIT_PDF_CONCURRENCY, PARTITION_MODE, PARTITION_PROCESSES
+    global EMBEDDING_MODEL, EMBEDDING_DIMENSION, EMBEDDING_DIMENSIONS, EMBEDDING_THREADS, EMBEDDER
+    global EMBEDDING_RPM, EMBEDDING_TPM, LLM_KEYWORD_RPM, LLM_KEYWORD_TPM, UNSTRUCTURED_RPM
+    global API_MAX_RETRIES, API_ENDPOINTS, WORKERS
+    global DEDUP_MODE, DEDUP_THRESHOLD, DEDUPLICATOR
     import argparse
     
     parser = argparse.ArgumentParser(description="Ingest documents to OpenSearch with Unstructured.io")
@@ -537,66 +2689,218 @@ def main():
     parser.add_argument("--dir", type=str, help="Directory to ingest")
     parser.add_argument("--index", type=str, default="hybrid_demo", help="Index name")
     parser.add_argument("--recreate", action="store_true", help="Recreate index")
+    parser.add_argument("--embedding-model", type=str, default=EMBEDDING_MODEL,
+                        help="OpenAI model, local:<sentence-transformers model> or hash:<dimension>")
+    parser.add_argument("--dimensions", type=int, default=EMBEDDING_DIMENSIONS, help="Shorten embeddings to this many dimensions (0 = model default)")
+    parser.add_argument("--vector-encoder", choices=list(FAISS_ENCODERS), default="flat", help="faiss encoder for stored vectors")
+    parser.add_argument("--pq-m", type=int, default=0, help="PQ sub-vectors per vector (default: dimension / 4)")
+    parser.add_argument("--pq-training-index", type=str, help="Index whose vectors train the PQ model (default: --index)")
+    parser.add_argument("--embedding-threads", type=int, default=EMBEDDING_THREADS, help="CPU threads for local embedding models (0 = all cores)")
     parser.add_argument("--llm-keywords", action="store_true", help="Use LLM for keyword extraction (costs API calls)")
+    parser.add_argument("--split-pdf", action="store_true", help="Partition large PDFs as concurrent page-range requests")
+    parser.add_argument("--split-pdf-pages", type=int, default=10, help="Pages per request with --split-pdf")
+    parser.add_argument("--split-pdf-concurrency", type=int, default=SPLIT_PDF_CONCURRENCY, help="Page-range requests in flight per PDF")
+    parser.add_argument("--partition", choices=["local", "api"], default=PARTITION_MODE, help="Partition .md/.txt/.html files locally or with the Unstructured API")
+    parser.add_argument("--partition-processes", type=int, default=PARTITION_PROCESSES, help="Processes for local partitioning (0 = in the ingesting process)")
+    parser.add_argument("--llm-keyword-batch-size", type=int, default=LLM_KEYWORD_BATCH_SIZE, help="Chunks per LLM keyword request")
+    parser.add_argument("--llm-keyword-concurrency", type=int, default=LLM_KEYWORD_CONCURRENCY, help="LLM keyword requests in flight")
+    parser.add_argument("--embedding-rpm", type=int, default=EMBEDDING_RPM, help="Embedding requests per minute (0 = no client-side limit)")
+    parser.add_argument("--embedding-tpm", type=int, default=EMBEDDING_TPM, help="Embedding tokens per minute (0 = no client-side limit)")
+    parser.add_argument("--llm-keyword-rpm", type=int, default=LLM_KEYWORD_RPM, help="LLM keyword requests per minute (0 = no client-side limit)")
+    parser.add_argument("--llm-keyword-tpm", type=int, default=LLM_KEYWORD_TPM, help="LLM keyword tokens per minute (0 = no client-side limit)")
+    parser.add_argument("--unstructured-rpm", type=int, default=UNSTRUCTURED_RPM, help="Unstructured API requests per minute (0 = no client-side limit)")
+    parser.add_argument("--max-retries", type=int, default=API_MAX_RETRIES, help="Retries per API request on 429/5xx/network errors")
+    parser.add_argument("--dedup", choices=["off", "skip", "link"], default=DEDUP_MODE, help="Skip duplicate chunks, or index them as links to the first copy without embedding them")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD, help="Estimated Jaccard similarity at which a chunk counts as a near duplicate")
+    parser.add_argument("--keyword-cache", type=str, default=KEYWORD_CACHE_PATH, help="LLM keyword cache file")
+    parser.add_argument("--no-keyword-cache", action="store_true", help="Always re-extract LLM keywords")
+    parser.add_argument("--embedding-cache", type=str, default=EMBEDDING_CACHE_PATH, help="Embedding cache file")
+    parser.add_argument("--embedding-cache-max-mb", type=int, default=EMBEDDING_CACHE_MAX_MB, help="Embedding cache size limit (MB)")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Always re-embed chunks")
+    parser.add_argument("--bulk", action="store_true", help="Index with the bulk API instead of one request per document")
+    parser.add_argument("--bulk-chunk-docs", type=int, default=BULK_CHUNK_DOCS, help="Max documents per bulk request")
+    parser.add_argument("--bulk-chunk-mb", type=int, default=BULK_CHUNK_BYTES // (1024 * 1024), help="Max MB per bulk request")
+    parser.add_argument("--bulk-threads", type=int, default=BULK_THREADS, help="Parallel bulk threads (1 = streaming)")
+    parser.add_argument("--serializer", choices=["orjson", "json"], default=JSON_SERIALIZER, help="JSON encoder for request bodies (orjson falls back to json if not installed)")
+    parser.add_argument("--vector-precision", type=int, default=VECTOR_PRECISION, help="Decimal places of vector components in request bodies (0 = exact float32; orjson only)")
+    parser.add_argument("--compress-level", type=int, choices=range(10), default=HTTP_COMPRESS_LEVEL, metavar="{0-9}", help="gzip level of request bodies (0 = uncompressed)")
+    parser.add_argument("--bulk-load", action="store_true", help="Tune the index for a large initial load (implies --bulk)")
+    parser.add_argument("--defer-knn-graphs", action="store_true", help="With --bulk-load, build k-NN graphs only at the final force-merge")
+    parser.add_argument("--force-merge-segments", type=int, default=1, help="Segment count to force-merge to after --bulk-load")
+    parser.add_argument("--rebuild", action="store_true", help="Build a new versioned index behind the alias and swap it in when done")
+    parser.add_argument("--reindex-existing", action="store_true", help="With --rebuild, copy the live documents via _reindex instead of re-ingesting files")
+    parser.add_argument("--keep-versions", type=int, default=1, help="Previous index versions to keep after --rebuild")
+    parser.add_argument("--incremental", action="store_true", help="With --dir, only ingest new or changed files")
+    parser.add_argument("--manifest", type=str, default=INGEST_MANIFEST_PATH, help="File fingerprint manifest for --incremental")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Processes that ingest files in parallel with --dir")
+    parser.add_argument("--journal", action="store_true",
+                        help="Record run progress (parse output, indexed chunks) so an interrupted run can be resumed")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last interrupted --journal run on the same index and inputs")
+    parser.add_argument("--journal-path", type=str, default=RUN_JOURNAL_PATH, help="Run progress journal file")
+    parser.add_argument("--metrics", type=str, default=METRICS_PATH, help="Write per-stage/per-request timings, bytes, retries and cache hits to this file")
+    parser.add_argument("--metrics-format", choices=["jsonl", "prometheus"], default="jsonl", help="Format of --metrics: JSON lines or a Prometheus textfile")
+    parser.add_argument("--profile", choices=["cpu", "memory"], help="Profile the run with cProfile (cpu) or tracemalloc (memory)")
+    parser.add_argument("--profile-output", type=str, help="Where --profile saves its result (default: .cache/ingest_profile.prof or .cache/ingest_memory.txt)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Overlap parsing, embedding and bulk indexing with asyncio")
+    parser.add_argument("--concurrency", type=int, default=16, help="Max embedding requests in flight with --async")
+    parser.add_argument("--parse-concurrency", type=int, default=ASYNC_PARSE_CONCURRENCY, help="Files parsed concurrently with --async")
+    parser.add_argument("--index-concurrency", type=int, default=ASYNC_INDEX_CONCURRENCY, help="Concurrent bulk indexers with --async")
     
     args = parser.parse_args()
     
+    PARTITION_MODE = args.partition
+    PARTITION_PROCESSES = max(0, args.partition_processes)
+    
     # Validate API keys
-    if UNSTRUCTURED_API_KEY == "YOUR_UNSTRUCTURED_API_KEY":
+    if UNSTRUCTURED_API_KEY == "YOUR_UNSTRUCTURED_API_KEY" and needs_unstructured_api(args):
         print("[ERROR] Please set UNSTRUCTURED_API_KEY environment variable")
         print("   export UNSTRUCTURED_API_KEY='your-key-here'")
         return
     
-    if not OPENAI_API_KEY:
+    EMBEDDING_RPM = args.embedding_rpm
+    EMBEDDING_TPM = args.embedding_tpm
+    LLM_KEYWORD_RPM = args.llm_keyword_rpm
+    LLM_KEYWORD_TPM = args.llm_keyword_tpm
+    UNSTRUCTURED_RPM = args.unstructured_rpm
+    API_MAX_RETRIES = args.max_retries
+    API_ENDPOINTS = create_api_endpoints()
+    
+    EMBEDDING_MODEL = args.embedding_model
+    EMBEDDING_DIMENSIONS = args.dimensions
+    EMBEDDING_THREADS = args.embedding_threads
+    if not OPENAI_API_KEY and (embedders.is_openai_model(EMBEDDING_MODEL) or args.llm_keywords):
         print("[ERROR] Please set OPENAI_API_KEY environment variable")
         print("   export OPENAI_API_KEY='your-key-here'")
         return
     
+    if args.resume and (args.recreate or args.rebuild):
+        print("[ERROR] --resume can't be combined with --recreate or --rebuild")
+        return
+    if args.journal and args.rebuild:
+        # A rebuild fills a new index version each time, so there is nothing to resume
+        print("[ERROR] --journal can't be combined with --rebuild")
+        return
+    
+    # Duplicates are only recognized against chunks of the same run, so a
+    # partial run could skip a chunk for good or link it to one that isn't indexed
+    if args.dedup != "off" and (args.incremental or args.resume):
+        print("[ERROR] --dedup can't be combined with --incremental or --resume")
+        return
+    
+    if args.split_pdf:
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            print("[ERROR] --split-pdf needs pypdf")
+            print("   pip install pypdf")
+            return
+    
+    # Load the embedding backend once; the index schema follows its dimension
+    try:
+        EMBEDDER = current_embedder()
+    except (ImportError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        return
+    EMBEDDING_DIMENSION = EMBEDDER.dimension
+    configure_vector_field(EMBEDDING_DIMENSION, args.vector_encoder)
+    
     INDEX_NAME = args.index
+    SPLIT_PDF_PAGES = args.split_pdf_pages if args.split_pdf else 0
+    SPLIT_PDF_CONCURRENCY = args.split_pdf_concurrency
     USE_LLM_KEYWORDS = args.llm_keywords
+    LLM_KEYWORD_BATCH_SIZE = args.llm_keyword_batch_size
+    LLM_KEYWORD_CONCURRENCY = args.llm_keyword_concurrency
+    USE_BULK = args.bulk or args.bulk_load or args.rebuild
+    REFRESH_AFTER_FILE = not (args.bulk_load or args.rebuild)
+    BULK_CHUNK_DOCS = args.bulk_chunk_docs
+    BULK_CHUNK_BYTES = args.bulk_chunk_mb * 1024 * 1024
+    BULK_THREADS = args.bulk_threads
+    JSON_SERIALIZER = args.serializer
+    VECTOR_PRECISION = max(0, args.vector_precision)
+    HTTP_COMPRESS_LEVEL = args.compress_level
+    if JSON_SERIALIZER == "orjson" and not isinstance(create_serializer(JSON_SERIALIZER), FastVectorSerializer):
+        print("[WARN] orjson or numpy is not installed, encoding request bodies with the json module")
+        print("   pip install orjson numpy")
+        JSON_SERIALIZER = "json"
+    ASYNC_PARSE_CONCURRENCY = args.parse_concurrency
+    ASYNC_INDEX_CONCURRENCY = args.index_concurrency
+    WORKERS = max(1, args.workers)
+    DEDUP_MODE = args.dedup
+    DEDUP_THRESHOLD = args.dedup_threshold
+    if DEDUP_MODE != "off":
+        DEDUPLICATOR = dedup.ChunkDeduplicator(DEDUP_THRESHOLD)
+    if not args.no_embedding_cache:
+        EMBEDDING_CACHE = EmbeddingCache(
+            args.embedding_cache,
+            model=EMBEDDING_MODEL,
+            dimension=EMBEDDING_DIMENSION,
+            max_bytes=args.embedding_cache_max_mb * 1024 * 1024,
+        )
+    if USE_LLM_KEYWORDS and not args.no_keyword_cache:
+        KEYWORD_CACHE = KeywordCache(args.keyword_cache, model=KEYWORD_MODEL)
     
     print("="*50)
     print("OpenSearch Hybrid Search Ingestion")
     print("="*50)
     print(f"Index: {INDEX_NAME}")
     print(f"Unstructured API: {UNSTRUCTURED_API_URL}")
-    print(f"Embedding Model: {EMBEDDING_MODEL}")
+    if PARTITION_MODE == "local":
+        print(f"Local Partitioning: {', '.join(sorted(local_partition.EXTENSIONS))} "
+              f"({PARTITION_PROCESSES or 'no'} extra processes)")
+    print(f"Embedding Model: {EMBEDDING_MODEL} ({EMBEDDING_DIMENSION} dimensions)")
+    print(f"Vector Encoder: {args.vector_encoder}")
+    if SPLIT_PDF_PAGES:
+        print(f"PDF Splitting: {SPLIT_PDF_PAGES} pages/request, {SPLIT_PDF_CONCURRENCY} in flight")
     print(f"Keyword Extraction: {'LLM (OpenAI)' if USE_LLM_KEYWORDS else 'Heuristic (fast/free)'}")
+    print(f"Embedding Cache: {args.embedding_cache if EMBEDDING_CACHE else 'disabled'}")
+    if USE_LLM_KEYWORDS:
+        print(f"LLM Keywords: {LLM_KEYWORD_BATCH_SIZE} chunks/request, {LLM_KEYWORD_CONCURRENCY} in flight, "
+              f"cache {args.keyword_cache if KEYWORD_CACHE else 'disabled'}")
+    if args.use_async:
+        print(f"Async Pipeline: {ASYNC_PARSE_CONCURRENCY} parsers, {args.concurrency} embedding requests, "
+              f"{ASYNC_INDEX_CONCURRENCY} bulk indexers")
+    if WORKERS > 1:
+        print(f"Worker Processes: {WORKERS} (shared API limits)")
+    if DEDUP_MODE != "off":
+        print(f"Chunk Dedup: {DEDUP_MODE} (exact + near duplicates at {DEDUP_THRESHOLD} similarity)")
+    limits = [f"{name} {value}/min" for name, value in [
+        ("embedding requests", EMBEDDING_RPM), ("embedding tokens", EMBEDDING_TPM),
+        ("keyword requests", LLM_KEYWORD_RPM), ("keyword tokens", LLM_KEYWORD_TPM),
+        ("Unstructured requests", UNSTRUCTURED_RPM),
+    ] if value]
+    print(f"API Limits: {', '.join(limits) or 'none (adaptive)'}, {API_MAX_RETRIES} retries")
+    if args.metrics:
+        print(f"Metrics: {args.metrics} ({args.metrics_format})")
+    if args.profile:
+        print(f"Profiling: {args.profile}")
+    if USE_BULK or args.use_async:
+        print(f"Bulk Indexing: {BULK_CHUNK_DOCS} docs / {args.bulk_chunk_mb} MB per request, "
+              f"{BULK_THREADS} thread(s)")
+    precision = f"{VECTOR_PRECISION} decimals" if VECTOR_PRECISION and JSON_SERIALIZER == "orjson" else "exact"
+    print(f"Request Bodies: {JSON_SERIALIZER}, {precision} vectors, gzip {HTTP_COMPRESS_LEVEL or 'off'}")
     print()
     
-    # Connect to OpenSearch
-    client = create_opensearch_client()
-    
-    try:
-        info = client.info()
-        print(f"[OK] Connected to OpenSearch {info['version']['number']}")
-    except Exception as e:
-        print(f"[ERROR] Failed to connect to OpenSearch: {e}")
-        return
-    
-    # Create index
-    create_index(client, INDEX_NAME, recreate=args.recreate)
-    
-    # Ingest
-    if args.file:
-        ingest_file(client, args.file)
-    elif args.dir:
-        ingest_directory(client, args.dir)
-    else:
-        # Default: ingest demo docs
-        demo_dir = Path(__file__).parent.parent / "data" / "demo_docs"
-        if demo_dir.exists():
-            ingest_directory(client, str(demo_dir))
-        else:
-            print("[ERROR] No input specified. Use --file or --dir")
-            print(f"   Or create demo docs: python scripts/download_demo_pdfs.py")
-    
-    # Show final count
+    profiler = None
+    if args.profile:
+        default_output = "ingest_profile.prof" if args.profile == "cpu" else "ingest_memory.txt"
+        profiler = metrics.Profiler(
+            args.profile, args.profile_output or str(Path(__file__).parent.parent / ".cache" / default_output)
+        )
+        profiler.start()
+    start = time.perf_counter()
     try:
-        count = client.count(index=INDEX_NAME)["count"]
-    except Exception:
-        count = "unknown"
-    print(f"\n[DONE] Total documents in '{INDEX_NAME}': {count}")
+        connect_and_ingest(args)
+    finally:
+        close_partition_pool()
+        close_keyword_http_client()
+        if EMBEDDER is not None:
+            EMBEDDER.close()
+        if profiler is not None:
+            print(f"\n[INFO] {args.profile.upper()} profile of the run (this process only):")
+            print(profiler.stop())
+        if args.metrics:
+            export_metrics(args.metrics, args.metrics_format, time.perf_counter() - start)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+"""
+Heuristic keyword extraction for hybrid search boosting.
+
+Patterns are compiled once at import time and the stopword lists are
+frozensets. Each chunk is scanned once per pattern (acronyms are picked out
+of the capitalized-phrase matches rather than by a separate scan) and all
+candidates are ranked in a single pass, deterministically: most frequent
+first, ties broken by where the term first appears.
+
+Heuristics (same as the original extractor, except that capitalized phrases
+stop at line breaks and have runs of spaces or tabs collapsed to one space):
+1. Capitalized words/phrases (proper nouns, technical terms), lowercased
+2. Acronyms (2-5 uppercase letters), kept uppercase
+3. Numbers with units ("28.4 BLEU", "41.8 %", "3.5 days")
+4. Hyphenated terms ("multi-head", "self-attention")
+5. camelCase identifiers ("openSearch", "getEmbedding")
+"""
+import re
+import string
+
+MAX_KEYWORDS = 15
+
+# Patterns avoid a leading \b (and whole-pattern IGNORECASE) so the regex engine
+# can skip ahead to a possible first character instead of trying every offset.
+# "[A-Z](?<!\w.)" is "\b[A-Z]" with the boundary checked after the first char.
+
+# Capitalized word or run of capitalized words on one line: BLEU, GPT, Transformer, Open Search
+CAPS_PHRASE_RE = re.compile(r"[A-Z](?<!\w.)[A-Za-z]*(?:[^\S\r\n]+[A-Z][A-Za-z]*)*\b")
+NUMBER_UNIT_RE = re.compile(
+    r"(\d+\.?\d*)\s*(%|(?i:BLEU|days?|hours?|layers?|heads?|dimensions?|parameters?))"
+)
+# Hyphenated and camelCase terms are found from their rare middle character
+# ("-", or a lower->upper transition); the leading word part is recovered by
+# walking back from the match.
+HYPHEN_TAIL_RE = re.compile(r"-(?<=[a-zA-Z]-)[a-zA-Z]+(?:-[a-zA-Z]+)*\b")
+CAMEL_TAIL_RE = re.compile(r"[a-z][A-Z][a-zA-Z]*\b")
+
+STOPWORDS = frozenset({
+    "the", "a", "an", "in", "on", "at", "to", "for", "of", "and", "or", "is", "are", "was",
+    "were", "be", "been", "being", "have", "has", "had", "do", "does", "did", "will", "would",
+    "could", "should", "may", "might", "must", "shall", "can", "need", "dare", "ought", "used",
+    "this", "that", "these", "those", "we", "our", "they", "their", "it", "its", "he", "she",
+    "his", "her", "i", "you", "your", "my", "me", "us", "them", "who", "what", "which", "when",
+    "where", "why", "how", "all", "each", "every", "both", "few", "more", "most", "other",
+    "some", "such", "no", "nor", "not", "only", "own", "same", "so", "than", "too", "very",
+    "just", "but", "if", "because", "as", "until", "while", "although", "though", "after",
+    "before", "since", "unless", "however", "therefore", "thus", "hence", "also", "still",
+    "yet", "even", "here", "there", "then", "now", "abstract", "introduction", "conclusion",
+    "references", "figure", "table",
+})
+
+ASCII_LOWERCASE = frozenset(string.ascii_lowercase)
+ASCII_LETTERS = frozenset(string.ascii_letters)
+
+ROMAN_NUMERALS = frozenset({"II", "III", "IV", "VI", "VII", "VIII", "IX", "XI", "XII"})
+
+
+def word_start(text: str, end: int, letters: frozenset) -> "int | None":
+    """Walk back from `end` over `letters`; None if that run doesn't begin at a word boundary."""
+    start = end
+    while start > 0 and text[start - 1] in letters:
+        start -= 1
+    if start > 0 and (text[start - 1].isalnum() or text[start - 1] == "_"):
+        return None
+    return start
+
+
+def extract_keywords(text: str, limit: int = MAX_KEYWORDS) -> list[str]:
+    """Extract up to `limit` keywords from text, ranked by frequency then position."""
+    # (position, keyword) for every occurrence of every candidate
+    found = []
+    append = found.append
+
+    for match in CAPS_PHRASE_RE.finditer(text):
+        phrase = match.group()
+        if len(phrase) < 2:
+            continue
+        position = match.start()
+        words = phrase.split()
+        if len(words) > 1:
+            # Collapse repeated spaces and tabs so "Open  Search" == "Open Search"
+            phrase = " ".join(words)
+        lowered = phrase.lower()
+        if lowered not in STOPWORDS:
+            append((position, lowered))
+        for word in words:
+            # Words only contain ASCII letters here, so isupper() means [A-Z]+
+            if 1 < len(word) <= 5 and word.isupper() and word not in ROMAN_NUMERALS:
+                append((position, word))
+
+    for match in NUMBER_UNIT_RE.finditer(text):
+        append((match.start(), f"{match.group(1)} {match.group(2)}"))
+
+    if "-" in text:
+        for match in HYPHEN_TAIL_RE.finditer(text):
+            start = word_start(text, match.start(), ASCII_LETTERS)
+            if start is None:
+                # The head is glued to a digit/underscore; the term then starts
+                # at the next word of the chain, if the chain has another hyphen
+                start = match.start() + 1
+                if "-" not in match.group()[1:]:
+                    continue
+            if match.end() - start >= 5:
+                append((start, text[start:match.end()].lower()))
+
+    for match in CAMEL_TAIL_RE.finditer(text):
+        start = word_start(text, match.start(), ASCII_LOWERCASE)
+        if start is not None:
+            append((start, text[start:match.end()]))
+
+    # Count in position order: dict order is then first-occurrence order, and
+    # the stable sort by count keeps it as the tie-breaker
+    found.sort()
+    counts = {}
+    for _, keyword in found:
+        counts[keyword] = counts.get(keyword, 0) + 1
+    ranked = sorted(counts, key=counts.__getitem__, reverse=True)
+    return ranked[:limit]
+
+
+def extract_keywords_batch(texts: list[str], limit: int = MAX_KEYWORDS) -> list[list[str]]:
+    """Extract keywords for a list of chunks in one call."""
+    return [extract_keywords(text, limit) for text in texts]
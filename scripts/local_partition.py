@@ -0,0 +1,305 @@
+"""
+Local partitioning of text formats (.md, .txt, .html) for the ingestion script.
+
+Plain text, Markdown and HTML need no layout model, so sending them to the
+Unstructured API (strategy hi_res) only adds an upload and a queue wait. This
+module splits them into elements with the standard library, in the shape the
+API returns:
+- Title for headings (Markdown #/underlined, HTML h1-h6, short unpunctuated
+  lines of plain text)
+- ListItem, Table (with metadata.text_as_html), CodeSnippet and NarrativeText
+- metadata.filename and metadata.filetype on every element
+
+and chunks them with chunking.chunk_by_title, as the API does for
+chunking_strategy=by_title. partition_file only takes and returns picklable
+values, so files can be partitioned in a process pool.
+"""
+import hashlib
+import html
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Optional
+
+import chunking
+
+FILETYPES = {
+    ".md": "text/markdown",
+    ".txt": "text/plain",
+    ".html": "text/html",
+}
+EXTENSIONS = set(FILETYPES)
+
+ATX_HEADING_RE = re.compile(r"^ {0,3}#{1,6}(?:\s+(.*?))?\s*#*\s*$")
+SETEXT_UNDERLINE_RE = re.compile(r"^ {0,3}(=+|-+)\s*$")
+LIST_ITEM_RE = re.compile(r"^\s*(?:[-*+]|\d{1,9}[.)])\s+(.*)$")
+RULE_RE = re.compile(r"^ {0,3}([-*_])(\s*\1){2,}\s*$")
+FENCE_RE = re.compile(r"^ {0,3}(```|~~~)")
+TABLE_DIVIDER_RE = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+
+# Inline Markdown that the API drops when it renders the document
+IMAGE_RE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+LINK_RE = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+EMPHASIS_RE = re.compile(r"(\*\*|__|\*|_|~~|`)(?=\S)(.+?)(?<=\S)\1")
+
+# Block-level HTML elements: each one ends the text of the previous element
+HTML_BLOCKS = {
+    "address", "article", "aside", "blockquote", "body", "dd", "div", "dl", "dt", "fieldset", "figcaption",
+    "figure", "footer", "form", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "ul",
+    "h1", "h2", "h3", "h4", "h5", "h6", "table", "br",
+}
+HTML_SKIPPED = {"script", "style", "head", "noscript", "template", "svg"}
+HTML_HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def element(element_type: str, text: str, metadata: dict, index: int) -> dict:
+    """An element dict like the API's, with a deterministic id."""
+    key = f"{metadata.get('filename', '')}\0{index}\0{text}"
+    return {
+        "type": element_type,
+        "element_id": hashlib.sha256(key.encode()).hexdigest()[:32],
+        "text": text,
+        "metadata": dict(metadata),
+    }
+
+
+def strip_inline_markdown(text: str) -> str:
+    text = IMAGE_RE.sub(r"\1", text)
+    text = LINK_RE.sub(r"\1", text)
+    # Nested emphasis (e.g. ***bold italic***) needs more than one pass
+    for _ in range(3):
+        stripped = EMPHASIS_RE.sub(r"\2", text)
+        if stripped == text:
+            break
+        text = stripped
+    return html.unescape(text)
+
+
+def is_possible_title(text: str, max_words: int = 12) -> bool:
+    """Short single-line text without sentence punctuation, like Unstructured's title heuristic."""
+    if "\n" in text or not any(c.isalpha() for c in text):
+        return False
+    if len(text.split()) > max_words:
+        return False
+    return text[-1] not in ".,;:!?"
+
+
+def table_element_text(rows: list[list[str]]) -> tuple[str, str]:
+    """(text, text_as_html) of a table given as rows of cells."""
+    text = "\n".join(" ".join(cell for cell in row if cell) for row in rows)
+    html_rows = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in row) + "</tr>" for row in rows
+    )
+    return text, f"<table>{html_rows}</table>"
+
+
+def markdown_table_rows(lines: list[str]) -> list[list[str]]:
+    rows = []
+    for line in lines:
+        if TABLE_DIVIDER_RE.match(line):
+            continue
+        cells = line.strip().strip("|").split("|")
+        rows.append([strip_inline_markdown(cell.strip()) for cell in cells])
+    return rows
+
+
+def partition_markdown(text: str, metadata: dict) -> list[dict]:
+    """Markdown to elements: headings, list items, tables, code blocks and paragraphs."""
+    elements = []
+    paragraph: list[str] = []
+
+    def add(element_type: str, content: str, extra: Optional[dict] = None):
+        content = content.strip()
+        if content:
+            elements.append(element(element_type, content, dict(metadata, **(extra or {})), len(elements)))
+
+    def flush_paragraph():
+        if paragraph:
+            add("NarrativeText", strip_inline_markdown(" ".join(line.strip() for line in paragraph)))
+            paragraph.clear()
+
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if FENCE_RE.match(line):
+            flush_paragraph()
+            fence = FENCE_RE.match(line).group(1)
+            code = []
+            i += 1
+            while i < len(lines) and not lines[i].lstrip().startswith(fence):
+                code.append(lines[i])
+                i += 1
+            add("CodeSnippet", "\n".join(code))
+        elif not line.strip():
+            flush_paragraph()
+        elif ATX_HEADING_RE.match(line):
+            flush_paragraph()
+            add("Title", strip_inline_markdown(ATX_HEADING_RE.match(line).group(1) or ""))
+        elif paragraph and len(paragraph) == 1 and SETEXT_UNDERLINE_RE.match(line):
+            add("Title", strip_inline_markdown(paragraph.pop().strip()))
+        elif RULE_RE.match(line):
+            flush_paragraph()
+        elif line.lstrip().startswith("|"):
+            flush_paragraph()
+            table_lines = []
+            while i < len(lines) and lines[i].lstrip().startswith("|"):
+                table_lines.append(lines[i])
+                i += 1
+            table_text, table_html = table_element_text(markdown_table_rows(table_lines))
+            add("Table", table_text, {"text_as_html": table_html})
+            continue
+        elif LIST_ITEM_RE.match(line):
+            flush_paragraph()
+            item = [LIST_ITEM_RE.match(line).group(1)]
+            # Indented lines continue the item
+            while (i + 1 < len(lines) and lines[i + 1].startswith((" ", "\t")) and lines[i + 1].strip()
+                   and not LIST_ITEM_RE.match(lines[i + 1])):
+                i += 1
+                item.append(lines[i].strip())
+            add("ListItem", strip_inline_markdown(" ".join(item)))
+        elif line.lstrip().startswith(">"):
+            paragraph.append(line.lstrip()[1:])
+        else:
+            paragraph.append(line)
+        i += 1
+    flush_paragraph()
+    return elements
+
+
+def partition_text(text: str, metadata: dict) -> list[dict]:
+    """Plain text to elements: one per blank-line separated paragraph."""
+    elements = []
+    for block in re.split(r"\n\s*\n", text):
+        lines = [line.strip() for line in block.splitlines() if line.strip()]
+        if not lines:
+            continue
+        if all(LIST_ITEM_RE.match(line) for line in lines):
+            for line in lines:
+                elements.append(element("ListItem", LIST_ITEM_RE.match(line).group(1), metadata, len(elements)))
+            continue
+        content = " ".join(lines)
+        element_type = "Title" if len(lines) == 1 and is_possible_title(content) else "NarrativeText"
+        elements.append(element(element_type, content, metadata, len(elements)))
+    return elements
+
+
+class HTMLElementParser(HTMLParser):
+    """Collects the text of block-level HTML elements in document order."""
+
+    def __init__(self, metadata: dict):
+        super().__init__(convert_charrefs=True)
+        self.metadata = metadata
+        self.elements: list[dict] = []
+        self._text: list[str] = []
+        self._block = "p"
+        self._skip_depth = 0
+        self._pre_depth = 0
+        self._table: Optional[list[list[str]]] = None
+        self._table_depth = 0
+        self._cell: Optional[list[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HTML_SKIPPED:
+            self._skip_depth += 1
+        elif self._skip_depth:
+            return
+        elif tag == "table":
+            self._table_depth += 1
+            if self._table_depth == 1:
+                self.flush()
+                self._table = []
+        elif self._table is not None:
+            if tag == "tr":
+                self._table.append([])
+            elif tag in ("td", "th"):
+                self._cell = []
+        elif tag in HTML_BLOCKS:
+            self.flush()
+            if tag == "pre":
+                self._pre_depth += 1
+            self._block = tag
+
+    def handle_endtag(self, tag):
+        if tag in HTML_SKIPPED:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif self._skip_depth:
+            return
+        elif tag == "table" and self._table_depth:
+            self._table_depth -= 1
+            if not self._table_depth:
+                rows = [row for row in self._table if any(row)]
+                if rows:
+                    table_text, table_html = table_element_text(rows)
+                    self.add("Table", table_text, {"text_as_html": table_html})
+                self._table = None
+        elif self._table is not None:
+            if tag in ("td", "th") and self._cell is not None:
+                if not self._table:
+                    self._table.append([])
+                self._table[-1].append(" ".join("".join(self._cell).split()))
+                self._cell = None
+        elif tag in HTML_BLOCKS:
+            self.flush()
+            if tag == "pre":
+                self._pre_depth = max(0, self._pre_depth - 1)
+            self._block = "p"
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._table is not None:
+            if self._cell is not None:
+                self._cell.append(data)
+            return
+        self._text.append(data)
+
+    def add(self, element_type: str, text: str, extra: Optional[dict] = None):
+        self.elements.append(element(element_type, text, dict(self.metadata, **(extra or {})), len(self.elements)))
+
+    def flush(self):
+        raw = "".join(self._text)
+        self._text = []
+        if self._pre_depth:
+            text = raw.strip("\n")
+            if text.strip():
+                self.add("CodeSnippet", text)
+            return
+        text = " ".join(raw.split())
+        if not text:
+            return
+        if self._block in HTML_HEADINGS:
+            self.add("Title", text)
+        elif self._block == "li":
+            self.add("ListItem", text)
+        elif self._block in ("div", "body", "section", "article", "main") and is_possible_title(text):
+            # Loose text in a container, like a heading styled with CSS
+            self.add("Title", text)
+        else:
+            self.add("NarrativeText", text)
+
+
+def partition_html(text: str, metadata: dict) -> list[dict]:
+    """HTML to elements: headings, list items, tables, preformatted blocks and paragraphs."""
+    parser = HTMLElementParser(metadata)
+    parser.feed(text)
+    parser.close()
+    parser.flush()
+    return parser.elements
+
+
+PARTITIONERS = {
+    ".md": partition_markdown,
+    ".txt": partition_text,
+    ".html": partition_html,
+}
+
+
+def partition_file(file_path: str, max_characters: int = 1000, overlap: int = 200) -> list[dict]:
+    """Partition a text file locally and chunk it by title, like the API's by_title output."""
+    path = Path(file_path)
+    suffix = path.suffix.lower()
+    text = path.read_text(encoding="utf-8", errors="replace")
+    metadata = {"filename": path.name, "filetype": FILETYPES[suffix]}
+    elements = PARTITIONERS[suffix](text, metadata)
+    return chunking.chunk_by_title(elements, max_characters=max_characters, overlap=overlap)
@@ -0,0 +1,340 @@
+"""
+Run metrics and profiling for the ingestion script.
+
+Metrics is a small, thread-safe registry:
+- histograms of durations (per-stage and per-request seconds), with fixed
+  Prometheus-style buckets so snapshots from --workers processes add up
+- counters and gauges (bytes sent/received, retries, cache hits, run totals)
+
+A run's metrics are written either as JSON lines (one object per series, with
+p50/p99 estimated from the buckets) or in the Prometheus text format, ready for
+node_exporter's textfile collector. Profiler wraps cProfile (CPU) and
+tracemalloc (memory) for --profile.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+# Upper bounds (seconds) of the duration histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+PREFIX = "ingest_"
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation within its bucket (like histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def format_value(value: float) -> str:
+    """A sample value without exponent notation or lost precision."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def series_key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+
+
+def format_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = list(labels) + list(extra or ())
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """Histograms, counters and gauges keyed by name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: dict[tuple, Histogram] = {}
+        self.counters: dict[tuple, float] = {}
+        self.gauges: dict[tuple, float] = {}
+
+    def observe(self, name: str, value: float, **labels):
+        key = series_key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def add(self, name: str, value: float = 1, **labels):
+        key = series_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[series_key(name, labels)] = value
+
+    @contextmanager
+    def timer(self, stage: str):
+        """Time a block as one observation of stage_seconds{stage=...}."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage)
+
+    def timed_iter(self, stage: str, iterable: Iterable) -> Iterator:
+        """Pass items through, observing the time spent producing them (not consuming them) once at the end."""
+        iterator = iter(iterable)
+        spent = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    spent += time.perf_counter() - start
+                    return
+                spent += time.perf_counter() - start
+                yield item
+        finally:
+            self.observe("stage_seconds", spent, stage=stage)
+
+    def stage_totals(self) -> dict[str, float]:
+        """Total seconds per stage."""
+        with self._lock:
+            return {dict(labels)["stage"]: histogram.sum for (name, labels), histogram in self.histograms.items()
+                    if name == "stage_seconds"}
+
+    # Snapshots, so --workers processes can report to the main process
+
+    def take(self) -> dict:
+        """A picklable snapshot of histograms and counters, which are reset (gauges are kept)."""
+        with self._lock:
+            snapshot = {
+                "histograms": {key: (histogram.counts, histogram.sum, histogram.count)
+                               for key, histogram in self.histograms.items()},
+                "counters": dict(self.counters),
+            }
+            self.histograms = {}
+            self.counters = {}
+        return snapshot
+
+    def merge(self, snapshot: dict):
+        """Add a snapshot from take() to these metrics."""
+        with self._lock:
+            for key, (counts, total, count) in snapshot["histograms"].items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+            for key, value in snapshot["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    # Export
+
+    def records(self) -> list[dict]:
+        """One dict per series (the JSON-lines format)."""
+        records = []
+        with self._lock:
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                records.append({
+                    "metric": PREFIX + name,
+                    "type": "histogram",
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "p50": round(histogram.quantile(0.5), 6),
+                    "p99": round(histogram.quantile(0.99), 6),
+                    "buckets": dict(zip([str(b) for b in histogram.buckets] + ["+Inf"], histogram.counts)),
+                })
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for (name, labels), value in sorted(series.items()):
+                    records.append({"metric": PREFIX + name, "type": kind, "labels": dict(labels), "value": value})
+        return records
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        typed = set()
+
+        def declare(name: str, kind: str):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = PREFIX + name
+                declare(metric, "histogram")
+                cumulative = 0
+                for bound, count in zip([str(b) for b in histogram.buckets] + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{format_labels(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{metric}_sum{format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{format_labels(labels)} {histogram.count}")
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = PREFIX + name + ("" if name.endswith("_total") else "_total")
+                declare(metric, "counter")
+                lines.append(f"{metric}{format_labels(labels)} {format_value(value)}")
+            for (name, labels), value in sorted(self.gauges.items()):
+                metric = PREFIX + name
+                declare(metric, "gauge")
+                lines.append(f"{metric}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, fmt: str = "jsonl"):
+        """Write the metrics as JSON lines or a Prometheus textfile (replaced atomically)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == "prometheus":
+            content = self.prometheus()
+        else:
+            content = "".join(json.dumps(record) + "\n" for record in self.records())
+        # The textfile collector may read at any moment, so never expose a half-written file
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        tmp.write_text(content)
+        os.replace(tmp, path)
+
+
+def metered_connection_class(base: type, metrics: Metrics, stage_of=None) -> type:
+    """Subclass of an opensearch-py connection class that records every request in metrics.
+
+    Records request_seconds, bytes sent (the body before compression) and bytes
+    received under service="OpenSearch". `stage_of(url)` may name a stage to
+    also observe the request under (e.g. "index" for bulk requests).
+    """
+    def record(method: str, url: str, body, data, seconds: float, status: str):
+        metrics.observe("request_seconds", seconds, service="OpenSearch", status=status)
+        if body is not None:
+            metrics.add("request_bytes_sent", len(body), service="OpenSearch")
+        if data is not None:
+            metrics.add("request_bytes_received", len(data), service="OpenSearch")
+        stage = stage_of(url) if stage_of else None
+        if stage:
+            metrics.observe("stage_seconds", seconds, stage=stage)
+
+    if asyncio.iscoroutinefunction(base.perform_request):
+        class MeteredConnection(base):
+            async def perform_request(self, method, url, params=None, body=None, timeout=None, ignore=(), headers=None):
+                start = time.perf_counter()
+                data = None
+                status = "error"
+                try:
+                    status_code, response_headers, data = await super().perform_request(
+                        method, url, params, body, timeout=timeout, ignore=ignore, headers=headers
+                    )
+                    status = str(status_code)
+                    return status_code, response_headers, data
+                except Exception as e:
+                    # TransportError carries the HTTP status (e.g. 404 for a missing index)
+                    status = str(getattr(e, "status_code", "error"))
+                    raise
+                finally:
+                    record(method, url, body, data, time.perf_counter() - start, status)
+    else:
+        class MeteredConnection(base):
+            def perform_request(self, method, url, params=None, body=None, timeout=None, ignore=(), headers=None):
+                start = time.perf_counter()
+                data = None
+                status = "error"
+                try:
+                    status_code, response_headers, data = super().perform_request(
+                        method, url, params, body, timeout=timeout, ignore=ignore, headers=headers
+                    )
+                    status = str(status_code)
+                    return status_code, response_headers, data
+                except Exception as e:
+                    status = str(getattr(e, "status_code", "error"))
+                    raise
+                finally:
+                    record(method, url, body, data, time.perf_counter() - start, status)
+
+    MeteredConnection.__name__ = f"Metered{base.__name__}"
+    return MeteredConnection
+
+
+class Profiler:
+    """cProfile ("cpu") or tracemalloc ("memory") over a block of the run."""
+
+    def __init__(self, kind: str, output: str, top: int = 30):
+        self.kind = kind
+        self.output = Path(output)
+        self.top = top
+        self._profile = None
+
+    def start(self):
+        if self.kind == "cpu":
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            import tracemalloc
+
+            tracemalloc.start(25)
+
+    def stop(self) -> str:
+        """Stop profiling, save the result to output and return a short text report."""
+        import io
+
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        report = io.StringIO()
+        if self.kind == "cpu":
+            import pstats
+
+            self._profile.disable()
+            self._profile.dump_stats(str(self.output))
+            pstats.Stats(self._profile, stream=report).sort_stats("cumulative").print_stats(self.top)
+            report.write(f"\nFull profile: {self.output} (open with snakeviz or python -m pstats)\n")
+        else:
+            import tracemalloc
+
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ])
+            report.write(f"Traced memory: {current / 2**20:.1f} MB now, {peak / 2**20:.1f} MB peak\n")
+            report.write(f"Top {self.top} allocation sites still held at the end of the run:\n")
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                frame = stat.traceback[0]
+                report.write(f"  {stat.size / 2**20:8.2f} MB {stat.count:9d} blocks  {frame.filename}:{frame.lineno}\n")
+            report.write("\n")
+            self.output.write_text(report.getvalue())
+            report.write(f"Report: {self.output}\n")
+        return report.getvalue()
@@ -0,0 +1,87 @@
+"""
+Page-range splitting for large PDFs sent to the Unstructured API.
+
+A large PDF is cut into page ranges that are partitioned concurrently (each
+request passes starting_page_number so page numbers stay absolute), then the
+returned elements are stitched back together in page order:
+- element ids that collide across ranges are renamed, and parent_id references
+  inside the range follow the rename
+- elements at the top of a range that sit under a Title from an earlier range
+  get that Title as parent_id, as they would in a single request
+
+Chunking has to happen after stitching (see chunking.py) so that sections and
+chunk overlap are not cut at range boundaries.
+
+Needs pypdf (`pip install pypdf`), imported only when a PDF is split.
+"""
+import hashlib
+import io
+from pathlib import Path
+from typing import Optional
+
+
+def split_pdf(file_path: str, pages_per_split: int) -> Optional[list[tuple[int, bytes]]]:
+    """Cut a PDF into (first page number, PDF bytes) ranges of pages_per_split pages.
+
+    Returns None if the file isn't a PDF or is no longer than one range.
+    """
+    if Path(file_path).suffix.lower() != ".pdf" or pages_per_split <= 0:
+        return None
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+    if page_count <= pages_per_split:
+        return None
+
+    ranges = []
+    for start in range(0, page_count, pages_per_split):
+        writer = PdfWriter()
+        for page in reader.pages[start:start + pages_per_split]:
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        ranges.append((start + 1, buffer.getvalue()))
+    return ranges
+
+
+def stitch_elements(parts: list[tuple[int, list[dict]]]) -> list[dict]:
+    """Join per-range element lists, given as (first page number, elements), into one document."""
+    stitched = []
+    seen_ids = set()
+    last_title_id = None
+
+    for first_page, elements in sorted(parts, key=lambda part: part[0]):
+        # Older API versions ignore starting_page_number and count from 1
+        pages = [(e.get("metadata") or {}).get("page_number") for e in elements]
+        pages = [page for page in pages if page]
+        offset = first_page - 1 if pages and min(pages) < first_page else 0
+
+        renamed = {}
+        title_in_range = False
+        for element in elements:
+            element = dict(element)
+            metadata = dict(element.get("metadata") or {})
+            element["metadata"] = metadata
+            if offset and metadata.get("page_number"):
+                metadata["page_number"] += offset
+
+            element_id = element.get("element_id")
+            if element_id in seen_ids:
+                new_id = hashlib.sha256(f"{element_id}\0{len(stitched)}".encode()).hexdigest()[:32]
+                renamed[element_id] = new_id
+                element["element_id"] = element_id = new_id
+
+            parent_id = metadata.get("parent_id")
+            if parent_id in renamed:
+                metadata["parent_id"] = renamed[parent_id]
+            elif parent_id is None and not title_in_range and last_title_id and element.get("type") != "Title":
+                metadata["parent_id"] = last_title_id
+
+            if element.get("type") == "Title":
+                title_in_range = True
+                last_title_id = element_id
+            if element_id:
+                seen_ids.add(element_id)
+            stitched.append(element)
+    return stitched
@@ -0,0 +1,267 @@
+"""
+In-process query cache for hybrid search.
+
+A support bot sees the same questions over and over, often in slightly
+different words, and each one costs a query embedding plus a hybrid BM25 +
+k-NN search. QueryCache answers repeats from memory in two tiers:
+- exact: the normalized query text (Unicode form, case, whitespace and
+  trailing punctuation folded), checked before anything is embedded
+- semantic: the query embedding, matched against the cached queries'
+  embeddings at a cosine similarity of at least the threshold. Candidates come
+  from random-hyperplane LSH (SimHash bits, banded like dedup.py's MinHash) and
+  are confirmed with the exact cosine.
+
+Results are only shared between queries with the same search parameters.
+Entries beyond max_entries are evicted least recently used, and entries
+expire ttl_seconds after their search ran. The cache also tracks the write
+generation of the index (see bump_ingest_generation in
+ingest_unstructured_opensearch.py) and empties itself when it moves.
+
+CachedHybridSearcher puts a QueryCache in front of HybridSearcher and polls
+the generation at most once per generation_check_seconds, so results are at
+most that stale after ingestion makes new documents searchable. Responses are
+shared between hits; treat them as read-only.
+
+Needs numpy.
+"""
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import numpy as np
+
+import ingest_unstructured_opensearch as ingest
+from hybrid_search import PIPELINE_NAME, HybridSearcher
+
+SPACE_RE = re.compile(r"\s+")
+TRAILING_PUNCTUATION = " ?!.,;:"
+
+
+def normalize_query(text: str) -> str:
+    """Query text as the exact tier keys it: NFKC, case-folded, single spaces, no trailing punctuation."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return SPACE_RE.sub(" ", text).strip(TRAILING_PUNCTUATION)
+
+
+def hyperplane_collision_probability(cosine: float) -> float:
+    """Probability that a random hyperplane puts two vectors with this cosine on the same side."""
+    return 1 - math.acos(max(-1.0, min(1.0, cosine))) / math.pi
+
+
+def lsh_bands(threshold: float, num_bits: int, recall: float = 0.95) -> tuple[int, int]:
+    """(bands, rows) with the most rows per band that still find `recall` of the queries at the threshold.
+
+    A missed match costs a search, while a false candidate only costs one dot
+    product, so recall is fixed and the bands are made as selective as it allows.
+    """
+    p = hyperplane_collision_probability(threshold)
+    for rows in range(num_bits, 0, -1):
+        bands = num_bits // rows
+        if 1 - (1 - p ** rows) ** bands >= recall:
+            return bands, rows
+    return num_bits, 1
+
+
+class CacheEntry:
+    __slots__ = ("key", "response", "created", "slot", "band_keys")
+
+    def __init__(self, key: tuple, response: dict, created: float, slot: Optional[int], band_keys: list[bytes]):
+        self.key = key
+        self.response = response
+        self.created = created
+        self.slot = slot
+        self.band_keys = band_keys
+
+
+class QueryCache:
+    """Exact-text and embedding-similarity cache of search responses, with LRU/TTL eviction."""
+
+    def __init__(self, dimension: int, max_entries: int = 1024, ttl_seconds: float = 600.0,
+                 threshold: float = 0.95, num_bits: int = 128, seed: int = 1):
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.bands, self.rows = lsh_bands(threshold, num_bits)
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((self.bands * self.rows, dimension)).astype(np.float32)
+        # Unit query vectors, one row per slot
+        self._vectors = np.zeros((max_entries, dimension), dtype=np.float32)
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        # (params, normalized text) -> entry, least recently used first
+        self._entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        self._buckets: list[dict[bytes, set[tuple]]] = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+        self.generation = None
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def unit_vector(self, vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def band_keys(self, unit: np.ndarray) -> list[bytes]:
+        bits = (self._planes @ unit) > 0
+        return [bits[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def check_generation(self, generation: int) -> bool:
+        """Record the index's current write generation; drops every entry (returns True) if it moved."""
+        with self._lock:
+            moved = self.generation is not None and generation != self.generation
+            self.generation = generation
+            if moved:
+                self.invalidations += 1
+                self._clear()
+            return moved
+
+    def get(self, text: str, params: Hashable = None) -> Optional[dict]:
+        """Exact tier: the response cached for this normalized text and params."""
+        key = (params, normalize_query(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(entry)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.response
+
+    def get_similar(self, text: str, vector, params: Hashable = None) -> Optional[dict]:
+        """Semantic tier: the response of the most similar cached query at or above the threshold.
+
+        A hit is also cached under this text, with the original search's
+        creation time, so the next identical query is an exact hit.
+        """
+        unit = self.unit_vector(vector)
+        band_keys = self.band_keys(unit)
+        with self._lock:
+            candidates = set()
+            for buckets, band_key in zip(self._buckets, band_keys):
+                candidates.update(key for key in buckets.get(band_key, ()) if key[0] == params)
+            best = None
+            best_similarity = self.threshold
+            for key in candidates:
+                entry = self._entries[key]
+                if self._expired(entry):
+                    continue
+                similarity = float(self._vectors[entry.slot] @ unit)
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best.key)
+            self.semantic_hits += 1
+            self._add((params, normalize_query(text)), best.response, best.created, unit, band_keys)
+            return best.response
+
+    def put(self, text: str, response: dict, vector=None, params: Hashable = None):
+        """Cache a search response under its query text (and embedding, for the semantic tier)."""
+        unit = self.unit_vector(vector) if vector is not None else None
+        band_keys = self.band_keys(unit) if unit is not None else []
+        with self._lock:
+            self._add((params, normalize_query(text)), response, time.monotonic(), unit, band_keys)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    # Callers hold the lock
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return bool(self.ttl_seconds) and time.monotonic() - entry.created > self.ttl_seconds
+
+    def _add(self, key: tuple, response: dict, created: float, unit: Optional[np.ndarray], band_keys: list[bytes]):
+        if key in self._entries:
+            self._remove(self._entries[key])
+        while len(self._entries) >= self.max_entries:
+            self._remove(next(iter(self._entries.values())))
+            self.evictions += 1
+        slot = None
+        if unit is not None:
+            slot = self._free_slots.pop()
+            self._vectors[slot] = unit
+            for buckets, band_key in zip(self._buckets, band_keys):
+                buckets.setdefault(band_key, set()).add(key)
+        self._entries[key] = CacheEntry(key, response, created, slot, band_keys)
+
+    def _remove(self, entry: CacheEntry):
+        del self._entries[entry.key]
+        for buckets, band_key in zip(self._buckets, entry.band_keys):
+            bucket = buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(entry.key)
+                if not bucket:
+                    del buckets[band_key]
+        if entry.slot is not None:
+            self._free_slots.append(entry.slot)
+
+    def _clear(self):
+        self._entries.clear()
+        self._buckets = [{} for _ in range(self.bands)]
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+
+class CachedHybridSearcher(HybridSearcher):
+    """HybridSearcher that answers repeated and paraphrased queries from a QueryCache."""
+
+    def __init__(self, client=None, index: Optional[str] = None, pipeline: str = PIPELINE_NAME,
+                 embedder=None, cache: Optional[QueryCache] = None, generation_check_seconds: float = 1.0):
+        super().__init__(client, index, pipeline, embedder)
+        self.cache = cache or QueryCache(self.embedder.dimension)
+        self.generation_check_seconds = generation_check_seconds
+        self.last_tier: Optional[str] = None
+        self._generation_checked: Optional[float] = None
+
+    def check_generation(self, force: bool = False):
+        """Empty the cache if ingestion wrote to the index since the last check."""
+        now = time.monotonic()
+        if force or self._generation_checked is None or now - self._generation_checked >= self.generation_check_seconds:
+            self.cache.check_generation(ingest.read_ingest_generation(self.client, self.index))
+            self._generation_checked = now
+
+    def search(self, text: str, k: int = 10, ef_search: Optional[int] = None,
+               fields: Optional[list[str]] = None, vector=None) -> dict:
+        """Like HybridSearcher.search; last_tier says how it was answered ("exact", "semantic" or "miss")."""
+        self.check_generation()
+        params = (self.index, self.pipeline, k, ef_search, tuple(fields) if fields else None)
+        response = self.cache.get(text, params)
+        if response is not None:
+            self.last_tier = "exact"
+            return response
+        if vector is None:
+            vector = self.embed(text)
+        response = self.cache.get_similar(text, vector, params)
+        if response is not None:
+            self.last_tier = "semantic"
+            return response
+        response = super().search(text, k, ef_search, fields, vector)
+        self.cache.put(text, response, vector, params)
+        self.last_tier = "miss"
+        return response
@@ -0,0 +1,316 @@
+"""
+Request scheduling for the external APIs the ingestion script calls.
+
+Each Endpoint (OpenAI embeddings, OpenAI chat, Unstructured) combines:
+- token buckets for requests/min and tokens/min (0 = no client-side limit);
+  a request reserves its budget up front and waits until it is covered
+- retries of 429, 408/409 and 5xx responses and of transport errors, waiting
+  for Retry-After (or retry-after-ms) when the server sends it and otherwise
+  using exponential backoff with full jitter
+- a shared pause: after a 429 every caller of the endpoint holds off until
+  the retry time, instead of each one hammering the API on its own
+- adaptive concurrency (AIMD): the number of requests in flight is halved
+  on a 429 and grows back by one per window of successful requests
+
+Endpoints are thread-safe and can be used from sync code (call) and from
+asyncio (call_async) at the same time. For a process pool, Endpoint.share moves
+the budgets and the pause into shared memory and Endpoint.attach rebuilds the
+endpoint in a worker, so all processes draw from one budget; the adaptive
+concurrency limit and the counters stay per process.
+
+An endpoint's `observer`, if set, is called after every attempt with the
+endpoint name, the attempt's duration and its response (None on a transport
+error), e.g. to record latencies and bytes transferred.
+"""
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough, conservative token estimate (~3 chars/token) without a tokenizer."""
+    return len(text) // 3 + 1
+
+
+class RetriesExhausted(Exception):
+    """A request still failed with a retryable error after the last retry."""
+
+
+class TokenBucket:
+    """Budget of `per_minute` units, refilled continuously, bursting up to 6s worth.
+
+    `state` is a shared multiprocessing Array("d", [level, updated]) when the
+    bucket is shared between processes (see share).
+    """
+
+    def __init__(self, per_minute: float, state=None):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = max(per_minute / 10.0, 1.0)
+        if state is None:
+            self._state = [self.capacity, time.monotonic()]
+            self._lock = threading.Lock()
+        else:
+            self._state = state
+            self._lock = state.get_lock()
+
+    def share(self, ctx):
+        """Move the bucket's state into shared memory and return it."""
+        with self._lock:
+            state = ctx.Array("d", list(self._state))
+        self._state = state
+        self._lock = state.get_lock()
+        return state
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` units now; returns the seconds to wait until they are covered.
+
+        The bucket may go into debt, so a request larger than the burst size
+        still gets through, just later.
+        """
+        with self._lock:
+            # time.monotonic() is system-wide, so shared state works across processes
+            now = time.monotonic()
+            level = min(self.capacity, self._state[0] + (now - self._state[1]) * self.rate) - amount
+            self._state[0] = level
+            self._state[1] = now
+            return 0.0 if level >= 0 else -level / self.rate
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on requests in flight: halve on throttling, +1 per window of successes."""
+
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                # One decrease per wave of 429s: requests already in flight
+                # when the limit was hit will report it too
+                if now - self._last_decrease > 1.0:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+
+def retry_after_seconds(response: Optional[httpx.Response]) -> Optional[float]:
+    """Delay requested by the server via retry-after-ms or Retry-After (seconds or HTTP date)."""
+    if response is None:
+        return None
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class Endpoint:
+    """Rate limits, retries and adaptive concurrency for one external API."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_concurrency: int = 64,
+        max_retries: int = 8,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        shared: Optional[dict] = None,
+    ):
+        shared = shared or {}
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute, shared.get("requests")) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, shared.get("tokens")) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # [monotonic time until which nobody sends], shared like the buckets
+        self._pause = shared.get("pause") or [0.0]
+
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.exhausted = 0
+        self.observer: Optional[Callable[[str, float, Optional[httpx.Response]], None]] = None
+        self._lock = threading.Lock()
+
+    def share(self, ctx) -> dict[str, Any]:
+        """Put budgets and pause in shared memory; returns the spec for attach in a worker."""
+        self._pause = ctx.Array("d", [self._pause[0]])
+        return {
+            "name": self.name,
+            "requests_per_minute": self.requests.per_minute if self.requests else 0,
+            "tokens_per_minute": self.tokens.per_minute if self.tokens else 0,
+            "max_concurrency": self.concurrency.maximum,
+            "max_retries": self.max_retries,
+            "base_delay": self.base_delay,
+            "max_delay": self.max_delay,
+            "shared": {
+                "requests": self.requests.share(ctx) if self.requests else None,
+                "tokens": self.tokens.share(ctx) if self.tokens else None,
+                "pause": self._pause,
+            },
+        }
+
+    @classmethod
+    def attach(cls, spec: dict[str, Any]) -> "Endpoint":
+        """The endpoint described by a share() spec, using the shared budgets."""
+        return cls(**spec)
+
+    def counters(self) -> dict[str, int]:
+        return {"calls": self.calls, "retries": self.retries, "throttled": self.throttled, "exhausted": self.exhausted}
+
+    def add_counters(self, counters: dict[str, int]):
+        """Add a worker's counters (see counters) to this endpoint's."""
+        with self._lock:
+            for key, value in counters.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def reserve(self, tokens: int) -> float:
+        """Reserve budget for one request; returns the seconds to wait before sending."""
+        wait = self._pause[0] - time.monotonic()
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return max(wait, 0.0)
+
+    def retry_delay(self, response: Optional[httpx.Response], error: Optional[Exception], attempt: int) -> Optional[float]:
+        """Release the request's slot and decide on a retry: None means done, else the delay.
+
+        Raises RetriesExhausted once max_retries is used up. Responses with a
+        retryable status are closed by the caller (sync or async).
+        """
+        throttled = response is not None and response.status_code == 429
+        self.concurrency.release(throttled)
+        if error is None and response.status_code not in RETRY_STATUSES:
+            return None
+
+        status = f"HTTP {response.status_code}" if response is not None else f"{type(error).__name__}: {error}"
+        if attempt >= self.max_retries:
+            with self._lock:
+                self.exhausted += 1
+            raise RetriesExhausted(f"{self.name}: still failing after {attempt + 1} attempts ({status})") from error
+
+        delay = retry_after_seconds(response)
+        if delay is not None:
+            # Honour the server's delay, spread a little so waiters don't all return at once
+            delay += random.uniform(0, 0.1 * delay + 0.05)
+        else:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        with self._lock:
+            self.retries += 1
+            if throttled:
+                self.throttled += 1
+                self._pause[0] = max(self._pause[0], time.monotonic() + delay)
+        return delay
+
+    def call(self, send: Callable[[], httpx.Response], tokens: int = 0) -> httpx.Response:
+        """Send a request with `send()` under this endpoint's limits, retrying as needed.
+
+        Returns the first non-retryable response (check its status as usual).
+        """
+        with self._lock:
+            self.calls += 1
+        attempt = 0
+        while True:
+            time.sleep(self.reserve(tokens))
+            self.concurrency.acquire()
+            response = error = None
+            start = time.perf_counter()
+            try:
+                response = send()
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                self.concurrency.release(False)
+                raise
+            if self.observer:
+                self.observer(self.name, time.perf_counter() - start, response)
+            try:
+                delay = self.retry_delay(response, error, attempt)
+            finally:
+                if response is not None and response.status_code in RETRY_STATUSES:
+                    response.close()
+            if delay is None:
+                return response
+            attempt += 1
+            time.sleep(delay)
+
+    async def call_async(self, send: Callable[[], Awaitable[httpx.Response]], tokens: int = 0) -> httpx.Response:
+        """Async variant of call."""
+        with self._lock:
+            self.calls += 1
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.reserve(tokens))
+            while not self.concurrency.try_acquire():
+                await asyncio.sleep(0.05)
+            response = error = None
+            start = time.perf_counter()
+            try:
+                response = await send()
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                self.concurrency.release(False)
+                raise
+            if self.observer:
+                self.observer(self.name, time.perf_counter() - start, response)
+            try:
+                delay = self.retry_delay(response, error, attempt)
+            finally:
+                if response is not None and response.status_code in RETRY_STATUSES:
+                    await response.aclose()
+            if delay is None:
+                return response
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def summary(self) -> str:
+        return (f"{self.name}: {self.calls} requests, {self.retries} retries "
+                f"({self.throttled} rate limited, {self.exhausted} gave up), "
+                f"concurrency limit {int(self.concurrency.limit)}")
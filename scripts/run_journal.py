@@ -0,0 +1,281 @@
+"""
+Durable run journal for resumable ingestion (--resume).
+
+Every ingestion run records its progress in a SQLite file as it goes:
+- per file: its fingerprint, its status (pending, parsing, parsed, done) and
+  element/chunk/document counts
+- the parse output itself, in compressed batches written while the Unstructured
+  response streams in, so a resumed run never pays for parsing a file twice
+- the ids of documents the index acknowledged, written once per bulk request's
+  worth of documents, so a resumed run only embeds and indexes what is missing
+
+A file whose content changed since it was journaled starts over. When a run
+completes with every file done, its parse output and acknowledgements are
+dropped; a run that stopped early keeps them until it is resumed or replaced
+by a new run on the same index and inputs.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+# Elements per stored parse-output batch and acknowledgements per write
+ELEMENT_BATCH = 256
+ACK_BATCH = 500
+
+
+class RunJournal:
+    """Progress of one ingestion run (a new one, or the resumed last one).
+
+    Worker processes open the journal with the parent's `run_id` and write to
+    the same run; SQLite serializes their writes.
+    """
+
+    def __init__(self, path: str, index: str, inputs: dict, resume: bool = False, run_id: Optional[int] = None):
+        self.path = Path(path)
+        self.index = index
+        self.inputs = json.dumps(inputs, sort_keys=True)
+        self.resumed = False
+
+        self._lock = threading.Lock()
+        self._pending_acks: dict[str, list[str]] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id INTEGER PRIMARY KEY,"
+            " index_name TEXT NOT NULL,"
+            " inputs TEXT NOT NULL,"
+            " started REAL NOT NULL,"
+            " finished REAL);"
+            "CREATE TABLE IF NOT EXISTS files ("
+            " run_id INTEGER NOT NULL,"
+            " path TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " elements INTEGER NOT NULL DEFAULT 0,"
+            " embedded INTEGER NOT NULL DEFAULT 0,"
+            " indexed INTEGER NOT NULL DEFAULT 0,"
+            " errors INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (run_id, path));"
+            "CREATE TABLE IF NOT EXISTS elements ("
+            " run_id INTEGER NOT NULL,"
+            " path TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " batch BLOB NOT NULL,"
+            " PRIMARY KEY (run_id, path, seq));"
+            "CREATE TABLE IF NOT EXISTS acked ("
+            " run_id INTEGER NOT NULL,"
+            " path TEXT NOT NULL,"
+            " doc_id TEXT NOT NULL,"
+            " PRIMARY KEY (run_id, path, doc_id)) WITHOUT ROWID;"
+        )
+
+        row = (run_id,) if run_id is not None else None
+        if resume and row is None:
+            row = self._conn.execute(
+                "SELECT run_id FROM runs WHERE index_name = ? AND inputs = ? AND finished IS NULL"
+                " ORDER BY run_id DESC LIMIT 1",
+                (index, self.inputs),
+            ).fetchone()
+        if row:
+            self.run_id = row[0]
+            self.resumed = run_id is None
+        else:
+            # Unfinished runs over the same inputs can't be resumed once a new one starts
+            for (run_id,) in self._conn.execute(
+                "SELECT run_id FROM runs WHERE index_name = ? AND inputs = ? AND finished IS NULL",
+                (index, self.inputs),
+            ).fetchall():
+                self._drop_run(run_id)
+            self.run_id = self._conn.execute(
+                "INSERT INTO runs (index_name, inputs, started) VALUES (?, ?, ?)",
+                (index, self.inputs, time.time()),
+            ).lastrowid
+        self._conn.commit()
+
+    def _drop_run(self, run_id: int):
+        for table in ("acked", "elements", "files", "runs"):
+            self._conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+
+    # Files
+
+    def file(self, path: str) -> Optional[dict]:
+        """The journal entry for a file in this run, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, status, elements, embedded, indexed, errors FROM files"
+                " WHERE run_id = ? AND path = ?",
+                (self.run_id, path),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("fingerprint", "status", "elements", "embedded", "indexed", "errors")
+        return dict(zip(keys, row))
+
+    def add_file(self, path: str, fingerprint: str):
+        """Register a file the run is going to ingest (status 'pending')."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO files (run_id, path, fingerprint, status) VALUES (?, ?, ?, 'pending')",
+                (self.run_id, path, fingerprint),
+            )
+            self._conn.commit()
+
+    def reset_file(self, path: str):
+        """Forget all progress on a file (its content changed)."""
+        with self._lock:
+            self._pending_acks.pop(path, None)
+            for table in ("acked", "elements", "files"):
+                self._conn.execute(f"DELETE FROM {table} WHERE run_id = ? AND path = ?", (self.run_id, path))
+            self._conn.commit()
+
+    def record_elements(self, path: str, fingerprint: str, elements: Iterable[dict]) -> Iterator[dict]:
+        """Pass elements through while storing them; the file counts as parsed once they run out.
+
+        Acknowledgements from an earlier attempt are kept: chunk ids don't
+        depend on the parse, only on the element position and text.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM elements WHERE run_id = ? AND path = ?", (self.run_id, path))
+            self._conn.execute(
+                "INSERT INTO files (run_id, path, fingerprint, status) VALUES (?, ?, ?, 'parsing')"
+                " ON CONFLICT (run_id, path) DO UPDATE SET fingerprint = excluded.fingerprint, status = 'parsing'",
+                (self.run_id, path, fingerprint),
+            )
+            self._conn.commit()
+
+        seq = 0
+        count = 0
+        batch = []
+        for element in elements:
+            batch.append(element)
+            count += 1
+            if len(batch) >= ELEMENT_BATCH:
+                self._store_batch(path, seq, batch)
+                seq += 1
+                batch = []
+            yield element
+        if batch:
+            self._store_batch(path, seq, batch)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE files SET status = 'parsed', elements = ? WHERE run_id = ? AND path = ?",
+                (count, self.run_id, path),
+            )
+            self._conn.commit()
+
+    def save_elements(self, path: str, fingerprint: str, elements: list[dict]):
+        """Store a whole parse result at once (see record_elements)."""
+        for _ in self.record_elements(path, fingerprint, elements):
+            pass
+
+    def _store_batch(self, path: str, seq: int, batch: list[dict]):
+        blob = zlib.compress(json.dumps(batch, ensure_ascii=False).encode(), 1)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO elements (run_id, path, seq, batch) VALUES (?, ?, ?, ?)",
+                (self.run_id, path, seq, blob),
+            )
+            self._conn.commit()
+
+    def stored_elements(self, path: str) -> Iterator[dict]:
+        """The journaled parse output of a file, one stored batch in memory at a time."""
+        with self._lock:
+            seqs = [row[0] for row in self._conn.execute(
+                "SELECT seq FROM elements WHERE run_id = ? AND path = ? ORDER BY seq", (self.run_id, path)
+            )]
+        for seq in seqs:
+            with self._lock:
+                blob = self._conn.execute(
+                    "SELECT batch FROM elements WHERE run_id = ? AND path = ? AND seq = ?",
+                    (self.run_id, path, seq),
+                ).fetchone()[0]
+            yield from json.loads(zlib.decompress(blob))
+
+    def acked_ids(self, path: str) -> set[str]:
+        """Ids of the file's documents the index has acknowledged."""
+        with self._lock:
+            return {row[0] for row in self._conn.execute(
+                "SELECT doc_id FROM acked WHERE run_id = ? AND path = ?", (self.run_id, path)
+            )}
+
+    def ack(self, path: str, doc_id: str):
+        """Record an acknowledged document; written in batches of ACK_BATCH."""
+        with self._lock:
+            pending = self._pending_acks.setdefault(path, [])
+            pending.append(doc_id)
+            if len(pending) >= ACK_BATCH:
+                self._flush_acks(path)
+
+    def _flush_acks(self, path: str):
+        pending = self._pending_acks.pop(path, [])
+        if not pending:
+            return
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO acked (run_id, path, doc_id) VALUES (?, ?, ?)",
+            [(self.run_id, path, doc_id) for doc_id in pending],
+        )
+        self._conn.execute(
+            "UPDATE files SET indexed = (SELECT COUNT(*) FROM acked WHERE run_id = ? AND path = ?)"
+            " WHERE run_id = ? AND path = ?",
+            (self.run_id, path, self.run_id, path),
+        )
+        self._conn.commit()
+
+    def finish_file(self, path: str, fingerprint: str, stats: dict):
+        """Mark a file done with its final counts (elements, embedded, indexed, errors)."""
+        with self._lock:
+            self._pending_acks.pop(path, None)
+            self._conn.execute(
+                "INSERT INTO files (run_id, path, fingerprint, status) VALUES (?, ?, ?, 'done')"
+                " ON CONFLICT (run_id, path) DO UPDATE SET fingerprint = excluded.fingerprint, status = 'done'",
+                (self.run_id, path, fingerprint),
+            )
+            self._conn.execute(
+                "UPDATE files SET elements = ?, embedded = ?, indexed = ?, errors = ? WHERE run_id = ? AND path = ?",
+                (stats.get("elements", 0), stats.get("embedded", 0), stats.get("indexed", 0),
+                 stats.get("errors", 0), self.run_id, path),
+            )
+            # A finished file is never redone, so its parse output and acks can go
+            self._conn.execute("DELETE FROM elements WHERE run_id = ? AND path = ?", (self.run_id, path))
+            self._conn.execute("DELETE FROM acked WHERE run_id = ? AND path = ?", (self.run_id, path))
+            self._conn.commit()
+
+    def flush(self):
+        """Write acknowledgements still buffered in memory."""
+        with self._lock:
+            for path in list(self._pending_acks):
+                self._flush_acks(path)
+
+    def counts(self) -> dict[str, int]:
+        """Files of this run per status."""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM files WHERE run_id = ? GROUP BY status", (self.run_id,)
+            ).fetchall())
+
+    def finish(self) -> bool:
+        """Close the run if every journaled file is done; returns whether it was closed."""
+        self.flush()
+        with self._lock:
+            unfinished = self._conn.execute(
+                "SELECT COUNT(*) FROM files WHERE run_id = ? AND status != 'done'", (self.run_id,)
+            ).fetchone()[0]
+            if unfinished:
+                return False
+            self._conn.execute("UPDATE runs SET finished = ? WHERE run_id = ?", (time.time(), self.run_id))
+            self._conn.execute("DELETE FROM elements WHERE run_id = ?", (self.run_id,))
+            self._conn.execute("DELETE FROM acked WHERE run_id = ?", (self.run_id,))
+            self._conn.commit()
+            return True
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Tune HNSW parameters and hybrid score weights against recall and latency.
+
+HNSW grid: for every (m, ef_construction) pair a copy of the ingested index is
+built with _reindex (no re-embedding), force-merged to one segment and warmed
+up. Sampled document vectors are then run as knn queries at every ef_search
+(per query on OpenSearch 2.16+, else as the copy's index.knn.algo_param.ef_search),
+and each configuration reports:
+- recall@k against exact cosine top-k computed locally with NumPy
+- p50/p99 query latency (client side, one query at a time, after warmup)
+- build time (_reindex + force-merge, which is where the graphs are built)
+- store size and native memory of the loaded k-NN graphs
+
+Hybrid weights: a temporary copy of hybrid_search_pipeline is created per BM25
+weight (the vector weight is 1 - w), and hybrid queries (see hybrid_search.py)
+run against the ingested index. Queries come from --queries-file, one JSON
+object per line: {"query": "...", "relevant": ["<record_id>", ...]}; without
+"relevant" (or without a file) recall@k is measured against the exact k-NN
+neighbours of the query embedding. With no file, the queries are the first
+words of sampled chunks, and each query's own chunk counts as relevant.
+
+Usage:
+    python scripts/tune_search.py --index hybrid_demo
+    python scripts/tune_search.py --m 16,32,48 --ef-construction 128,256 --ef-search 32,64,128,256 --slo-ms 20
+    python scripts/tune_search.py --skip-hnsw --queries-file queries.jsonl --bm25-weights 0.2,0.3,0.4,0.5 --json
+"""
+import argparse
+import copy
+import json
+import random
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+import ingest_unstructured_opensearch as ingest
+from hybrid_search import HybridSearcher, percentile
+from vector_storage_report import exact_top_k, finish_index, graph_memory_kb, load_vectors, store_bytes
+
+# Words of a sampled chunk used as its query when there's no --queries-file
+SAMPLED_QUERY_WORDS = 12
+
+
+def parse_list(value: str, kind=int) -> list:
+    return [kind(item) for item in value.split(",") if item.strip()]
+
+
+def build_hnsw_variant(client, source: str, name: str, dimension: int, m: int, ef_construction: int) -> float:
+    """Copy the source index into one with the given HNSW parameters; returns the build seconds."""
+    schema = copy.deepcopy(ingest.INDEX_SCHEMA)
+    mapping = ingest.vector_field_mapping(dimension)
+    mapping["method"]["parameters"].update(m=m, ef_construction=ef_construction)
+    schema["mappings"]["properties"]["vector_field"] = mapping
+    start = time.perf_counter()
+    client.indices.create(index=name, body=schema)
+    ingest.reindex_into(client, source, name)
+    finish_index(client, name)
+    return time.perf_counter() - start
+
+
+def run_queries(search, queries: list, truth: list[set], k: int, warmup: int) -> dict:
+    """Run `search(query) -> response` for every query; recall@k and latency percentiles."""
+    for query in queries[:warmup]:
+        search(query)
+    seconds = []
+    took = []
+    found = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        response = search(query)
+        seconds.append(time.perf_counter() - start)
+        took.append(response.get("took", 0))
+        hits = {hit["_id"] for hit in response.get("hits", {}).get("hits", [])}
+        found += len(expected & hits) / min(k, len(expected)) if expected else 0
+    return {
+        f"recall@{k}": round(found / len(queries), 4),
+        "p50_ms": round(percentile(seconds, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(seconds, 0.99) * 1000, 2),
+        "took_p50_ms": percentile(took, 0.5),
+    }
+
+
+def knn_search(client, index: str, k: int, ef_search: Optional[int] = None):
+    """Search function for run_queries; ef_search (OpenSearch 2.16+) overrides the index setting."""
+    knn = {"k": k}
+    if ef_search:
+        knn["method_parameters"] = {"ef_search": ef_search}
+
+    def search(vector: list[float]) -> dict:
+        return client.search(index=index, body={
+            "size": k,
+            "_source": False,
+            "query": {"knn": {"vector_field": {"vector": vector, **knn}}},
+        }, params={"filter_path": "took,hits.hits._id"})
+    return search
+
+
+def tune_hnsw(client, args, ids: list[str], matrix: np.ndarray) -> list[dict]:
+    sample = random.Random(42).sample(range(len(ids)), min(args.queries, len(ids)))
+    queries = [matrix[i].tolist() for i in sample]
+    truth = exact_top_k(matrix, ids, matrix[sample], args.k)
+    dimension = matrix.shape[1]
+    per_query = ingest.supports_query_ef_search(client)
+    if not per_query:
+        print(f"[INFO] OpenSearch before 2.16: setting {ingest.KNN_EF_SEARCH_SETTING} for each ef_search")
+
+    rows = []
+    created = []
+    try:
+        for m in parse_list(args.m):
+            for ef_construction in parse_list(args.ef_construction):
+                name = f"{args.index}_tune_m{m}_efc{ef_construction}"
+                print(f"[INFO] Building m={m} ef_construction={ef_construction} as '{name}'...")
+                if client.indices.exists(index=name):
+                    client.indices.delete(index=name)
+                created.append(name)
+                build_seconds = build_hnsw_variant(client, args.index, name, dimension, m, ef_construction)
+                size = store_bytes(client, name)
+                memory_kb = graph_memory_kb(client, name)
+                for ef_search in parse_list(args.ef_search):
+                    if not per_query:
+                        client.indices.put_settings(index=name, body={ingest.KNN_EF_SEARCH_SETTING: ef_search})
+                    result = run_queries(knn_search(client, name, args.k, ef_search if per_query else None),
+                                         queries, truth, args.k, args.warmup)
+                    rows.append({
+                        "m": m,
+                        "ef_construction": ef_construction,
+                        "ef_search": ef_search,
+                        **result,
+                        "build_seconds": round(build_seconds, 1),
+                        "store_bytes": size,
+                        "graph_memory_kb": memory_kb,
+                    })
+                    print(f"   ef_search={ef_search}: recall@{args.k} {result[f'recall@{args.k}']:.3f}, "
+                          f"p99 {result['p99_ms']} ms")
+    finally:
+        if not args.keep:
+            for name in created:
+                client.indices.delete(index=name, ignore_unavailable=True)
+    return rows
+
+
+def load_query_set(client, args, ids: list[str]) -> list[dict]:
+    """[{"query": text, "relevant": set of ids or None}] from --queries-file or sampled chunks."""
+    if args.queries_file:
+        queries = []
+        for line in Path(args.queries_file).read_text().splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                relevant = entry.get("relevant")
+                queries.append({"query": entry["query"], "relevant": set(relevant) if relevant else None})
+        return queries[:args.queries]
+
+    sample = random.Random(7).sample(ids, min(args.queries, len(ids)))
+    docs = client.mget(index=args.index, body={"ids": sample}, params={"_source_includes": "text"})["docs"]
+    queries = []
+    for doc in docs:
+        words = (doc.get("_source") or {}).get("text", "").split()
+        if words:
+            queries.append({"query": " ".join(words[:SAMPLED_QUERY_WORDS]), "relevant": {doc["_id"]}})
+    return queries
+
+
+def tune_weights(client, args, ids: list[str], matrix: np.ndarray) -> list[dict]:
+    query_set = load_query_set(client, args, ids)
+    if not query_set:
+        print("[WARN] No queries for the hybrid weights")
+        return []
+    searcher = HybridSearcher(client=client, index=args.index)
+    mismatch = searcher.check_dimension()
+    if mismatch:
+        raise ValueError(f"'{args.index}' holds {mismatch}-dim vectors but {ingest.EMBEDDING_MODEL} produces "
+                         f"{searcher.embedder.dimension}; pass the --embedding-model/--dimensions used for ingestion")
+    if args.hybrid_ef_search and not ingest.supports_query_ef_search(client):
+        raise ValueError(f"--hybrid-ef-search needs OpenSearch 2.16 or later; "
+                         f"the hybrid queries use {ingest.KNN_EF_SEARCH_SETTING} of '{args.index}' without it")
+
+    # Each query is embedded once, for every weight
+    texts = [entry["query"] for entry in query_set]
+    vectors = []
+    for start in range(0, len(texts), ingest.EMBEDDING_BATCH_SIZE):
+        vectors.extend(searcher.embedder.embed(texts[start:start + ingest.EMBEDDING_BATCH_SIZE]))
+    query_matrix = np.asarray(vectors, dtype=np.float32)
+    query_matrix /= np.linalg.norm(query_matrix, axis=1, keepdims=True).clip(min=1e-12)
+    knn_truth = exact_top_k(matrix, ids, query_matrix, args.k)
+    truth = [entry["relevant"] or knn_truth[i] for i, entry in enumerate(query_set)]
+    queries = [(entry["query"], vector) for entry, vector in zip(query_set, vectors)]
+
+    rows = []
+    for bm25_weight in parse_list(args.bm25_weights, float):
+        pipeline = copy.deepcopy(ingest.SEARCH_PIPELINE)
+        combination = pipeline["phase_results_processors"][0]["normalization-processor"]["combination"]
+        combination["parameters"]["weights"] = [bm25_weight, round(1 - bm25_weight, 6)]
+        searcher.pipeline = f"{args.index}_tune_weights_{int(round(bm25_weight * 100))}"
+        client.transport.perform_request("PUT", f"/_search/pipeline/{searcher.pipeline}", body=pipeline)
+        try:
+            result = run_queries(
+                lambda query: searcher.search(query[0], k=args.k, ef_search=args.hybrid_ef_search or None,
+                                              fields=["record_id"], vector=query[1]),
+                queries, truth, args.k, args.warmup,
+            )
+        finally:
+            if not args.keep:
+                client.transport.perform_request("DELETE", f"/_search/pipeline/{searcher.pipeline}")
+        rows.append({"bm25_weight": bm25_weight, "vector_weight": round(1 - bm25_weight, 6), **result})
+        print(f"   weights {bm25_weight:g}/{1 - bm25_weight:g}: recall@{args.k} {result[f'recall@{args.k}']:.3f}, "
+              f"p99 {result['p99_ms']} ms")
+    return rows
+
+
+def best_under_slo(rows: list[dict], k: int, slo_ms: float):
+    within = [row for row in rows if row["p99_ms"] <= slo_ms]
+    return max(within, key=lambda row: (row[f"recall@{k}"], -row["p99_ms"]), default=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid-search HNSW parameters and hybrid weights for recall and latency")
+    parser.add_argument("--index", type=str, default=ingest.INDEX_NAME, help="Ingested index to tune on")
+    parser.add_argument("--m", type=str, default="16,32", help="Comma-separated HNSW m values")
+    parser.add_argument("--ef-construction", type=str, default="128,256", help="Comma-separated ef_construction values")
+    parser.add_argument("--ef-search", type=str, default="50,100,200", help="Comma-separated ef_search values")
+    parser.add_argument("--bm25-weights", type=str, default="0.2,0.3,0.4,0.5",
+                        help="Comma-separated BM25 weights for the hybrid pipeline (vector weight = 1 - w)")
+    parser.add_argument("--hybrid-ef-search", type=int, default=0, help="ef_search of the hybrid queries, OpenSearch 2.16+ (default: index setting)")
+    parser.add_argument("--k", type=int, default=10, help="k for recall@k")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per configuration")
+    parser.add_argument("--queries-file", type=str, help="JSON lines of {\"query\": ..., \"relevant\": [ids]} for the weights")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed queries before each measurement")
+    parser.add_argument("--slo-ms", type=float, default=0, help="p99 latency target; reports the best recall within it")
+    parser.add_argument("--embedding-model", type=str, default=ingest.EMBEDDING_MODEL,
+                        help="Embedding backend the index was built with (for the hybrid queries)")
+    parser.add_argument("--dimensions", type=int, default=ingest.EMBEDDING_DIMENSIONS,
+                        help="Shortened embedding size the index was built with (0 = the model's own)")
+    parser.add_argument("--skip-hnsw", action="store_true", help="Only tune the hybrid weights")
+    parser.add_argument("--skip-weights", action="store_true", help="Only tune the HNSW parameters")
+    parser.add_argument("--keep", action="store_true", help="Keep the tuning indices and pipelines")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    ingest.EMBEDDING_MODEL = args.embedding_model
+    ingest.EMBEDDING_DIMENSIONS = args.dimensions
+    client = ingest.create_opensearch_client()
+    ids, matrix = load_vectors(client, args.index)
+    if len(ids) <= args.k:
+        print(f"[ERROR] '{args.index}' needs more than {args.k} vectors, has {len(ids)}")
+        return
+    print(f"[OK] Loaded {len(ids)} {matrix.shape[1]}-dim vectors from '{args.index}'")
+
+    results = {"index": args.index, "documents": len(ids), "k": args.k, "hnsw": [], "weights": []}
+    if not args.skip_hnsw:
+        results["hnsw"] = tune_hnsw(client, args, ids, matrix)
+    if not args.skip_weights:
+        try:
+            results["weights"] = tune_weights(client, args, ids, matrix)
+        except (ImportError, ValueError) as e:
+            print(f"[ERROR] {e}")
+
+    recall_key = f"recall@{args.k}"
+    if args.slo_ms:
+        results["best_hnsw"] = best_under_slo(results["hnsw"], args.k, args.slo_ms)
+        results["best_weights"] = best_under_slo(results["weights"], args.k, args.slo_ms)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    if results["hnsw"]:
+        print(f"\n{'m':>4} {'ef_constr':>9} {'ef_search':>9} {recall_key:>10} {'p50 ms':>8} {'p99 ms':>8} "
+              f"{'build s':>8} {'store MB':>9} {'graph MB':>9}")
+        for row in results["hnsw"]:
+            print(f"{row['m']:>4} {row['ef_construction']:>9} {row['ef_search']:>9} {row[recall_key]:>10.3f} "
+                  f"{row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['build_seconds']:>8.1f} "
+                  f"{row['store_bytes'] / 1024 / 1024:>9.1f} {row['graph_memory_kb'] / 1024:>9.1f}")
+    if results["weights"]:
+        print(f"\n{'BM25/vector':>12} {recall_key:>10} {'p50 ms':>8} {'p99 ms':>8}")
+        for row in results["weights"]:
+            weights = f"{row['bm25_weight']:g}/{row['vector_weight']:g}"
+            print(f"{weights:>12} {row[recall_key]:>10.3f} {row['p50_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+    if args.slo_ms:
+        for label, best in (("HNSW", results["best_hnsw"]), ("weights", results["best_weights"])):
+            if best:
+                settings = ", ".join(f"{key}={value}" for key, value in best.items()
+                                     if key in ("m", "ef_construction", "ef_search", "bm25_weight", "vector_weight"))
+                print(f"[OK] Best {label} within p99 {args.slo_ms:g} ms: {settings} "
+                      f"({recall_key} {best[recall_key]:.3f}, p99 {best['p99_ms']} ms)")
+            elif results["hnsw" if label == "HNSW" else "weights"]:
+                print(f"[WARN] No {label} configuration within p99 {args.slo_ms:g} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Compare reduced-dimension and quantized vector storage against full precision.
+
+Takes an index ingested with full-size float32 vectors as the baseline and
+builds one copy per variant with _reindex (no re-embedding; shortened variants
+truncate and re-normalize the stored vectors, which is what the OpenAI
+`dimensions` parameter does). Each index is force-merged to one segment and
+warmed up, then the report lists:
+- store size (primaries, on disk)
+- native memory of the loaded k-NN graphs (k-NN stats after warmup)
+- recall@k of approximate k-NN search, against exact cosine top-k over the
+  baseline's full-precision vectors, for sampled document vectors as queries
+
+Variants are "<encoder>" or "<encoder>@<dimensions>" with encoder flat, fp16
+or pq. A pq@<d> variant trains its model on the baseline (d = full size) or on
+an earlier variant with d dimensions, so list e.g. flat@512 before pq@512.
+
+Usage:
+    python scripts/vector_storage_report.py --index hybrid_demo
+    python scripts/vector_storage_report.py --variants fp16,flat@512,fp16@512,pq,flat@256 --k 10 --json
+"""
+import argparse
+import copy
+import json
+import random
+
+import numpy as np
+from opensearchpy import helpers
+
+import ingest_unstructured_opensearch as ingest
+from embedders import truncate_vector
+
+
+def load_vectors(client, index: str) -> tuple[list[str], np.ndarray]:
+    """All (id, vector) pairs of an index, vectors as unit-length float32 rows."""
+    ids = []
+    vectors = []
+    for hit in helpers.scan(client, index=index, _source_includes=["vector_field"], size=1000):
+        vector = hit["_source"].get("vector_field")
+        if vector:
+            ids.append(hit["_id"])
+            vectors.append(vector)
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+    return ids, matrix
+
+
+def exact_top_k(matrix: np.ndarray, ids: list[str], queries: np.ndarray, k: int) -> list[set]:
+    """Exact cosine top-k ids for each query row (brute force)."""
+    scores = queries @ matrix.T
+    top = np.argpartition(-scores, kth=min(k, len(ids) - 1), axis=1)[:, :k]
+    return [{ids[j] for j in row} for row in top]
+
+
+def parse_variant(spec: str, full_dimension: int) -> tuple[str, int]:
+    encoder, _, dims = spec.partition("@")
+    if encoder not in ingest.FAISS_ENCODERS:
+        raise ValueError(f"Unknown encoder in variant '{spec}' (use {', '.join(ingest.FAISS_ENCODERS)})")
+    return encoder, int(dims) if dims else full_dimension
+
+
+def store_bytes(client, index: str) -> int:
+    stats = client.indices.stats(index=index, metric="store")
+    return sum(s["primaries"]["store"]["size_in_bytes"] for s in stats["indices"].values())
+
+
+def graph_memory_kb(client, index: str) -> int:
+    """Native memory held by the index's loaded k-NN graphs, summed over nodes."""
+    ingest.warmup_knn(client, index)
+    stats = client.transport.perform_request("GET", "/_plugins/_knn/stats")
+    total = 0
+    for node in stats.get("nodes", {}).values():
+        total += node.get("indices_in_cache", {}).get(index, {}).get("graph_memory_usage", 0)
+    return total
+
+
+def measure_recall(client, index: str, queries: np.ndarray, truth: list[set], k: int, dimensions: int) -> float:
+    """Mean recall@k of knn queries against the exact full-precision top-k."""
+    found = 0
+    for query, expected in zip(queries, truth):
+        vector = list(truncate_vector(query, dimensions)) if dimensions < len(query) else query.tolist()
+        response = client.search(index=index, body={
+            "size": k,
+            "_source": False,
+            "query": {"knn": {"vector_field": {"vector": vector, "k": k}}},
+        })
+        found += len(expected & {hit["_id"] for hit in response["hits"]["hits"]})
+    return found / (len(truth) * k)
+
+
+def build_variant(client, baseline: str, name: str, encoder: str, dimensions: int,
+                  full_dimension: int, training_index: str, pq_m: int):
+    """Create a variant index and fill it from the baseline with _reindex."""
+    model_id = None
+    if encoder == "pq":
+        ingest.INDEX_NAME = name
+        model_id = ingest.train_pq_model(client, training_index, dimensions, pq_m or dimensions // 4)
+    schema = copy.deepcopy(ingest.INDEX_SCHEMA)
+    schema["mappings"]["properties"]["vector_field"] = ingest.vector_field_mapping(dimensions, encoder, model_id)
+    client.indices.create(index=name, body=schema)
+    ingest.reindex_into(client, baseline, name, dimensions=dimensions if dimensions < full_dimension else None)
+    finish_index(client, name)
+    return model_id
+
+
+def finish_index(client, index: str):
+    client.indices.refresh(index=index)
+    client.indices.forcemerge(index=index, max_num_segments=1, request_timeout=3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report index size, k-NN memory and recall for vector storage options")
+    parser.add_argument("--index", type=str, default="hybrid_demo", help="Baseline index with full-precision vectors")
+    parser.add_argument("--variants", type=str, default="fp16,flat@512,fp16@512,pq", help="Comma-separated variants")
+    parser.add_argument("--k", type=int, default=10, help="k for recall@k")
+    parser.add_argument("--queries", type=int, default=200, help="Sampled query vectors")
+    parser.add_argument("--pq-m", type=int, default=0, help="PQ sub-vectors (default: dimension / 4)")
+    parser.add_argument("--keep", action="store_true", help="Keep the variant indices and PQ models")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    client = ingest.create_opensearch_client()
+    ids, matrix = load_vectors(client, args.index)
+    if len(ids) <= args.k:
+        print(f"[ERROR] '{args.index}' needs more than {args.k} vectors, has {len(ids)}")
+        return
+    full_dimension = matrix.shape[1]
+    sample = random.Random(42).sample(range(len(ids)), min(args.queries, len(ids)))
+    queries = matrix[sample]
+    truth = exact_top_k(matrix, ids, queries, args.k)
+    print(f"[OK] Loaded {len(ids)} {full_dimension}-dim vectors from '{args.index}', {len(queries)} queries")
+
+    finish_index(client, args.index)
+    rows = [{
+        "variant": f"flat@{full_dimension} (baseline)",
+        "index": args.index,
+        "store_bytes": store_bytes(client, args.index),
+        "graph_memory_kb": graph_memory_kb(client, args.index),
+        f"recall@{args.k}": measure_recall(client, args.index, queries, truth, args.k, full_dimension),
+    }]
+
+    created = []
+    models = []
+    index_by_dimension = {full_dimension: args.index}
+    try:
+        for spec in args.variants.split(","):
+            encoder, dimensions = parse_variant(spec.strip(), full_dimension)
+            name = f"{args.index}_report_{encoder}_{dimensions}"
+            print(f"[INFO] Building {spec.strip()} as '{name}'...")
+            if client.indices.exists(index=name):
+                client.indices.delete(index=name)
+            if encoder == "pq" and dimensions not in index_by_dimension:
+                print(f"   [WARN] Skipping {spec}: list a flat/fp16@{dimensions} variant first to train on")
+                continue
+            model_id = build_variant(client, args.index, name, encoder, dimensions, full_dimension,
+                                     index_by_dimension.get(dimensions), args.pq_m)
+            created.append(name)
+            if model_id:
+                models.append(model_id)
+            index_by_dimension.setdefault(dimensions, name)
+            rows.append({
+                "variant": f"{encoder}@{dimensions}",
+                "index": name,
+                "store_bytes": store_bytes(client, name),
+                "graph_memory_kb": graph_memory_kb(client, name),
+                f"recall@{args.k}": measure_recall(client, name, queries, truth, args.k, dimensions),
+            })
+    finally:
+        if not args.keep:
+            for name in created:
+                client.indices.delete(index=name, ignore_unavailable=True)
+            for model_id in models:
+                client.transport.perform_request("DELETE", f"/_plugins/_knn/models/{model_id}")
+
+    baseline = rows[0]
+    for row in rows:
+        row["store_ratio"] = round(row["store_bytes"] / baseline["store_bytes"], 3) if baseline["store_bytes"] else None
+        row["memory_ratio"] = (round(row["graph_memory_kb"] / baseline["graph_memory_kb"], 3)
+                               if baseline["graph_memory_kb"] else None)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    recall_key = f"recall@{args.k}"
+    print(f"\n{'variant':<24} {'store MB':>10} {'vs base':>8} {'graph MB':>10} {'vs base':>8} {recall_key:>10}")
+    for row in rows:
+        print(f"{row['variant']:<24} {row['store_bytes'] / 1024 / 1024:>10.1f} {row['store_ratio'] or 0:>7.2f}x "
+              f"{row['graph_memory_kb'] / 1024:>10.1f} {row['memory_ratio'] or 0:>7.2f}x {row[recall_key]:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import pytest
+
+import ingest_unstructured_opensearch as ingest
+
+
+class FakeIndices:
+    """Settings and mapping _meta of one index, with _meta replaced on every put."""
+
+    def __init__(self, settings: dict, reject: tuple = ()):
+        self.settings = dict(settings)
+        self.meta = {}
+        self.reject = reject
+
+    def get_settings(self, index, flat_settings=True):
+        return {index: {"settings": {key: str(value) for key, value in self.settings.items()}}}
+
+    def put_settings(self, index, body):
+        if any(key in body for key in self.reject):
+            raise RuntimeError("unknown setting")
+        for key, value in body.items():
+            if value is None:
+                self.settings.pop(key, None)
+            else:
+                self.settings[key] = value
+
+    def get_mapping(self, index):
+        return {index: {"mappings": {"_meta": dict(self.meta)}}}
+
+    def put_mapping(self, index, body):
+        self.meta = dict(body["_meta"])
+
+    def refresh(self, index):
+        pass
+
+    def forcemerge(self, index, max_num_segments, request_timeout):
+        pass
+
+
+class FakeClient:
+    def __init__(self, indices: FakeIndices):
+        self.indices = indices
+
+
+@pytest.fixture(autouse=True)
+def no_warmup(monkeypatch):
+    monkeypatch.setattr(ingest, "warmup_knn", lambda client, index_name: None)
+    monkeypatch.setattr(ingest, "bump_ingest_generation", lambda client, index_name: None)
+
+
+def test_bulk_load_restores_the_settings_it_replaced():
+    indices = FakeIndices({"index.refresh_interval": "5s", "index.number_of_replicas": 2})
+    client = FakeClient(indices)
+    previous = ingest.begin_bulk_load(client, "docs")
+    assert indices.settings == {"index.refresh_interval": "-1", "index.number_of_replicas": 0}
+    assert indices.meta[ingest.BULK_LOAD_META_KEY] == previous
+
+    ingest.finish_bulk_load(client, "docs", previous)
+    assert indices.settings == {"index.refresh_interval": "5s", "index.number_of_replicas": "2"}
+    assert indices.meta[ingest.BULK_LOAD_META_KEY] is None
+
+
+def test_an_interrupted_bulk_load_is_undone_by_the_next_one():
+    indices = FakeIndices({"index.refresh_interval": "5s", "index.number_of_replicas": 2})
+    client = FakeClient(indices)
+    ingest.begin_bulk_load(client, "docs", defer_knn_graphs=True)
+    # Killed before finish_bulk_load: the index keeps the bulk-load settings
+    previous = ingest.begin_bulk_load(client, "docs")
+    ingest.finish_bulk_load(client, "docs", previous)
+    assert indices.settings == {"index.refresh_interval": "5s", "index.number_of_replicas": "2"}
+
+
+def test_unsupported_graph_deferral_is_not_restored():
+    indices = FakeIndices({"index.refresh_interval": "5s"}, reject=(ingest.KNN_DEFER_GRAPH_SETTING,))
+    previous = ingest.begin_bulk_load(FakeClient(indices), "docs", defer_knn_graphs=True)
+    assert ingest.KNN_DEFER_GRAPH_SETTING not in previous
+    assert ingest.KNN_DEFER_GRAPH_SETTING not in indices.meta[ingest.BULK_LOAD_META_KEY]
@@ -0,0 +1,90 @@
+import chunking
+
+
+def element(element_type: str, text: str, page: int = 1, **metadata) -> dict:
+    return {"type": element_type, "text": text,
+            "metadata": {"filename": "guide.md", "page_number": page, **metadata}}
+
+
+def test_split_text_respects_the_limit_and_repeats_the_overlap():
+    text = " ".join(f"word{i}" for i in range(200))
+    pieces = chunking.split_text(text, max_characters=100, overlap=20)
+    assert len(pieces) > 1
+    assert all(len(piece) <= 100 for piece in pieces)
+    # Every piece starts on a word from the end of the previous one
+    for previous, piece in zip(pieces, pieces[1:]):
+        assert piece.split()[0] in previous.split()[-4:]
+    # Nothing is lost: the last word is kept and the words stay in order
+    words = [word for piece in pieces for word in piece.split()]
+    assert words[-1] == "word199"
+    assert sorted(set(words), key=words.index) == text.split()
+
+
+def test_split_text_hard_cuts_text_without_whitespace():
+    pieces = chunking.split_text("x" * 250, max_characters=100, overlap=0)
+    assert [len(piece) for piece in pieces] == [100, 100, 50]
+
+
+def test_titles_start_new_chunks_unless_the_section_is_small():
+    elements = [
+        element("Title", "Cards"),
+        element("NarrativeText", "Cards can be ordered online. " * 10),
+        element("Title", "Limits"),
+        element("NarrativeText", "Limits apply per day."),
+    ]
+    chunks = chunking.chunk_by_title(elements, max_characters=400, combine_text_under_n_chars=0)
+    assert [chunk["text"].split("\n\n")[0] for chunk in chunks] == ["Cards", "Limits"]
+    assert all(chunk["type"] == "CompositeElement" for chunk in chunks)
+
+    # The default combines a section shorter than max_characters with the next one
+    combined = chunking.chunk_by_title(elements[2:] + elements[:2], max_characters=400)
+    assert len(combined) == 1
+    assert combined[0]["text"].startswith("Limits\n\nLimits apply per day.\n\nCards")
+
+
+def test_tables_are_chunked_on_their_own():
+    elements = [
+        element("NarrativeText", "Fees are listed below."),
+        element("Table", "Card Fee Gold 10", text_as_html="<table><tr><td>Gold</td></tr></table>"),
+        element("NarrativeText", "Fees are charged yearly."),
+    ]
+    chunks = chunking.chunk_by_title(elements, max_characters=400)
+    assert [chunk["type"] for chunk in chunks] == ["CompositeElement", "Table", "CompositeElement"]
+    assert chunks[1]["metadata"]["text_as_html"].startswith("<table>")
+
+    oversized = chunking.chunk_by_title([element("Table", "cell " * 100)], max_characters=200)
+    assert {chunk["type"] for chunk in oversized} == {"TableChunk"}
+    assert "text_as_html" not in oversized[0]["metadata"]
+
+
+def test_oversized_elements_are_continued():
+    chunks = chunking.chunk_by_title([element("NarrativeText", "long sentence here " * 60)],
+                                     max_characters=300, overlap=30)
+    assert len(chunks) > 1
+    assert "is_continuation" not in chunks[0]["metadata"]
+    assert all(chunk["metadata"]["is_continuation"] for chunk in chunks[1:])
+
+
+def test_pages_split_sections_only_without_multipage_sections():
+    elements = [element("NarrativeText", "Page one text.", page=1), element("NarrativeText", "Page two text.", page=2)]
+    assert len(chunking.chunk_by_title(elements, combine_text_under_n_chars=0)) == 1
+    split = chunking.chunk_by_title(elements, combine_text_under_n_chars=0, multipage_sections=False)
+    assert [chunk["metadata"]["page_number"] for chunk in split] == [1, 2]
+
+
+def test_metadata_comes_from_the_first_element_and_merges_languages():
+    elements = [
+        element("Title", "Cartes", languages=["fra"], parent_id="root"),
+        element("NarrativeText", "Cards and cartes.", page=2, languages=["eng", "fra"], parent_id="title-1"),
+    ]
+    [chunk] = chunking.chunk_by_title(elements)
+    assert chunk["metadata"] == {"filename": "guide.md", "page_number": 1, "languages": ["fra", "eng"],
+                                 "parent_id": "title-1"}
+
+
+def test_chunk_ids_are_deterministic():
+    elements = [element("Title", "Cards"), element("NarrativeText", "Cards can be ordered online. " * 30)]
+    first = chunking.chunk_by_title(elements, max_characters=200)
+    second = chunking.chunk_by_title(elements, max_characters=200)
+    assert [chunk["element_id"] for chunk in first] == [chunk["element_id"] for chunk in second]
+    assert len({chunk["element_id"] for chunk in first}) == len(first)
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+import dedup
+
+
+def words(count: int, seed: int = 3) -> list[str]:
+    rng = random.Random(seed)
+    return [f"w{rng.randrange(5000)}" for _ in range(count)]
+
+
+def jaccard(a: str, b: str) -> float:
+    shingles = [set(dedup.shingle_hashes(dedup.normalized_words(text), 3)) for text in (a, b)]
+    return len(shingles[0] & shingles[1]) / len(shingles[0] | shingles[1])
+
+
+def test_exact_duplicates_ignore_case_punctuation_and_whitespace():
+    deduplicator = dedup.ChunkDeduplicator()
+    assert deduplicator.check("Report a lost card at once.", "a") is None
+    assert deduplicator.check("report  a LOST card, at once", "b") == ("a", "exact")
+    assert deduplicator.exact == 1 and deduplicator.near == 0
+
+
+def test_near_duplicates_point_at_the_first_copy():
+    original = words(120)
+    edited = list(original)
+    edited[60] = "changed"
+    assert jaccard(" ".join(original), " ".join(edited)) > 0.9
+
+    deduplicator = dedup.ChunkDeduplicator(threshold=0.85)
+    assert deduplicator.check(" ".join(original), "first") is None
+    assert deduplicator.check(" ".join(edited), "second") == ("first", "near")
+    # The duplicate doesn't become a canonical chunk itself
+    assert deduplicator.check(" ".join(edited), "third") == ("first", "near")
+    assert deduplicator.near == 2
+
+
+def test_unrelated_chunks_are_kept():
+    deduplicator = dedup.ChunkDeduplicator()
+    assert deduplicator.check(" ".join(words(80, seed=1)), "a") is None
+    assert deduplicator.check(" ".join(words(80, seed=2)), "b") is None
+    assert deduplicator.exact == deduplicator.near == 0
+
+
+def test_the_threshold_decides_what_counts_as_a_near_duplicate():
+    original = words(120)
+    # Shares its first two thirds with the original: Jaccard about 0.5
+    partial = original[:80] + [f"z{i}" for i in range(40)]
+    similarity = jaccard(" ".join(original), " ".join(partial))
+    assert 0.4 < similarity < 0.6
+
+    strict = dedup.ChunkDeduplicator(threshold=0.85)
+    assert strict.check(" ".join(original), "a") is None
+    assert strict.check(" ".join(partial), "b") is None
+
+    loose = dedup.ChunkDeduplicator(threshold=0.3)
+    assert loose.check(" ".join(original), "a") is None
+    assert loose.check(" ".join(partial), "b") == ("a", "near")
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.7, 0.85, 0.95])
+def test_lsh_params_put_the_s_curve_at_the_threshold(threshold):
+    bands, rows = dedup.lsh_params(threshold, 128)
+    assert bands * rows <= 128
+    # Where a pair becomes more likely than not to share a band
+    assert abs((1 / bands) ** (1 / rows) - threshold) < 0.05
+
+
+def test_short_texts_are_one_shingle():
+    assert len(dedup.shingle_hashes(["lost", "card"], 3)) == 1
+    assert len(dedup.shingle_hashes(["a", "b", "c", "d"], 3)) == 2
+
+
+def test_forgotten_canonicals_make_way_for_the_next_copy():
+    text = " ".join(words(60))
+    deduplicator = dedup.ChunkDeduplicator()
+    assert deduplicator.check(text, "failed") is None
+    assert deduplicator.check(text.upper(), "copy") == ("failed", "exact")
+    # One copy was already matched to it
+    assert deduplicator.forget("failed") == 1
+    assert deduplicator.forget("failed") == 0
+
+    assert deduplicator.check(text, "retry") is None
+    edited = text.replace(text.split()[30], "changed")
+    assert deduplicator.check(edited, "later") == ("retry", "near")
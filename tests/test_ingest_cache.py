@@ -0,0 +1,58 @@
+import struct
+
+from ingest_cache import EmbeddingCache, KeywordCache, pack_vector, unpack_vector
+
+
+def test_vectors_are_packed_as_little_endian_float32():
+    packed = pack_vector([1.0, -0.5, 0.25])
+    assert packed == struct.pack("<3f", 1.0, -0.5, 0.25)
+    assert list(unpack_vector(packed)) == [1.0, -0.5, 0.25]
+
+
+def test_embeddings_round_trip_and_count_hits(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), "text-embedding-3-small", 3)
+    cache.put_many(["lost card", "wire limits"], [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]])
+    found = cache.get_many(["wire limits", "unknown", "lost card"])
+    assert found[1] is None
+    assert [round(x, 6) for x in found[0]] == [0.4, 0.5, 0.6]
+    assert [round(x, 6) for x in found[2]] == [0.1, 0.2, 0.3]
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
+
+    # Persisted across runs
+    reopened = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), "text-embedding-3-small", 3)
+    assert reopened.get_many(["lost card"])[0] is not None
+
+
+def test_embeddings_are_keyed_by_model_and_dimension(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    EmbeddingCache(path, "text-embedding-3-small", 3).put_many(["lost card"], [[0.1, 0.2, 0.3]])
+    assert EmbeddingCache(path, "text-embedding-3-large", 3).get_many(["lost card"]) == [None]
+    assert EmbeddingCache(path, "text-embedding-3-small", 2).get_many(["lost card"]) == [None]
+    assert EmbeddingCache(path, "text-embedding-3-small", 3).get_many(["lost card"])[0] is not None
+
+
+def test_least_recently_used_embeddings_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("ingest_cache.time.time", lambda: now[0])
+    # Each entry is a 32-byte key plus 16 bytes of vector
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), "m", 4, max_bytes=48 * 3)
+    for i, text in enumerate(["a", "b", "c"]):
+        now[0] += 1
+        cache.put_many([text], [[float(i)] * 4])
+    now[0] += 1
+    cache.get_many(["a"])
+    now[0] += 1
+    cache.put_many(["d"], [[3.0] * 4])
+    # Over budget: trimmed to 90% of it, dropping the entries used longest ago
+    assert cache.evictions == 2
+    assert [vector is not None for vector in cache.get_many(["a", "b", "c", "d"])] == [True, False, False, True]
+
+
+def test_keywords_round_trip_per_model(tmp_path):
+    path = str(tmp_path / "keywords.sqlite")
+    cache = KeywordCache(path, "gpt-4o-mini")
+    cache.put_many(["lost card"], [["card", "block"]])
+    assert cache.get_many(["lost card", "other"]) == [["card", "block"], None]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert KeywordCache(path, "gpt-4o").get_many(["lost card"]) == [None]
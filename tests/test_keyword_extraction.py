@@ -0,0 +1,18 @@
+from keyword_extraction import extract_keywords
+
+
+def test_keywords_rank_by_frequency_then_first_position():
+    text = "Reset your PIN in NovaPay. NovaPay blocks the card after three wrong PIN entries."
+    assert extract_keywords(text)[:4] == ["PIN", "pin", "novapay", "reset"]
+
+
+def test_capitalized_phrases_stop_at_line_breaks():
+    keywords = extract_keywords("Card Services\nThe Open  Search\tEngine handles disputes")
+    assert "card services" in keywords
+    assert "the open search engine" in keywords
+    assert not any("\n" in keyword or "services the" in keyword for keyword in keywords)
+
+
+def test_acronyms_numbers_and_compound_terms():
+    keywords = extract_keywords("The BLEU score of 28.4 BLEU uses multi-head self-attention in getEmbedding.")
+    assert {"BLEU", "28.4 BLEU", "multi-head", "self-attention", "getEmbedding"} <= set(keywords)
@@ -0,0 +1,95 @@
+import hashlib
+import os
+
+import pytest
+
+import ingest_unstructured_opensearch as ingest
+
+
+def test_fingerprint_hashes_the_content(tmp_path):
+    path = tmp_path / "faq.md"
+    path.write_text("How do I reset my PIN?")
+    fingerprint = ingest.file_fingerprint(path)
+    assert fingerprint["sha256"] == hashlib.sha256(b"How do I reset my PIN?").hexdigest()
+    assert fingerprint["size"] == 22
+    assert fingerprint["filename"] == "faq.md"
+
+
+def test_fingerprint_reuses_the_hash_when_size_and_mtime_match(tmp_path):
+    path = tmp_path / "faq.md"
+    path.write_text("How do I reset my PIN?")
+    previous = dict(ingest.file_fingerprint(path), sha256="stored")
+    assert ingest.file_fingerprint(path, previous)["sha256"] == "stored"
+
+    # Same size, new mtime: the file is read again
+    path.write_text("How do I reset my PIN!")
+    os.utime(path, ns=(previous["mtime_ns"] + 10**9, previous["mtime_ns"] + 10**9))
+    assert ingest.file_fingerprint(path, previous)["sha256"] == hashlib.sha256(b"How do I reset my PIN!").hexdigest()
+
+
+def test_manifest_round_trip(tmp_path):
+    path = tmp_path / "cache" / "manifest.json"
+    assert ingest.load_manifest(str(path)) == {}
+    manifest = {"hybrid_demo": {"/data/faq.md": {"sha256": "abc", "size": 3}}}
+    ingest.save_manifest(str(path), manifest)
+    assert ingest.load_manifest(str(path)) == manifest
+    assert not path.with_suffix(".json.tmp").exists()
+
+
+@pytest.fixture
+def incremental(tmp_path, monkeypatch):
+    """Runs ingest_directory_incremental with fake ingestion; returns (run, data dir, calls)."""
+    data = tmp_path / "data"
+    data.mkdir()
+    manifest = str(tmp_path / "manifest.json")
+    calls = {"ingested": [], "deleted": [], "failing": set()}
+
+    def ingest_files(client, files, use_async=False, concurrency=16):
+        calls["ingested"].append(sorted(f.name for f in files))
+        return {f: 1 for f in files if f.name not in calls["failing"]}
+
+    def delete_file_chunks(client, filename):
+        calls["deleted"].append(filename)
+        return 0
+
+    monkeypatch.setattr(ingest, "ingest_files", ingest_files)
+    monkeypatch.setattr(ingest, "delete_file_chunks", delete_file_chunks)
+    monkeypatch.setattr(ingest, "JOURNAL", None)
+
+    def run():
+        calls["ingested"].clear()
+        calls["deleted"].clear()
+        ingest.ingest_directory_incremental(None, str(data), manifest)
+        return calls["ingested"][0] if calls["ingested"] else []
+
+    return run, data, calls
+
+
+def test_incremental_runs_only_ingest_new_and_changed_files(incremental):
+    run, data, calls = incremental
+    (data / "a.md").write_text("first")
+    (data / "b.md").write_text("second")
+    assert run() == ["a.md", "b.md"]
+    assert run() == []
+
+    (data / "a.md").write_text("first, edited")
+    # Touched without a content change
+    os.utime(data / "b.md", ns=(1, 1))
+    assert run() == ["a.md"]
+    assert calls["deleted"] == ["a.md"]
+
+    (data / "b.md").unlink()
+    assert run() == []
+    assert calls["deleted"] == ["b.md"]
+
+
+def test_failed_files_are_retried_on_the_next_run(incremental):
+    run, data, calls = incremental
+    (data / "a.md").write_text("first")
+    (data / "b.md").write_text("second")
+    calls["failing"].add("b.md")
+    assert run() == ["a.md", "b.md"]
+    assert run() == ["b.md"]
+    calls["failing"].clear()
+    assert run() == ["b.md"]
+    assert run() == []
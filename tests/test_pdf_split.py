@@ -0,0 +1,83 @@
+import hashlib
+
+import chunking
+import pdf_split
+
+# (page, type, text) of a four-page document; the "Limits" section runs from page 2 into page 3
+DOCUMENT = [
+    (1, "Title", "Card Services"),
+    (1, "NarrativeText", "Cards can be ordered online or in any branch. " * 8),
+    (2, "Title", "Limits"),
+    (2, "NarrativeText", "Daily cash withdrawals are limited per card. " * 10),
+    (3, "NarrativeText", "Limits can be raised for a day from the app. " * 10),
+    (3, "ListItem", "Contactless payments have a separate limit."),
+    (4, "Title", "Lost Cards"),
+    (4, "NarrativeText", "Report a lost card at once to block it. " * 6),
+]
+
+
+def element_id(page: int, text: str) -> str:
+    return hashlib.sha256(f"{page}\0{text}".encode()).hexdigest()[:32]
+
+
+def partition(rows, number_from: int = 1) -> list[dict]:
+    """Elements as one partition request returns them: parent_id only for Titles within the request."""
+    elements = []
+    title_id = None
+    for page, element_type, text in rows:
+        metadata = {"filename": "cards.pdf", "page_number": page - number_from + 1}
+        if element_type == "Title":
+            title_id = element_id(page, text)
+        elif title_id:
+            metadata["parent_id"] = title_id
+        elements.append({"type": element_type, "element_id": element_id(page, text), "text": text,
+                         "metadata": metadata})
+    return elements
+
+
+def split_parts(pages_per_split: int, number_from_one: bool = False) -> list[tuple[int, list[dict]]]:
+    parts = []
+    for first in range(1, 5, pages_per_split):
+        rows = [row for row in DOCUMENT if first <= row[0] < first + pages_per_split]
+        parts.append((first, partition(rows, number_from=first if number_from_one else 1)))
+    return parts
+
+
+def chunk(elements: list[dict]) -> list[dict]:
+    return chunking.chunk_by_title(elements, max_characters=500, overlap=50)
+
+
+def test_stitched_elements_match_a_single_request():
+    unsplit = partition(DOCUMENT)
+    # Reversed: ranges come back in whatever order they finish
+    stitched = pdf_split.stitch_elements(list(reversed(split_parts(1))))
+    assert stitched == unsplit
+
+
+def test_split_chunks_keep_parent_ids_and_pages():
+    unsplit = chunk(partition(DOCUMENT))
+    split = chunk(pdf_split.stitch_elements(split_parts(1)))
+    summary = lambda chunks: [(c["text"], c["metadata"].get("parent_id"), c["metadata"]["page_number"]) for c in chunks]
+    assert summary(split) == summary(unsplit)
+    # The page 3 text sits under the "Limits" Title from page 2
+    limits_id = element_id(2, "Limits")
+    page_three = [c for c in split if c["metadata"]["page_number"] == 3]
+    assert page_three and all(c["metadata"]["parent_id"] == limits_id for c in page_three)
+
+
+def test_page_numbers_are_offset_when_the_api_counts_from_one():
+    stitched = pdf_split.stitch_elements(split_parts(2, number_from_one=True))
+    assert [e["metadata"]["page_number"] for e in stitched] == [page for page, _, _ in DOCUMENT]
+
+
+def test_colliding_ids_are_renamed_with_their_children():
+    title = {"type": "Title", "element_id": "dup", "text": "Same", "metadata": {"page_number": 1}}
+    child = {"type": "NarrativeText", "element_id": "c2", "text": "Second",
+             "metadata": {"page_number": 2, "parent_id": "dup"}}
+    stitched = pdf_split.stitch_elements([
+        (1, [title]),
+        (2, [dict(title, metadata={"page_number": 2}), child]),
+    ])
+    renamed = stitched[1]["element_id"]
+    assert renamed != "dup"
+    assert stitched[2]["metadata"]["parent_id"] == renamed
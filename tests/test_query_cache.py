@@ -0,0 +1,153 @@
+import math
+
+import numpy as np
+import pytest
+
+import query_cache
+from query_cache import CachedHybridSearcher, QueryCache
+
+DIMENSION = 64
+
+
+def unit(seed: int) -> np.ndarray:
+    vector = np.random.default_rng(seed).standard_normal(DIMENSION)
+    return vector / np.linalg.norm(vector)
+
+
+def at_cosine(vector: np.ndarray, cosine: float, seed: int = 99) -> np.ndarray:
+    """A unit vector with exactly this cosine similarity to `vector`."""
+    other = np.random.default_rng(seed).standard_normal(DIMENSION)
+    other -= (other @ vector) * vector
+    other /= np.linalg.norm(other)
+    return cosine * vector + math.sqrt(1 - cosine ** 2) * other
+
+
+def test_normalize_query_folds_case_spacing_and_trailing_punctuation():
+    assert query_cache.normalize_query("  How do I  reset my PIN?? ") == "how do i reset my pin"
+    assert query_cache.normalize_query("Ｌｏｓｔ card!") == "lost card"
+
+
+@pytest.mark.parametrize("threshold", [0.8, 0.9, 0.95, 0.98])
+def test_lsh_bands_keep_the_recall_at_the_threshold(threshold):
+    bands, rows = query_cache.lsh_bands(threshold, 128, recall=0.95)
+    assert bands * rows <= 128
+    p = query_cache.hyperplane_collision_probability(threshold)
+    assert 1 - (1 - p ** rows) ** bands >= 0.95
+    # One more row per band would drop below the recall
+    more = rows + 1
+    assert 1 - (1 - p ** more) ** (128 // more) < 0.95
+
+
+def test_exact_tier_uses_the_normalized_text_and_the_params():
+    cache = QueryCache(DIMENSION)
+    cache.put("Lost card?", {"hits": 1}, params=("idx", 10))
+    assert cache.get("lost   CARD", params=("idx", 10)) == {"hits": 1}
+    assert cache.get("lost card", params=("idx", 5)) is None
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_semantic_tier_matches_at_or_above_the_threshold():
+    cache = QueryCache(DIMENSION, threshold=0.95)
+    query = unit(1)
+    cache.put("lost card", {"hits": "lost"}, vector=query)
+    assert cache.get_similar("card stolen", at_cosine(query, 0.90, seed=7)) is None
+    assert cache.get_similar("card lost", at_cosine(query, 0.97, seed=8)) == {"hits": "lost"}
+    # Other params never share results
+    assert cache.get_similar("card lost", at_cosine(query, 0.99), params="other") is None
+
+    # A semantic hit is cached under the new text too
+    assert cache.get("card lost") == {"hits": "lost"}
+    stats = cache.stats()
+    assert (stats["semantic_hits"], stats["misses"], stats["exact_hits"]) == (1, 2, 1)
+
+
+def test_semantic_tier_finds_most_matches_near_the_threshold():
+    # Room for every query and its paraphrase, so nothing is evicted
+    cache = QueryCache(DIMENSION, max_entries=400, threshold=0.95)
+    for seed in range(200):
+        cache.put(f"query {seed}", {"seed": seed}, vector=unit(seed))
+    found = sum(cache.get_similar(f"paraphrase {seed}", at_cosine(unit(seed), 0.96, seed=1000 + seed)) == {"seed": seed}
+                for seed in range(200))
+    assert found >= 180
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = QueryCache(DIMENSION, max_entries=2)
+    cache.put("a", {"q": "a"}, vector=unit(1))
+    cache.put("b", {"q": "b"}, vector=unit(2))
+    cache.get("a")
+    cache.put("c", {"q": "c"}, vector=unit(3))
+    assert cache.get("b") is None
+    assert cache.get("a") == {"q": "a"} and cache.get("c") == {"q": "c"}
+    assert cache.stats()["evictions"] == 1
+    # The evicted entry's vector slot is reused, not leaked
+    cache.put("d", {"q": "d"}, vector=unit(4))
+    assert cache.get_similar("d again", unit(4)) == {"q": "d"}
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    cache = QueryCache(DIMENSION, ttl_seconds=60)
+    cache.put("lost card", {"hits": 1}, vector=unit(1))
+    now[0] += 30
+    assert cache.get("lost card") == {"hits": 1}
+    now[0] += 31
+    assert cache.get("lost card") is None
+    assert cache.get_similar("card lost", unit(1)) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_a_new_generation_empties_the_cache():
+    cache = QueryCache(DIMENSION)
+    assert cache.check_generation(3) is False
+    cache.put("lost card", {"hits": 1}, vector=unit(1))
+    assert cache.check_generation(3) is False
+    assert cache.get("lost card") == {"hits": 1}
+    assert cache.check_generation(4) is True
+    assert cache.get("lost card") is None
+    assert cache.get_similar("lost card", unit(1)) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+class FakeEmbedder:
+    dimension = DIMENSION
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        return [unit(len(text)) for text in texts]
+
+
+class FakeClient:
+    def __init__(self):
+        self.searches = 0
+        self.generation = 1
+
+    def search(self, index, body, params):
+        self.searches += 1
+        return {"took": 1, "hits": {"hits": [{"_id": "doc", "_score": 1.0}]}}
+
+    def get(self, index, id, params):
+        return {"_source": {"generation": self.generation}}
+
+
+def test_cached_searcher_answers_repeats_without_searching():
+    client, embedder = FakeClient(), FakeEmbedder()
+    searcher = CachedHybridSearcher(client=client, index="hybrid_demo", embedder=embedder,
+                                    generation_check_seconds=0)
+    searcher.search("lost card")
+    assert (searcher.last_tier, client.searches, embedder.calls) == ("miss", 1, 1)
+    searcher.search("Lost card?")
+    assert (searcher.last_tier, client.searches, embedder.calls) == ("exact", 1, 1)
+    # Same length, so FakeEmbedder gives the same vector
+    searcher.search("card lost")
+    assert (searcher.last_tier, client.searches, embedder.calls) == ("semantic", 1, 2)
+    searcher.search("lost card", k=5)
+    assert (searcher.last_tier, client.searches) == ("miss", 2)
+
+    client.generation = 2
+    searcher.search("lost card")
+    assert (searcher.last_tier, client.searches) == ("miss", 3)
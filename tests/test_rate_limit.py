@@ -0,0 +1,128 @@
+import asyncio
+
+import httpx
+import pytest
+
+import rate_limit
+from rate_limit import AdaptiveConcurrency, Endpoint, RetriesExhausted, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; sleeping advances it."""
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    async def async_sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(rate_limit.time, "sleep", sleep)
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", async_sleep)
+    return now
+
+
+def response(status: int, **headers) -> httpx.Response:
+    return httpx.Response(status, headers=headers, request=httpx.Request("POST", "https://api.example.com/v1"))
+
+
+def test_token_bucket_bursts_then_waits_for_the_refill(clock):
+    bucket = TokenBucket(600)  # 10 per second, bursts of 60
+    assert [bucket.reserve(20) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(10) == pytest.approx(1.0)
+    # The debt is paid back at the refill rate
+    clock[0] += 1.0
+    assert bucket.reserve(10) == pytest.approx(1.0)
+    clock[0] += 10.0
+    assert bucket.reserve(60) == 0.0
+
+
+def test_token_bucket_lets_oversized_requests_through_later(clock):
+    bucket = TokenBucket(60)
+    assert bucket.capacity == 6
+    assert bucket.reserve(66) == pytest.approx(60.0)
+
+
+def test_adaptive_concurrency_halves_once_per_wave_and_grows_back(clock):
+    concurrency = AdaptiveConcurrency(8)
+    for _ in range(8):
+        assert concurrency.try_acquire()
+    assert not concurrency.try_acquire()
+    concurrency.release(throttled=True)
+    concurrency.release(throttled=True)
+    assert concurrency.limit == 4
+    clock[0] += 2
+    concurrency.release(throttled=True)
+    assert concurrency.limit == 2
+    # +1 per window of `limit` successes
+    for _ in range(2):
+        concurrency.release(throttled=False)
+    assert concurrency.limit == pytest.approx(3, abs=0.2)
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after": "7"}, 7.0),
+    ({"retry-after": "-3"}, 0.0),
+    ({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}, 0.0),
+    ({"retry-after": "soon"}, None),
+    ({}, None),
+])
+def test_retry_after_seconds(headers, expected):
+    assert rate_limit.retry_after_seconds(response(429, **headers)) == expected
+
+
+def test_call_retries_throttled_requests_after_retry_after(clock):
+    endpoint = Endpoint("api", max_retries=3)
+    replies = [response(429, **{"retry-after": "5"}), response(503), response(200)]
+    started = clock[0]
+    result = endpoint.call(lambda: replies.pop(0))
+    assert result.status_code == 200
+    assert (endpoint.calls, endpoint.retries, endpoint.throttled) == (1, 2, 1)
+    # Waited at least the server's 5 seconds before the second attempt
+    assert clock[0] - started >= 5
+    # The concurrency slots were all released
+    assert endpoint.concurrency.in_flight == 0
+
+
+def test_a_429_pauses_every_caller(clock):
+    endpoint = Endpoint("api")
+    endpoint.retry_delay(response(429, **{"retry-after": "10"}), None, 0)
+    assert endpoint.reserve(0) >= 10
+
+
+def test_non_retryable_responses_are_returned(clock):
+    endpoint = Endpoint("api")
+    assert endpoint.call(lambda: response(400)).status_code == 400
+    assert endpoint.retries == 0
+
+
+def test_call_gives_up_after_max_retries(clock):
+    endpoint = Endpoint("api", max_retries=2, base_delay=0.5)
+
+    def fail():
+        raise httpx.ConnectError("refused")
+
+    with pytest.raises(RetriesExhausted, match="after 3 attempts"):
+        endpoint.call(fail)
+    assert (endpoint.retries, endpoint.exhausted) == (2, 1)
+    assert endpoint.concurrency.in_flight == 0
+
+
+def test_call_async_waits_for_the_token_budget(clock):
+    endpoint = Endpoint("api", tokens_per_minute=6000)  # 100 per second, bursts of 600
+    replies = [response(200) for _ in range(2)]
+
+    async def send():
+        return replies.pop(0)
+
+    async def run():
+        started = clock[0]
+        await endpoint.call_async(send, tokens=600)
+        await endpoint.call_async(send, tokens=300)
+        return clock[0] - started
+
+    assert asyncio.run(run()) == pytest.approx(3.0)
+    assert endpoint.calls == 2
@@ -0,0 +1,99 @@
+import gzip
+import json
+from array import array
+
+import numpy as np
+import pytest
+from opensearchpy import Urllib3HttpConnection
+from opensearchpy.exceptions import SerializationError
+
+import serialization
+from serialization import FastVectorSerializer, VectorSerializer, gzip_level_connection_class, iter_json_array
+
+ELEMENTS = [
+    {"type": "Title", "text": "Card Services", "metadata": {"page_number": 1}},
+    {"type": "NarrativeText", "text": "Brackets ] and [ braces { inside \"strings\"", "metadata": {}},
+    [1, 2.5, None],
+    12345,
+    "plain",
+]
+
+
+def chunks_of(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 10_000])
+def test_iter_json_array_yields_items_across_chunk_boundaries(size):
+    body = json.dumps(ELEMENTS, indent=1)
+    assert list(iter_json_array(chunks_of(body, size))) == ELEMENTS
+
+
+def test_iter_json_array_yields_before_the_body_is_complete():
+    def body():
+        yield '[{"text": "first"},'
+        yield ' {"text": "sec'
+        raise AssertionError("read past the first item")
+
+    items = iter_json_array(body())
+    assert next(items) == {"text": "first"}
+
+
+def test_iter_json_array_handles_empty_arrays():
+    assert list(iter_json_array([" [ ", " ]"])) == []
+
+
+@pytest.mark.parametrize("body", ['{"detail": "error"}', '[{"text": "cut off"}, {"te'])
+def test_iter_json_array_rejects_other_bodies(body):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunks_of(body, 4)))
+
+
+def test_vector_serializer_writes_float32_arrays_as_lists():
+    document = {"text": "lost card", "vector_field": array("f", [0.5, -0.25, 1.0])}
+    assert json.loads(VectorSerializer().dumps(document)) == {"text": "lost card", "vector_field": [0.5, -0.25, 1.0]}
+
+
+def test_fast_serializer_writes_float32_vectors_exactly():
+    vector = array("f", np.random.default_rng(0).standard_normal(1536).astype(np.float32).tobytes())
+    document = {"vector_field": vector, "keywords": ["card"]}
+    body = FastVectorSerializer().dumps(document)
+    decoded = json.loads(body)
+    assert decoded["keywords"] == ["card"]
+    assert np.array_equal(np.asarray(decoded["vector_field"], dtype=np.float32), np.frombuffer(vector, dtype=np.float32))
+    # Shortest float32 form instead of the float64 digits the json module writes
+    assert len(body) < 0.7 * len(VectorSerializer().dumps(document))
+
+
+def test_fast_serializer_rounds_to_the_precision():
+    body = FastVectorSerializer(precision=4).dumps({"vector_field": array("f", [0.123456, -0.98766, 1.0])})
+    assert json.loads(body) == {"vector_field": [0.1235, -0.9877, 1.0]}
+
+
+def test_fast_serializer_passes_strings_through_and_wraps_errors():
+    serializer = FastVectorSerializer()
+    assert serializer.dumps('{"already": "json"}') == '{"already": "json"}'
+    assert json.loads(serializer.dumps({"ids": array("i", [1, 2])})) == {"ids": [1, 2]}
+    with pytest.raises(SerializationError):
+        serializer.dumps({"bad": object()})
+
+
+def test_create_serializer_falls_back_to_json(monkeypatch):
+    assert isinstance(serialization.create_serializer("orjson"), FastVectorSerializer)
+    assert type(serialization.create_serializer("json")) is VectorSerializer
+
+    def missing(precision):
+        raise ImportError("No module named 'orjson'")
+
+    monkeypatch.setattr(serialization, "FastVectorSerializer", missing)
+    assert type(serialization.create_serializer("orjson")) is VectorSerializer
+
+
+def test_gzip_level_connection_compresses_at_its_level():
+    body = json.dumps(ELEMENTS * 200).encode()
+    fast = gzip_level_connection_class(Urllib3HttpConnection, 1)
+    assert fast.__name__ == "Gzip1Urllib3HttpConnection"
+    compressed = fast._gzip_compress(None, body)
+    assert gzip.decompress(compressed) == body
+    best = gzip_level_connection_class(Urllib3HttpConnection, 9)._gzip_compress(None, body)
+    assert len(best) <= len(compressed)